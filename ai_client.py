@@ -12,49 +12,479 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import asyncio
+import importlib
+import inspect
+import random
+import threading
+import time
+import weakref
 from enum import Enum
-from chat_gpt import validate_openai_gpt, translate_openai_gpt
-from yandex_gpt import validate_yandex_gpt, translate_yandex_gpt
+from ai_errors import RetryableError
+from metrics import record_retry
+from tracing import span
 
 
 class AIService(Enum):
     YANDEX = "yandex"
     OPENAI = "openai"
+    MOCK = "mock"
 
 
+# Provider module of every service. A module is imported on first use, so a run only loads the SDK of the provider
+# it talks to, and a run with nothing to translate loads none. Every module has the same interface:
+# `create_session(ai_key, ai_folder, max_connections)` and `create_async_session(...)` return a long-lived client,
+# `validate(ai_key, ai_folder, ai_model, client)` checks the credentials,
+# `translate(ai_key, ai_folder, ai_model, prompt, client, response_schema)`, `translate_async(...)`, `stream(...)` and
+# `stream_async(...)` (with `on_text` after the prompt) send a request and raise RetryableError for transient failures,
+# `token_limits(ai_model)` and `prices(ai_model)` describe the model, and `create_batch_backend(ai_key, ai_folder,
+# ai_model, state_dir)` exists where `supports_batch` is True.
+provider_modules = {
+    AIService.YANDEX: "yandex_gpt",
+    AIService.OPENAI: "chat_gpt",
+    AIService.MOCK: "mock_gpt",
+}
+
+
+# Maximum number of in-flight requests per provider, shared by every translation call.
+# The governor of the provider lowers the effective limit while the provider answers with rate-limit errors.
+default_provider_concurrency = {
+    AIService.YANDEX: 4,
+    AIService.OPENAI: 8,
+    AIService.MOCK: 8,
+}
+
+_provider_concurrency = dict(default_provider_concurrency)
+
+# Requests and tokens per minute per provider, None means unlimited
+_provider_rate_limits = {}
+_max_retries = 5
+
+_governors = {}
+_governors_lock = threading.Lock()
+
+# Long-lived provider clients keyed by (provider, key, folder), shared by all translation calls
+_sessions = {}
+_sessions_lock = threading.Lock()
+
+# Async clients are bound to the event loop they were created on, every loop gets its own. A loop that is gone
+# drops its clients, so a client of one `asyncio.run()` is never reused by the next.
+_async_sessions = weakref.WeakKeyDictionary()
+_async_sessions_lock = threading.Lock()
+
+_providers = {}
+_providers_lock = threading.Lock()
+
 _is_debug = False
 
 
+def set_provider_concurrency(ai_provider, limit):
+    service = get_ai_service(ai_provider)
+
+    if limit is None or int(limit) < 1:
+        raise ValueError(f"Error: Invalid concurrency limit for {service.value}: {limit}")
+
+    with _governors_lock:
+        _provider_concurrency[service] = int(limit)
+        _governors.pop(service, None)
+
+    # Sessions are sized to the concurrency, so they are rebuilt with the new limit
+    with _sessions_lock:
+        for session_key in [session_key for session_key in _sessions if session_key[0] == service]:
+            close = getattr(_sessions.pop(session_key), "close", None)
+            if callable(close):
+                close()
+
+
+def get_provider_concurrency(ai_provider):
+    return _provider_concurrency[get_ai_service(ai_provider)]
+
+
+def set_provider_rate_limits(ai_provider, requests_per_minute=None, tokens_per_minute=None):
+    service = get_ai_service(ai_provider)
+
+    with _governors_lock:
+        _provider_rate_limits[service] = (requests_per_minute, tokens_per_minute)
+        _governors.pop(service, None)
+
+
+def load_provider(service):
+    provider = _providers.get(service)
+    if provider is not None:
+        return provider
+
+    with _providers_lock:
+        provider = _providers.get(service)
+        if provider is None:
+            module_name = provider_modules.get(service)
+            if module_name is None:
+                raise ValueError(f"Unknown AI service: {service}")
+
+            with span("import provider", "init", {"module": module_name}):
+                provider = importlib.import_module(module_name)
+            _providers[service] = provider
+
+            if _is_debug:
+                print(f"Loaded provider module {module_name}")
+
+    return provider
+
+
+def set_mock_provider_settings(settings):
+    load_provider(AIService.MOCK).set_mock_settings(settings)
+
+    # Mock clients copy the settings when they are created
+    with _sessions_lock:
+        for session_key in [session_key for session_key in _sessions if session_key[0] == AIService.MOCK]:
+            _sessions.pop(session_key)
+
+
+def set_max_retries(max_retries):
+    global _max_retries
+
+    if max_retries is None or int(max_retries) < 0:
+        raise ValueError(f"Error: Invalid number of retries: {max_retries}")
+
+    with _governors_lock:
+        _max_retries = int(max_retries)
+        _governors.clear()
+
+
+def get_governor(service):
+    with _governors_lock:
+        governor = _governors.get(service)
+        if governor is None:
+            requests_per_minute, tokens_per_minute = _provider_rate_limits.get(service, (None, None))
+            governor = RequestGovernor(
+                name=service.value,
+                max_concurrency=_provider_concurrency[service],
+                requests_per_minute=requests_per_minute,
+                tokens_per_minute=tokens_per_minute,
+                max_retries=_max_retries
+            )
+            _governors[service] = governor
+
+        return governor
+
+
+def estimate_request_tokens(prompt):
+    # The prompt plus an answer of about the same size, roughly 3 characters per token
+    return (len(prompt) // 3 + 1) * 2
+
+
+class TokenBucket:
+
+    def __init__(self, capacity_per_minute, clock=time.monotonic):
+        self.capacity = float(capacity_per_minute)
+        self.rate = self.capacity / 60.0
+        self.level = self.capacity
+        self.clock = clock
+        self.updated_at = clock()
+        self._lock = threading.Lock()
+
+    def reserve(self, amount):
+        # Takes `amount` right away and returns how long the caller has to wait until it is covered
+        with self._lock:
+            now = self.clock()
+            self.level = min(self.capacity, self.level + (now - self.updated_at) * self.rate)
+            self.updated_at = now
+
+            self.level -= min(amount, self.capacity)
+
+            return 0.0 if self.level >= 0 else -self.level / self.rate
+
+
+# Shared by every request to one provider: enforces requests and tokens per minute, limits the number of requests
+# in flight, retries rate-limited and transient failures, and adapts the in-flight limit to the rate limits it hits.
+class RequestGovernor:
+
+    # `clock` and `sleep` are the monotonic time and the blocking wait of the governor, replaced in tests
+    def __init__(self, name, max_concurrency, requests_per_minute=None, tokens_per_minute=None, max_retries=5,
+                 base_delay=1.0, max_delay=60.0, clock=time.monotonic, sleep=time.sleep):
+        self.name = name
+        self.max_concurrency = max_concurrency
+        self.limit = float(max_concurrency)
+        self.in_flight = 0
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.clock = clock
+        self.sleep = sleep
+
+        self.request_bucket = TokenBucket(requests_per_minute, clock) if requests_per_minute else None
+        self.token_bucket = TokenBucket(tokens_per_minute, clock) if tokens_per_minute else None
+
+        self.retries = 0
+        self.rate_limited = 0
+
+        self._paused_until = 0.0
+        self._last_decrease_at = 0.0
+        self._condition = threading.Condition()
+        self._async_waiters = []
+
+    def call(self, function, estimated_tokens=0):
+        attempt = 0
+        while True:
+            with span("wait for provider slot", "governor"):
+                self.sleep(self._get_admission_delay(estimated_tokens))
+                self._acquire()
+            try:
+                result = function()
+            except RetryableError as e:
+                self._release(e)
+                attempt = self._on_retryable_error(e, attempt)
+                with span("backoff", "governor", {"attempt": attempt, "error": str(e)}):
+                    self.sleep(self._get_backoff_delay(e, attempt))
+                continue
+            except BaseException:
+                self._release()
+                raise
+
+            self._release()
+            return result
+
+    async def call_async(self, function, estimated_tokens=0):
+        attempt = 0
+        while True:
+            with span("wait for provider slot", "governor"):
+                await asyncio.sleep(self._get_admission_delay(estimated_tokens))
+                await self._acquire_async()
+            try:
+                result = await function()
+            except RetryableError as e:
+                self._release(e)
+                attempt = self._on_retryable_error(e, attempt)
+                with span("backoff", "governor", {"attempt": attempt, "error": str(e)}):
+                    await asyncio.sleep(self._get_backoff_delay(e, attempt))
+                continue
+            except BaseException:
+                self._release()
+                raise
+
+            self._release()
+            return result
+
+    def _get_admission_delay(self, estimated_tokens):
+        delay = max(0.0, self._paused_until - self.clock())
+
+        if self.request_bucket is not None:
+            delay = max(delay, self.request_bucket.reserve(1))
+        if self.token_bucket is not None and estimated_tokens:
+            delay = max(delay, self.token_bucket.reserve(estimated_tokens))
+
+        return delay
+
+    def _on_retryable_error(self, error, attempt):
+        attempt += 1
+        if attempt > self.max_retries:
+            raise error
+
+        with self._condition:
+            self.retries += 1
+        record_retry(error)
+
+        if _is_debug:
+            print(f"Retrying {self.name} request (attempt {attempt}) after error: {error}")
+
+        return attempt
+
+    def _get_backoff_delay(self, error, attempt):
+        if error.retry_after is not None:
+            delay = error.retry_after
+        else:
+            # Exponential backoff with full jitter
+            delay = random.uniform(0, min(self.max_delay, self.base_delay * (2 ** (attempt - 1))))
+
+        if error.is_rate_limited:
+            # Every caller of the provider backs off, not only the one that hit the limit
+            with self._condition:
+                self._paused_until = max(self._paused_until, self.clock() + delay)
+
+        return delay
+
+    def _acquire(self):
+        with self._condition:
+            while self.in_flight >= int(self.limit):
+                self._condition.wait()
+            self.in_flight += 1
+
+    async def _acquire_async(self):
+        while True:
+            with self._condition:
+                if self.in_flight < int(self.limit):
+                    self.in_flight += 1
+                    return
+
+                loop = asyncio.get_running_loop()
+                future = loop.create_future()
+                self._async_waiters.append((loop, future))
+
+            await future
+
+    def _release(self, error=None):
+        with self._condition:
+            self.in_flight -= 1
+
+            if error is not None and error.is_rate_limited:
+                self.rate_limited += 1
+                now = self.clock()
+                # Multiplicative decrease, at most once per second so a burst of 429s counts as one signal
+                if now - self._last_decrease_at > 1.0:
+                    self.limit = max(1.0, self.limit / 2)
+                    self._last_decrease_at = now
+                    if _is_debug:
+                        print(f"Reduced {self.name} concurrency to {int(self.limit)}")
+            elif error is None:
+                # Additive increase back towards the configured concurrency
+                self.limit = min(float(self.max_concurrency), self.limit + 1.0 / max(1.0, self.limit))
+
+            self._condition.notify_all()
+            waiters = self._async_waiters
+            self._async_waiters = []
+
+        for loop, future in waiters:
+            loop.call_soon_threadsafe(_wake_future, future)
+
+
+def _wake_future(future):
+    if not future.done():
+        future.set_result(None)
+
+
+def get_session(service, ai_key, ai_folder):
+    session_key = (service, ai_key, ai_folder)
+
+    with _sessions_lock:
+        session = _sessions.get(session_key)
+        if session is None:
+            session = load_provider(service).create_session(
+                ai_key, ai_folder, max_connections=_provider_concurrency[service]
+            )
+            _sessions[session_key] = session
+
+        return session
+
+
+def close_sessions():
+    with _sessions_lock:
+        for session in _sessions.values():
+            close = getattr(session, "close", None)
+            if callable(close):
+                close()
+
+        _sessions.clear()
+
+
+def get_async_session(service, ai_key, ai_folder):
+    session_key = (service, ai_key, ai_folder)
+    loop = asyncio.get_running_loop()
+
+    with _async_sessions_lock:
+        sessions = _async_sessions.setdefault(loop, {})
+        session = sessions.get(session_key)
+        if session is None:
+            session = load_provider(service).create_async_session(
+                ai_key, ai_folder, max_connections=_provider_concurrency[service]
+            )
+            sessions[session_key] = session
+
+        return session
+
+
+async def close_async_sessions():
+    with _async_sessions_lock:
+        sessions = _async_sessions.pop(asyncio.get_running_loop(), {})
+
+    for session in sessions.values():
+        close = getattr(session, "close", None)
+        if callable(close):
+            result = close()
+            if inspect.isawaitable(result):
+                await result
+
+
 def validate_ai(ai_provider, ai_key, ai_folder, ai_model):
     service = get_ai_service(ai_provider)
 
-    if service == AIService.YANDEX:
-        validate_yandex_gpt(ai_key, ai_folder, ai_model)
-    elif service == AIService.OPENAI:
-        validate_openai_gpt(ai_key, ai_model)
-    else:
-        raise ValueError(f"Unknown AI service: {service}")
+    load_provider(service).validate(ai_key, ai_folder, ai_model, client=get_session(service, ai_key, ai_folder))
 
 
-def translate_ai(ai_provider, ai_key, ai_folder, ai_model, prompt):
+def translate_ai(ai_provider, ai_key, ai_folder, ai_model, prompt, response_schema=None):
     service = get_ai_service(ai_provider)
+    provider = load_provider(service)
+    client = get_session(service, ai_key, ai_folder)
 
-    if service == AIService.YANDEX:
-        if not ai_folder:
-            raise ValueError("Folder ID is required for YandexGPT")
-        return translate_yandex_gpt(ai_key, ai_folder, ai_model, prompt)
-    elif service == AIService.OPENAI:
-        return translate_openai_gpt(ai_key, ai_model, prompt)
-    else:
-        raise ValueError(f"Unknown AI service: {service}")
+    return get_governor(service).call(
+        lambda: provider.translate(ai_key, ai_folder, ai_model, prompt, client=client, response_schema=response_schema),
+        estimated_tokens=estimate_request_tokens(prompt)
+    )
 
 
-def get_ai_service(ai_provider):
-    ai_provider = ai_provider.lower()
+async def translate_ai_async(ai_provider, ai_key, ai_folder, ai_model, prompt, response_schema=None):
+    service = get_ai_service(ai_provider)
+    provider = load_provider(service)
+    client = get_async_session(service, ai_key, ai_folder)
+
+    return await get_governor(service).call_async(
+        lambda: provider.translate_async(
+            ai_key, ai_folder, ai_model, prompt, client=client, response_schema=response_schema
+        ),
+        estimated_tokens=estimate_request_tokens(prompt)
+    )
+
+
+# `on_start` is called before every attempt and returns the `on_text(delta)` callback of that attempt.
+# `on_text` may raise ValueError to stop reading the response.
+def translate_ai_stream(ai_provider, ai_key, ai_folder, ai_model, prompt, on_start, response_schema=None):
+    service = get_ai_service(ai_provider)
+    provider = load_provider(service)
+    client = get_session(service, ai_key, ai_folder)
+
+    return get_governor(service).call(
+        lambda: provider.stream(
+            ai_key, ai_folder, ai_model, prompt, on_start(), client=client, response_schema=response_schema
+        ),
+        estimated_tokens=estimate_request_tokens(prompt)
+    )
+
+
+async def translate_ai_stream_async(ai_provider, ai_key, ai_folder, ai_model, prompt, on_start,
+                                    response_schema=None):
+    service = get_ai_service(ai_provider)
+    provider = load_provider(service)
+    client = get_async_session(service, ai_key, ai_folder)
 
-    if ai_provider == "yandex":
-        return AIService.YANDEX
-    elif ai_provider == "openai":
-        return AIService.OPENAI
-    else:
+    return await get_governor(service).call_async(
+        lambda: provider.stream_async(
+            ai_key, ai_folder, ai_model, prompt, on_start(), client=client, response_schema=response_schema
+        ),
+        estimated_tokens=estimate_request_tokens(prompt)
+    )
+
+
+def token_limits_ai(ai_provider, ai_model):
+    return load_provider(get_ai_service(ai_provider)).token_limits(ai_model)
+
+
+def prices_ai(ai_provider, ai_model):
+    return load_provider(get_ai_service(ai_provider)).prices(ai_model)
+
+
+def check_batch_support_ai(ai_provider):
+    service = get_ai_service(ai_provider)
+
+    if not load_provider(service).supports_batch:
+        raise ValueError(f"Error: Batch mode is not supported by the {service.value} provider.")
+
+
+def create_batch_backend_ai(ai_provider, ai_key, ai_folder, ai_model, state_dir):
+    check_batch_support_ai(ai_provider)
+
+    return load_provider(get_ai_service(ai_provider)).create_batch_backend(ai_key, ai_folder, ai_model, state_dir)
+
+
+def get_ai_service(ai_provider):
+    try:
+        return AIService(ai_provider.lower())
+    except ValueError:
         raise ValueError("Error: Unsupported AI provider.")
@@ -18,24 +18,135 @@ import sys
 
 from init import init
 from configure import configure
-from execute import execute
+from execute import execute, merge_sharded_run, plan_execution
+from batch import execute_batch
+from client import close_clients
+from translation_cache import open_translation_cache, get_state_dir, get_state_dir_path
+from tracing import start_tracing, stop_tracing, span
+from shard import parse_shard
 
 _is_debug = False
 
 
-def main(project_dir):
+def main(project_dir, no_cache=False, use_async=False, changed_since=None, report_json=None, report_prometheus=None,
+         trace_path=None, resume=False, batch=None, shard=None, plan=False):
     if not os.path.exists(project_dir):
         print(f"❌ Error: Provided project directory does not exist: {project_dir}")
         sys.exit(1)
 
-    configuration, prompt_path = init(project_dir=project_dir)
+    if trace_path:
+        start_tracing()
 
-    execution_graph = configure(project_dir=project_dir)
+    try:
+        with span("run", "main", {"project_dir": project_dir, "async": use_async}):
+            run(project_dir, no_cache, use_async, changed_since, report_json, report_prometheus, resume, batch, shard,
+                plan)
+    finally:
+        if trace_path:
+            stop_tracing(trace_path)
+            print(f"🔍 Trace written to {trace_path}")
 
-    execute(prompt_path=prompt_path, configuration=configuration, execution_graph=execution_graph)
+
+def run(project_dir, no_cache, use_async, changed_since, report_json, report_prometheus, resume, batch=None,
+        shard=None, plan=False):
+    with span("init", "main"):
+        configuration, prompt_path = init(project_dir=project_dir, configure_client=not plan)
+
+    # A plan only inspects the project, it neither creates the state directory nor updates the manifest in it
+    state_dir = get_state_dir_path(project_dir) if plan else get_state_dir(project_dir)
+
+    with span("configure", "main"):
+        execution_graph = configure(
+            project_dir=project_dir,
+            ignored_dirs=configuration.ignore_directories,
+            state_dir=None if plan else state_dir,
+            changed_since=changed_since
+        )
+
+    if plan:
+        with span("plan", "main"):
+            plan_execution(prompt_path, configuration, execution_graph, state_dir, resume, shard)
+        return
+
+    with span("open cache", "main"):
+        cache = None if no_cache else open_translation_cache(project_dir, configuration)
+
+    report_paths = {"json": report_json, "prometheus": report_prometheus}
+
+    try:
+        with span("execute", "main", {"modules": len(execution_graph)}):
+            # batch: None for direct requests, "wait" or "detach" for the offline batch mode
+            if batch:
+                execute_batch(prompt_path=prompt_path, configuration=configuration, execution_graph=execution_graph,
+                              cache=cache, state_dir=state_dir, report_paths=report_paths, resume=resume,
+                              detach=batch == "detach", shard=shard)
+            else:
+                execute(prompt_path=prompt_path, configuration=configuration, execution_graph=execution_graph,
+                        cache=cache, state_dir=state_dir, use_async=use_async, report_paths=report_paths,
+                        resume=resume, shard=shard)
+    finally:
+        if cache is not None:
+            cache.close()
+        close_clients()
+
+
+def merge(project_dir, shard_dirs=None, report_json=None, report_prometheus=None):
+    # Combines the shard directories of a `--shard i/N` run into the project and reports them as one run
+    if not os.path.exists(project_dir):
+        print(f"❌ Error: Provided project directory does not exist: {project_dir}")
+        sys.exit(1)
+
+    configuration, _ = init(project_dir=project_dir)
+    state_dir = get_state_dir(project_dir)
+
+    execution_graph = configure(
+        project_dir=project_dir,
+        ignored_dirs=configuration.ignore_directories,
+        state_dir=state_dir
+    )
+
+    merge_sharded_run(configuration, execution_graph, state_dir, shard_dirs,
+                      report_paths={"json": report_json, "prometheus": report_prometheus})
+
+
+def parse_merge_arguments(arguments):
+    parser = argparse.ArgumentParser(
+        prog="aitranslator.py merge",
+        description="📦 Merge the shard directories of a sharded run into the project and print one report."
+    )
+    parser.add_argument(
+        "shard_dirs",
+        nargs="*",
+        help="Shard directories to merge, default are all the directories in .aitranslator/shards"
+    )
+    parser.add_argument(
+        "--project_dir",
+        type=str,
+        help="Path to the root of the Android project",
+        required=True
+    )
+    parser.add_argument(
+        "--report-json",
+        type=str,
+        help="Write the merged run report to this file instead of .aitranslator/report.json",
+        required=False
+    )
+    parser.add_argument(
+        "--report-prometheus",
+        type=str,
+        help="Write the merged run metrics to this file instead of .aitranslator/metrics.prom",
+        required=False
+    )
+
+    return parser.parse_args(arguments)
 
 
 if __name__ == '__main__':
+    if len(sys.argv) > 1 and sys.argv[1] == "merge":
+        merge_args = parse_merge_arguments(sys.argv[2:])
+        merge(merge_args.project_dir, merge_args.shard_dirs, merge_args.report_json, merge_args.report_prometheus)
+        sys.exit(0)
+
     parser = argparse.ArgumentParser(
         description="📦 Android Strings Translator - Translate Android string resources into multiple languages."
     )
@@ -45,7 +156,86 @@ if __name__ == '__main__':
         help="Path to the root of the Android project",
         required=False
     )
+    parser.add_argument(
+        "--no-cache",
+        action="store_true",
+        help="Do not read or write the local translation memory cache",
+        required=False
+    )
+    parser.add_argument(
+        "--async",
+        dest="use_async",
+        action="store_true",
+        help="Run translation requests on a single asyncio event loop instead of a thread pool",
+        required=False
+    )
+    parser.add_argument(
+        "--changed-since",
+        type=str,
+        help="Only translate modules whose strings or module configuration changed since this git ref",
+        required=False
+    )
+
+    parser.add_argument(
+        "--report-json",
+        type=str,
+        help="Write the machine-readable run report to this file instead of .aitranslator/report.json",
+        required=False
+    )
+    parser.add_argument(
+        "--report-prometheus",
+        type=str,
+        help="Write the run metrics in Prometheus text format to this file instead of .aitranslator/metrics.prom",
+        required=False
+    )
+
+    parser.add_argument(
+        "--resume",
+        action="store_true",
+        help="Skip the module languages the checkpoint journal records as done and unchanged since",
+        required=False
+    )
+    parser.add_argument(
+        "--batch",
+        action="store_true",
+        help="Submit all translation requests as one provider batch job and wait for it, or resume waiting for "
+             "the job submitted by an earlier run",
+        required=False
+    )
+    parser.add_argument(
+        "--batch-detach",
+        action="store_true",
+        help="Like --batch, but exit after submitting or checking the batch job instead of waiting for it",
+        required=False
+    )
+    parser.add_argument(
+        "--shard",
+        type=str,
+        help="Translate only the part i of N of the work units, e.g. 2/4, and save it to .aitranslator/shards "
+             "for 'aitranslator.py merge'",
+        required=False
+    )
+    parser.add_argument(
+        "--plan",
+        action="store_true",
+        help="Print the expected schedule of the work units and its critical path, then exit without translating",
+        required=False
+    )
+    parser.add_argument(
+        "--trace",
+        type=str,
+        help="Write a Chrome trace-event file of the run phases, open it in https://ui.perfetto.dev",
+        required=False
+    )
 
     args = parser.parse_args()
 
-    main(args.project_dir)
+    try:
+        shard = parse_shard(args.shard) if args.shard else None
+    except ValueError as e:
+        parser.error(str(e))
+
+    main(args.project_dir, no_cache=args.no_cache, use_async=args.use_async, changed_since=args.changed_since,
+         report_json=args.report_json, report_prometheus=args.report_prometheus, trace_path=args.trace,
+         resume=args.resume, batch="detach" if args.batch_detach else "wait" if args.batch else None,
+         shard=shard, plan=args.plan)
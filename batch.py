@@ -0,0 +1,401 @@
+# Copyright 2025 Roman Likhachev
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import hashlib
+import json
+import os
+import time
+
+from ai_client import create_batch_backend_ai, check_batch_support_ai
+from batch_backend import BATCH_FAILED, batch_finished_statuses
+from client import plan_translation, finish_translation, translate_chunks, track_chunk_call, count_translated, \
+    collect_valid_items, ensure_validated, get_chunk_token_budget, make_chunks
+from execute import prepare_work_units, validate_before_requests, finish_work_unit, finish_execution, \
+    group_languages_by_words, validate_translated_words, get_module_label
+from journal import Journal
+from metrics import record_usage, start_run
+from scheduler import run_work_units
+from strings_file import StringsFileWriter
+from tracing import span
+
+# Submitted batch jobs of the project, a later run with `--batch` polls them instead of submitting again
+batch_state_file_name = "batch.json"
+batch_dir_name = "batch"
+batch_requests_file_prefix = "requests"
+
+_is_debug = False
+
+
+# Offline bulk mode: every chunk prompt of the execution graph goes into JSONL files, one batch job each, which the
+# provider answers within hours at a lower price. The results are parsed and written like the ones of direct requests,
+# the strings missing from them are requested directly at the end. Shared strings are not deduplicated in this mode,
+# every module requests its own strings.
+def execute_batch(prompt_path, configuration, execution_graph, cache=None, state_dir=None, report_paths=None,
+                  resume=False, detach=False, shard=None):
+    if not state_dir:
+        raise ValueError("Error: Batch mode needs the state directory of the project.")
+
+    # An unsupported provider fails before anything is read or validated
+    check_batch_support_ai(configuration.ai_provider)
+
+    print("Execute (batch)!")
+    start_run()
+
+    journal = Journal(state_dir).open()
+    writer = StringsFileWriter()
+
+    try:
+        with span("prepare work units", "execute", {"modules": len(execution_graph)}):
+            languages, modules_words, work_units = prepare_work_units(
+                configuration,
+                execution_graph,
+                state_dir,
+                journal,
+                resume,
+                prompt_path,
+                shard
+            )
+
+        validate_before_requests(configuration, work_units, [], state_dir)
+
+        with span("compile batch", "batch"):
+            jobs = make_batch_jobs(prompt_path, configuration, work_units, cache)
+
+        chunk_results = {}
+        if any(job["plan"]["chunks"] for job in jobs):
+            backend = create_batch_backend_ai(
+                configuration.ai_provider,
+                configuration.ai_key,
+                configuration.ai_folder,
+                configuration.ai_model,
+                state_dir
+            )
+            ensure_validated()
+
+            batch_results = run_batch(configuration, backend, jobs, state_dir, detach)
+            if batch_results is None:
+                return
+
+            with span("collect batch results", "batch", {"results": len(batch_results)}):
+                chunk_results, missing_words_by_job = collect_batch_results(configuration, jobs, batch_results)
+
+            with span("request missing strings", "batch"):
+                request_missing_words(configuration, work_units, jobs, missing_words_by_job, chunk_results)
+
+        results = [{language: [] for language in unit["languages"]} for unit in work_units]
+        for job in jobs:
+            translated = finish_translation(job["plan"], chunk_results.get(job["index"], []))
+
+            for language in job["plan"]["target_languages"]:
+                validate_translated_words(translated[language])
+                results[job["unit_index"]][language] = translated[language]
+
+        for unit, language_with_words in zip(work_units, results):
+            finish_work_unit(
+                modules_words[unit["module_index"]],
+                unit,
+                unit["prepared"],
+                language_with_words,
+                state_dir,
+                writer,
+                journal
+            )
+    finally:
+        with span("wait for strings files", "execute"):
+            writer.close()
+        journal.close()
+
+    finish_execution(configuration, execution_graph, languages, work_units, results, cache, writer, None, state_dir,
+                     report_paths, journal, shard)
+
+    # The job is consumed, the next run submits a new one
+    remove_batch_state(state_dir)
+
+
+def make_batch_jobs(prompt_path, configuration, work_units, cache):
+    # One job per (work unit, group of languages with the same strings), like `translate_all_words_to_languages`
+    jobs = []
+
+    for unit_index, unit in enumerate(work_units):
+        module_config = unit["module"]["configuration"]
+
+        for languages in group_languages_by_words(unit["prepared"]["pending_words_by_language"]):
+            plan = plan_translation(
+                prompt_path,
+                configuration,
+                module_config.module_description if module_config else "",
+                languages,
+                unit["prepared"]["pending_words_by_language"][languages[0]],
+                cache,
+                get_module_label(unit["module"])
+            )
+            jobs.append({"index": len(jobs), "unit_index": unit_index, "plan": plan})
+
+    return jobs
+
+
+def make_custom_id(job, chunk_index):
+    return f"{job['index']}:{chunk_index}"
+
+
+def run_batch(configuration, backend, jobs, state_dir, detach=False):
+    batch_dir = os.path.join(state_dir, batch_dir_name)
+    os.makedirs(batch_dir, exist_ok=True)
+
+    parts = write_batch_requests(backend, jobs, batch_dir)
+
+    # Jobs submitted by an earlier run for the same requests are polled instead of submitted again
+    requests_hashes = {requests_hash for _, requests_hash, _ in parts}
+    state = load_batch_state(state_dir)
+    submitted = {}
+    if state:
+        if state.get("provider") == backend.name:
+            submitted = {
+                batch["requests_hash"]: batch
+                for batch in state["batches"]
+                if batch["requests_hash"] in requests_hashes
+            }
+
+        stale_ids = [batch["batch_id"] for batch in state["batches"] if batch["requests_hash"] not in submitted]
+        if stale_ids:
+            print(f"Strings changed since batch(es) {', '.join(stale_ids)} were submitted, submitting new requests!")
+
+    batches = []
+    for requests_path, requests_hash, request_count in parts:
+        batch = submitted.get(requests_hash)
+        if batch is not None:
+            print(f"Resuming batch {batch['batch_id']} submitted at {format_time(batch['submitted_at'])}!")
+        else:
+            with span("submit batch", "batch", {"requests": request_count}):
+                batch = {
+                    "batch_id": backend.submit(requests_path),
+                    "requests_hash": requests_hash,
+                    "submitted_at": time.time()
+                }
+            print(f"Submitted batch {batch['batch_id']} of {request_count} request(s), an interrupted run can be "
+                  f"resumed with --batch!")
+
+        batches.append(batch)
+
+        # Saved after every submission, so that an interrupted run does not submit the same requests twice
+        save_batch_state(state_dir, {
+            "provider": backend.name,
+            "model": configuration.ai_model,
+            "batches": batches
+        })
+
+    batch_ids = [batch["batch_id"] for batch in batches]
+    with span("wait for batch", "batch", {"batch_ids": batch_ids}):
+        statuses = wait_for_batches(backend, batch_ids, configuration.batch_poll_seconds, detach)
+
+    failed_ids = [batch_id for batch_id in batch_ids if statuses[batch_id]["status"] == BATCH_FAILED]
+    if failed_ids:
+        remove_batch_state(state_dir)
+        raise RuntimeError(f"Error: Batch(es) {', '.join(failed_ids)} failed.")
+
+    pending_ids = [batch_id for batch_id in batch_ids if statuses[batch_id]["status"] not in batch_finished_statuses]
+    if pending_ids:
+        print(f"{len(pending_ids)} of {len(batch_ids)} batch(es) not finished yet: {', '.join(pending_ids)}, "
+              f"run again with --batch to collect the results!")
+        return None
+
+    batch_results = {}
+    for batch_id in batch_ids:
+        with span("download batch", "batch", {"batch_id": batch_id}):
+            batch_results.update(backend.download(batch_id))
+
+    return batch_results
+
+
+def write_batch_requests(backend, jobs, batch_dir):
+    # The requests are split into files within the limits of one job. Returns (path, hash, request count) of each.
+    for name in os.listdir(batch_dir):
+        if name.startswith(batch_requests_file_prefix) and name.endswith(".jsonl"):
+            os.remove(os.path.join(batch_dir, name))
+
+    parts = []
+    f = None
+    requests_path = None
+    digest = None
+    request_count = 0
+    file_bytes = 0
+    try:
+        for job in jobs:
+            plan = job["plan"]
+            for chunk_index, chunk in enumerate(plan["chunks"]):
+                request = backend.make_request(
+                    make_custom_id(job, chunk_index),
+                    plan["generate_prompt"](chunk),
+                    plan["make_response_schema"](chunk)
+                )
+                line = (json.dumps(request, ensure_ascii=False, sort_keys=True) + "\n").encode("utf-8")
+
+                is_full = f is not None and (
+                    (backend.max_requests and request_count >= backend.max_requests) or
+                    (backend.max_file_bytes and file_bytes + len(line) > backend.max_file_bytes)
+                )
+                if f is None or is_full:
+                    if f is not None:
+                        f.close()
+                        parts.append((requests_path, digest.hexdigest(), request_count))
+
+                    requests_path = os.path.join(batch_dir, f"{batch_requests_file_prefix}-{len(parts) + 1}.jsonl")
+                    f = open(requests_path, "wb")
+                    digest = hashlib.sha256()
+                    request_count = 0
+                    file_bytes = 0
+
+                f.write(line)
+                digest.update(line)
+                request_count += 1
+                file_bytes += len(line)
+    finally:
+        if f is not None:
+            f.close()
+
+    if f is not None:
+        parts.append((requests_path, digest.hexdigest(), request_count))
+
+    return parts
+
+
+def wait_for_batches(backend, batch_ids, poll_seconds, detach=False):
+    statuses = {}
+
+    while True:
+        for batch_id in batch_ids:
+            if batch_id in statuses and is_batch_done(statuses[batch_id]):
+                continue
+
+            status = backend.retrieve(batch_id)
+            statuses[batch_id] = status
+
+            print(f"Batch {batch_id}: {status['status']}, "
+                  f"{status['completed']} of {status['total']} request(s) done, {status['failed']} failed")
+
+        if detach or all(is_batch_done(status) for status in statuses.values()):
+            return statuses
+
+        time.sleep(poll_seconds)
+
+
+def is_batch_done(status):
+    return status["status"] in batch_finished_statuses or status["status"] == BATCH_FAILED
+
+
+def collect_batch_results(configuration, jobs, batch_results):
+    chunk_results = {}
+    missing_words_by_job = {}
+
+    for job in jobs:
+        plan = job["plan"]
+        chunk_results[job["index"]] = []
+
+        for chunk_index, chunk in enumerate(plan["chunks"]):
+            result = batch_results.get(make_custom_id(job, chunk_index))
+            translated = collect_batch_chunk(configuration, plan, chunk, result)
+            chunk_results[job["index"]].append(translated)
+
+            translated_keys = [{item["key"] for item in items} for items in translated.values()]
+            missing_words = [word for word in chunk if any(word["key"] not in keys for keys in translated_keys)]
+            if missing_words:
+                missing_words_by_job.setdefault(job["index"], []).extend(missing_words)
+
+    return chunk_results, missing_words_by_job
+
+
+def collect_batch_chunk(configuration, plan, words, result):
+    translated = {language: {} for language in plan["target_languages"]}
+
+    try:
+        with track_chunk_call(configuration, words, plan) as call:
+            try:
+                if result is None or "error" in result:
+                    raise RuntimeError(f"Batch request failed: {result['error'] if result else 'no response'}")
+
+                record_usage(configuration.ai_provider, **result["usage"])
+                collect_valid_items(plan["parse"](result["text"], words), words, translated)
+            finally:
+                call["strings"] = count_translated(words, translated)
+    except (ValueError, RuntimeError) as e:
+        if _is_debug:
+            print(f"{e}, requesting the strings directly")
+
+    return {language: list(items.values()) for language, items in translated.items()}
+
+
+def request_missing_words(configuration, work_units, jobs, missing_words_by_job, chunk_results):
+    # Strings missing from the batch results are requested directly, like in a run without `--batch`: the jobs run
+    # on the worker pool, their chunks concurrently up to the provider limit, with the usual retries
+    if not missing_words_by_job:
+        return
+
+    print(f"Requesting {sum(len(words) for words in missing_words_by_job.values())} string(s) missing from the "
+          f"batch results directly!")
+
+    max_input_tokens, max_output_tokens = get_chunk_token_budget(configuration)
+    retry_jobs = []
+    for job in jobs:
+        missing_words = missing_words_by_job.get(job["index"])
+        if missing_words:
+            plan = job["plan"]
+            chunks = make_chunks(missing_words, max_input_tokens, max_output_tokens // len(plan["target_languages"]))
+            retry_jobs.append({
+                "index": job["index"],
+                "module": work_units[job["unit_index"]]["module"],
+                "languages": plan["target_languages"],
+                "plan": dict(plan, chunks=chunks)
+            })
+
+    results = run_work_units(
+        retry_jobs,
+        lambda job: translate_chunks(configuration, job["plan"]),
+        configuration.concurrency
+    )
+
+    # The strings of the batch results take precedence over the requested ones
+    for job, results_of_job in zip(retry_jobs, results):
+        chunk_results[job["index"]] = results_of_job + chunk_results[job["index"]]
+
+
+def load_batch_state(state_dir):
+    state_path = os.path.join(state_dir, batch_state_file_name)
+    if not os.path.exists(state_path):
+        return None
+
+    try:
+        with open(state_path, "r", encoding="utf-8") as f:
+            state = json.load(f)
+    except (OSError, ValueError) as e:
+        print(f"Ignoring unreadable batch state {state_path}: {e}")
+        return None
+
+    return state if isinstance(state, dict) and state.get("batches") else None
+
+
+def save_batch_state(state_dir, state):
+    state_path = os.path.join(state_dir, batch_state_file_name)
+    with open(f"{state_path}.tmp", "w", encoding="utf-8") as f:
+        json.dump(state, f, indent=2)
+    os.replace(f"{state_path}.tmp", state_path)
+
+
+def remove_batch_state(state_dir):
+    state_path = os.path.join(state_dir, batch_state_file_name)
+    if os.path.exists(state_path):
+        os.remove(state_path)
+
+
+def format_time(timestamp):
+    return time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(timestamp))
@@ -0,0 +1,58 @@
+# Copyright 2025 Roman Likhachev
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from abc import ABC, abstractmethod
+
+# Statuses of a batch job, named like the OpenAI Batch API
+BATCH_VALIDATING = "validating"
+BATCH_IN_PROGRESS = "in_progress"
+BATCH_FINALIZING = "finalizing"
+BATCH_COMPLETED = "completed"
+BATCH_FAILED = "failed"
+BATCH_EXPIRED = "expired"
+BATCH_CANCELLING = "cancelling"
+BATCH_CANCELLED = "cancelled"
+
+# Results can be downloaded in these statuses, expired and cancelled jobs keep the requests that finished
+batch_finished_statuses = (BATCH_COMPLETED, BATCH_EXPIRED, BATCH_CANCELLED)
+batch_pending_statuses = (BATCH_VALIDATING, BATCH_IN_PROGRESS, BATCH_FINALIZING, BATCH_CANCELLING)
+
+
+# Lifecycle of one batch job of a provider:
+# - `make_request` turns a prompt into one line of the JSONL requests file
+# - `submit` uploads the file and starts the job, the returned id survives the process
+# - `retrieve` returns {"status": ..., "total": ..., "completed": ..., "failed": ...}
+# - `download` returns custom_id -> {"text": ..., "usage": {...}} or {"error": ...} once the job finished
+# Larger runs are split into several jobs within `max_requests` and `max_file_bytes` of one job, None is no limit.
+class BatchBackend(ABC):
+
+    name = None
+    max_requests = None
+    max_file_bytes = None
+
+    @abstractmethod
+    def make_request(self, custom_id, prompt, response_schema=None):
+        pass
+
+    @abstractmethod
+    def submit(self, requests_path):
+        pass
+
+    @abstractmethod
+    def retrieve(self, batch_id):
+        pass
+
+    @abstractmethod
+    def download(self, batch_id):
+        pass
@@ -0,0 +1,195 @@
+# Copyright 2025 Roman Likhachev
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import argparse
+import contextlib
+import io
+import os
+import resource
+import shutil
+import sys
+import tempfile
+import time
+
+import yaml
+
+from metrics import reset_usage
+from mock_gpt import get_mock_stats, reset_mock_stats
+from wire_encoding import wire_encodings
+
+benchmark_languages = [
+    "es", "fr", "de", "it", "pt", "ru", "ja", "zh", "ko", "tr",
+    "pl", "nl", "sv", "uk", "cs", "ar", "hi", "id", "vi", "th",
+]
+
+_is_debug = False
+
+
+def generate_project(project_dir, modules, strings, languages, settings):
+    if _is_debug:
+        print(f"Generate project with {modules} module(s) × {strings} string(s) × {languages} language(s)!")
+
+    config = {
+        "config": {
+            "appDescription": "Synthetic project generated by the AI Translator benchmark.",
+            "sourceLanguage": "en",
+            "targetLanguages": benchmark_languages[:languages],
+            "aiProvider": "mock",
+            "aiKey": "mock",
+            "aiModel": "mock",
+            "excludeTranslated": False,
+            "concurrency": settings["concurrency"],
+            "providerConcurrency": {"mock": settings["concurrency"]},
+            "multiLanguageBatchSize": settings["multi_language_batch_size"],
+            "streaming": settings["streaming"],
+            "deduplicate": not settings["no_deduplicate"],
+            "wireEncoding": settings["wire_encoding"],
+        },
+        "mock": settings["mock"],
+    }
+    if settings["chunk_token_budget"]:
+        config["config"]["chunkTokenBudget"] = settings["chunk_token_budget"]
+
+    with open(os.path.join(project_dir, "default-translator-config.yml"), "w", encoding="utf-8") as f:
+        yaml.safe_dump(config, f, sort_keys=False)
+
+    shutil.copy(
+        os.path.join(os.path.dirname(os.path.abspath(__file__)), "assets", "default-translator-prompt.txt"),
+        os.path.join(project_dir, "default-translator-prompt.txt")
+    )
+
+    for module_index in range(modules):
+        module_dir = os.path.join(project_dir, f"feature-{module_index}")
+        values_dir = os.path.join(module_dir, "src", "main", "res", "values")
+        os.makedirs(values_dir)
+
+        with open(os.path.join(module_dir, "translator-config.yml"), "w", encoding="utf-8") as f:
+            yaml.safe_dump({"config": {"moduleDescription": f"Feature screen number {module_index}."}}, f)
+
+        # The first strings of every module repeat across modules, like "OK" or "Cancel" in a real app
+        duplicate_count = int(strings * settings["duplicate_rate"])
+
+        with open(os.path.join(values_dir, "strings.xml"), "w", encoding="utf-8") as f:
+            f.write('<?xml version="1.0" encoding="utf-8"?>\n<resources>\n')
+            for string_index in range(strings):
+                if string_index < duplicate_count:
+                    text = f"Common text number {string_index}"
+                else:
+                    text = f"Sample text number {string_index} of screen {module_index}"
+                f.write(f'    <string name="feature_{module_index}_string_{string_index}">{text}</string>\n')
+            f.write("</resources>\n")
+
+
+def run_benchmark(args):
+    from aitranslator import main
+
+    project_dir = args.project_dir or tempfile.mkdtemp(prefix="aitranslator-benchmark-")
+    os.makedirs(project_dir, exist_ok=True)
+
+    settings = {
+        "concurrency": args.concurrency,
+        "multi_language_batch_size": args.multi_language_batch_size,
+        "chunk_token_budget": args.chunk_token_budget,
+        "streaming": args.streaming,
+        "duplicate_rate": args.duplicate_rate,
+        "no_deduplicate": args.no_deduplicate,
+        "wire_encoding": args.wire_encoding,
+        "mock": {
+            "latency": args.latency,
+            "tokenLatency": args.token_latency,
+            "errorRate": args.error_rate,
+            "rateLimitRate": args.rate_limit_rate,
+            "truncationRate": args.truncation_rate,
+            "retryAfter": args.retry_after,
+            "seed": args.seed,
+            "cacheMinTokens": args.cache_min_tokens,
+        },
+    }
+
+    try:
+        generate_project(project_dir, args.modules, args.strings, args.languages, settings)
+
+        reset_mock_stats()
+        reset_usage()
+        output = io.StringIO()
+
+        started_at = time.perf_counter()
+        with contextlib.redirect_stdout(output if args.quiet else sys.stdout):
+            main(project_dir, no_cache=not args.cache, use_async=args.use_async, report_json=args.report_json,
+                 trace_path=args.trace, batch="wait" if args.batch else None)
+        wall_time = time.perf_counter() - started_at
+
+        # ru_maxrss is reported in kilobytes on Linux and in bytes on macOS
+        peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        peak_rss_mb = peak_rss / (1024 * 1024) if sys.platform == "darwin" else peak_rss / 1024
+
+        stats = get_mock_stats()
+        total_strings = args.modules * args.strings * args.languages
+
+        print("\n===== BENCHMARK REPORT =====\n")
+        print(f"- Project             : {args.modules} module(s) × {args.strings} string(s) × "
+              f"{args.languages} language(s)")
+        print(f"- Mode                : {'async' if args.use_async else 'threads'}, concurrency {args.concurrency}, "
+              f"multi-language batch {args.multi_language_batch_size}")
+        print(f"- Wall time           : {wall_time:.3f} s")
+        print(f"- Requests            : {stats['requests']} ({stats['requests'] / wall_time:.2f} req/s)")
+        print(f"- Strings             : {total_strings} ({total_strings / wall_time:.2f} strings/s)")
+        print(f"- Tokens (estimated)  : {stats['input_tokens']} in ({stats['cached_tokens']} cached), "
+              f"{stats['output_tokens']} out")
+        print(f"- Failures injected   : {stats['errors']} error(s), {stats['rate_limited']} rate limit(s), "
+              f"{stats['truncated']} truncation(s)")
+        print(f"- Peak RSS            : {peak_rss_mb:.1f} MB")
+    finally:
+        if not args.project_dir and not args.keep:
+            shutil.rmtree(project_dir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        description="⏱️ AI Translator benchmark - Translate a synthetic Android project with the mock AI provider."
+    )
+    parser.add_argument("--modules", type=int, default=10, help="Number of modules")
+    parser.add_argument("--strings", type=int, default=50, help="Number of strings per module")
+    parser.add_argument("--languages", type=int, default=5, help="Number of target languages (up to 20)")
+    parser.add_argument("--concurrency", type=int, default=8, help="Number of parallel work units and requests")
+    parser.add_argument("--multi-language-batch-size", type=int, default=1, help="Languages per request")
+    parser.add_argument("--chunk-token-budget", type=int, default=0, help="Maximum estimated tokens per request")
+    parser.add_argument("--streaming", action="store_true", help="Stream the responses")
+    parser.add_argument("--duplicate-rate", type=float, default=0.0, help="Share of strings repeated in every module")
+    parser.add_argument("--no-deduplicate", action="store_true", help="Translate repeated strings in every module")
+    parser.add_argument("--wire-encoding", type=str, default="json", choices=wire_encodings,
+                        help="Encoding of the strings in prompts and responses")
+    parser.add_argument("--async", dest="use_async", action="store_true", help="Use the asyncio execution path")
+    parser.add_argument("--cache", action="store_true", help="Use the translation memory cache")
+    parser.add_argument("--latency", type=float, default=0.5, help="Mock seconds before the first token")
+    parser.add_argument("--token-latency", type=float, default=0.0, help="Mock seconds per generated token")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Mock probability of a 503 error")
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0, help="Mock probability of a 429 error")
+    parser.add_argument("--truncation-rate", type=float, default=0.0, help="Mock probability of a truncated response")
+    parser.add_argument("--retry-after", type=float, default=None, help="Mock Retry-After of 429 errors in seconds")
+    parser.add_argument("--cache-min-tokens", type=int, default=1024, help="Mock shortest cached prompt prefix")
+    parser.add_argument("--seed", type=int, default=None, help="Seed of the mock failures")
+    parser.add_argument("--project_dir", type=str, default=None, help="Generate the project here and keep it")
+    parser.add_argument("--keep", action="store_true", help="Keep the generated temporary project")
+    parser.add_argument("--report-json", type=str, default=None, help="Also write the run report to this file")
+    parser.add_argument("--batch", action="store_true", help="Send the requests as one mock batch job")
+    parser.add_argument("--trace", type=str, default=None, help="Write a Chrome trace-event file of the run")
+    parser.add_argument("--quiet", action="store_true", help="Hide the translator output")
+
+    args = parser.parse_args()
+
+    if args.languages > len(benchmark_languages):
+        parser.error(f"--languages must not exceed {len(benchmark_languages)}")
+
+    run_benchmark(args)
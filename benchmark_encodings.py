@@ -0,0 +1,117 @@
+# Copyright 2025 Roman Likhachev
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import argparse
+
+from client import __generate_prompt__, __generate_multi_language_prompt__, estimate_tokens
+from execute import parse_strings_file
+from wire_encoding import wire_encodings, format_response
+
+sample_words = [
+    {"key": "action_ok", "value": "OK"},
+    {"key": "action_cancel", "value": "Cancel"},
+    {"key": "action_retry", "value": "Retry"},
+    {"key": "action_save", "value": "Save"},
+    {"key": "action_delete", "value": "Delete"},
+    {"key": "loading", "value": "Loading…"},
+    {"key": "error_network", "value": "No internet connection. Check your network and try again."},
+    {"key": "error_unknown", "value": "Something went wrong"},
+    {"key": "quiz_title", "value": "Quiz"},
+    {"key": "quiz_start", "value": "Start the quiz"},
+    {"key": "quiz_question_counter", "value": "Question %1$d of %2$d"},
+    {"key": "quiz_correct", "value": "Correct!"},
+    {"key": "quiz_incorrect", "value": "Incorrect, the right answer is %s"},
+    {"key": "quiz_result", "value": "You answered %1$d of %2$d questions correctly"},
+    {"key": "settings_title", "value": "Settings"},
+    {"key": "settings_sound", "value": "Sound effects"},
+    {"key": "settings_vibration", "value": "Vibration"},
+    {"key": "settings_theme", "value": "Theme"},
+    {"key": "settings_theme_dark", "value": "Dark"},
+    {"key": "settings_theme_light", "value": "Light"},
+]
+
+
+def count_tokens(text, tokenizer):
+    if tokenizer is not None:
+        return len(tokenizer.encode(text))
+
+    return estimate_tokens(text)
+
+
+def get_tokenizer():
+    # Exact counts for OpenAI models when tiktoken is installed, the chunking estimate otherwise
+    try:
+        import tiktoken
+    except ImportError:
+        return None
+
+    return tiktoken.get_encoding("o200k_base")
+
+
+def run_benchmark(args):
+    words = parse_strings_file(args.strings, set()) if args.strings else sample_words
+    languages = ["es", "fr", "de", "it", "pt", "ru", "ja", "zh"][:args.languages]
+    tokenizer = get_tokenizer()
+
+    print("\n===== WIRE ENCODING BENCHMARK =====\n")
+    print(f"- Strings             : {len(words)}{' from ' + args.strings if args.strings else ' (sample module)'}")
+    print(f"- Languages           : {', '.join(languages)}")
+    print(f"- Token counts        : {'tiktoken o200k_base' if tokenizer else 'estimated, 3 characters per token'}")
+    print()
+    print(f"{'Encoding':<10} {'Input':>8} {'Output':>8} {'Total':>8} {'vs json':>8}")
+
+    baseline = None
+    for encoding in wire_encodings:
+        if len(languages) > 1:
+            prompt = __generate_multi_language_prompt__(
+                prompt_path=None,
+                app_description="Quiz Platform is a platform for creating and playing quizzes.",
+                module_description="Quiz screen.",
+                source_language="en",
+                target_languages=languages,
+                words=words,
+                encoding=encoding
+            )
+        else:
+            prompt = __generate_prompt__(
+                prompt_path=None,
+                app_description="Quiz Platform is a platform for creating and playing quizzes.",
+                module_description="Quiz screen.",
+                source_language="en",
+                target_language=languages[0],
+                words=words,
+                encoding=encoding
+            )
+
+        # The source text stands in for the translation, the overhead of the encoding is what is measured
+        response = format_response({language: words for language in languages}, encoding, len(languages) > 1)
+
+        input_tokens = count_tokens(prompt, tokenizer)
+        output_tokens = count_tokens(response, tokenizer)
+        total_tokens = input_tokens + output_tokens
+        if baseline is None:
+            baseline = total_tokens
+
+        print(f"{encoding:<10} {input_tokens:>8} {output_tokens:>8} {total_tokens:>8} "
+              f"{(total_tokens - baseline) / baseline:>+8.0%}")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        description="⏱️ AI Translator wire encoding benchmark - Count the tokens of every encoding on one module."
+    )
+    parser.add_argument("--strings", type=str, default=None, help="strings.xml to measure instead of the sample module")
+    parser.add_argument("--languages", type=int, default=1, help="Number of target languages per request (up to 8)")
+
+    run_benchmark(parser.parse_args())
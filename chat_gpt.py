@@ -12,18 +12,99 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
-from openai import OpenAI
+import json
+
+from ai_errors import RetryableError, parse_retry_after, retryable_status_codes
+from batch_backend import BatchBackend
+from metrics import record_usage
+from tracing import traced
 
 default_ai_model = "gpt-4.1-mini"
 gpt_temperature = 0.7
+
+# (max input tokens, max output tokens) per model
+model_token_limits = {
+    "gpt-4.1": (1_047_576, 32_768),
+    "gpt-4.1-mini": (1_047_576, 32_768),
+    "gpt-4.1-nano": (1_047_576, 32_768),
+    "gpt-4o": (128_000, 16_384),
+    "gpt-4o-mini": (128_000, 16_384),
+}
+default_token_limits = (128_000, 16_384)
+
+# (input, cached input, output) in USD per 1M tokens, list prices; override with `modelPrices`
+model_prices = {
+    "gpt-4.1": (2.00, 0.50, 8.00),
+    "gpt-4.1-mini": (0.40, 0.10, 1.60),
+    "gpt-4.1-nano": (0.10, 0.025, 0.40),
+    "gpt-4o": (2.50, 1.25, 10.00),
+    "gpt-4o-mini": (0.15, 0.075, 0.60),
+}
+price_currency = "USD"
+
+# Model name prefixes that support JSON-schema constrained output
+structured_output_models = ("gpt-4o", "gpt-4.1", "gpt-5", "o1", "o3", "o4")
+
+# Reasoning models only accept the default temperature and answer a request with `temperature` with a 400 error
+reasoning_models = ("gpt-5", "o1", "o3", "o4")
+
+supports_batch = True
+
 _is_debug = False
 
 
-def validate_openai_gpt(ai_key, ai_model):
+def create_session(ai_key, ai_folder, max_connections):
+    if _is_debug:
+        print(f"Creating OpenAI client with {max_connections} connection(s)!")
+
+    import httpx
+    from openai import OpenAI
+
+    # One httpx client keeps the TLS connections alive between requests, it is safe to share between threads.
+    # The request governor retries failed requests itself, the retries of the SDK would multiply its attempts and hide
+    # rate limits from its backoff, so they are turned off on every client.
+    http_client = httpx.Client(
+        limits=httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections),
+        timeout=httpx.Timeout(600.0, connect=10.0)
+    )
+
+    return OpenAI(api_key=ai_key, http_client=http_client, max_retries=0)
+
+
+def create_async_session(ai_key, ai_folder, max_connections):
+    if _is_debug:
+        print(f"Creating async OpenAI client with {max_connections} connection(s)!")
+
+    import httpx
+    from openai import AsyncOpenAI
+
+    http_client = httpx.AsyncClient(
+        limits=httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections),
+        timeout=httpx.Timeout(600.0, connect=10.0)
+    )
+
+    return AsyncOpenAI(api_key=ai_key, http_client=http_client, max_retries=0)
+
+
+# The SDK is imported by the functions that talk to the API, planning a run only needs the limits and prices above
+def create_client(ai_key):
+    from openai import OpenAI
+
+    return OpenAI(api_key=ai_key, max_retries=0)
+
+
+def create_async_client(ai_key):
+    from openai import AsyncOpenAI
+
+    return AsyncOpenAI(api_key=ai_key, max_retries=0)
+
+
+def validate(ai_key, ai_folder, ai_model, client=None):
     if _is_debug:
         print("Initializing OpenAI client!")
 
-    client = OpenAI(api_key=ai_key)
+    if client is None:
+        client = create_client(ai_key)
 
     try:
         if ai_model is None or ai_model == "":
@@ -31,7 +112,6 @@ def validate_openai_gpt(ai_key, ai_model):
 
         response = client.chat.completions.create(
             model=ai_model,
-            temperature=gpt_temperature,
             messages=[{"role": "user", "content": "Ping"}]
         )
 
@@ -45,32 +125,295 @@ def validate_openai_gpt(ai_key, ai_model):
         raise ValueError(f"Error: Failed to authenticate with OpenAI API. Exception: {e}")
 
 
-def translate_openai_gpt(ai_key, ai_model, prompt):
+def token_limits(ai_model):
+    if ai_model is None or ai_model == "":
+        ai_model = default_ai_model
+
+    return model_token_limits.get(ai_model, default_token_limits)
+
+
+def prices(ai_model):
+    if ai_model is None or ai_model == "":
+        ai_model = default_ai_model
+
+    return model_prices.get(ai_model), price_currency
+
+
+@traced("openai request", "network")
+def translate(ai_key, ai_folder, ai_model, prompt, client=None, response_schema=None):
     if _is_debug:
         print("Translating via OpenAI GPT...")
 
-    client = OpenAI(api_key=ai_key)
+    if client is None:
+        client = create_client(ai_key)
 
     try:
-        if ai_model is None or ai_model == "":
-            ai_model = default_ai_model
+        response = client.chat.completions.create(**build_translation_request(ai_model, prompt, response_schema))
+        record_response_usage(response)
 
-        response = client.chat.completions.create(
-            model=ai_model,
-            temperature=gpt_temperature,
-            messages=[
-                {"role": "developer",
-                 "content": "You are a professional translator specialized in UI/UX localization."},
-                {"role": "user", "content": prompt}
-            ]
+        return get_translation_text(response)
+    except Exception as e:
+        raise map_translation_error(e)
+
+
+@traced("openai request", "network")
+async def translate_async(ai_key, ai_folder, ai_model, prompt, client=None, response_schema=None):
+    if _is_debug:
+        print("Translating via OpenAI GPT (async)...")
+
+    if client is None:
+        client = create_async_client(ai_key)
+
+    try:
+        response = await client.chat.completions.create(**build_translation_request(ai_model, prompt, response_schema))
+        record_response_usage(response)
+
+        return get_translation_text(response)
+    except Exception as e:
+        raise map_translation_error(e)
+
+
+@traced("openai stream", "network")
+def stream(ai_key, ai_folder, ai_model, prompt, on_text, client=None, response_schema=None):
+    if _is_debug:
+        print("Streaming translation via OpenAI GPT...")
+
+    if client is None:
+        client = create_client(ai_key)
+
+    try:
+        stream = client.chat.completions.create(
+            **build_translation_request(ai_model, prompt, response_schema),
+            stream=True,
+            stream_options={"include_usage": True}
         )
+        try:
+            parts = []
+            for chunk in stream:
+                # The last chunk carries the usage of the whole response
+                record_response_usage(chunk)
+                delta = get_stream_delta(chunk)
+                if delta:
+                    parts.append(delta)
+                    on_text(delta)
+        finally:
+            stream.close()
 
-        if not response.choices:
-            raise ValueError("No translation response received.")
+        return "".join(parts)
+    except ValueError:
+        # Raised by `on_text` to stop reading a response that went wrong
+        raise
+    except Exception as e:
+        raise map_translation_error(e)
 
-        return response.choices[0].message.content
+
+@traced("openai stream", "network")
+async def stream_async(ai_key, ai_folder, ai_model, prompt, on_text, client=None, response_schema=None):
+    if _is_debug:
+        print("Streaming translation via OpenAI GPT (async)...")
+
+    if client is None:
+        client = create_async_client(ai_key)
+
+    try:
+        stream = await client.chat.completions.create(
+            **build_translation_request(ai_model, prompt, response_schema),
+            stream=True,
+            stream_options={"include_usage": True}
+        )
+        try:
+            parts = []
+            async for chunk in stream:
+                # The last chunk carries the usage of the whole response
+                record_response_usage(chunk)
+                delta = get_stream_delta(chunk)
+                if delta:
+                    parts.append(delta)
+                    on_text(delta)
+        finally:
+            await stream.close()
+
+        return "".join(parts)
+    except ValueError:
+        # Raised by `on_text` to stop reading a response that went wrong
+        raise
     except Exception as e:
-        if "401" in str(e) or "unauthorized" in str(e).lower():
-            raise PermissionError("Unauthorized: Invalid API key or access denied.")
-        else:
-            raise RuntimeError(f"Translation failed: {e}")
+        raise map_translation_error(e)
+
+
+# OpenAI Batch API: the requests are uploaded as a JSONL file and answered within 24 hours at half the price
+class OpenAIBatchBackend(BatchBackend):
+
+    name = "openai"
+    endpoint = "/v1/chat/completions"
+    completion_window = "24h"
+    max_requests = 50000
+    max_file_bytes = 200 * 1024 * 1024
+
+    def __init__(self, ai_key, ai_model, client=None):
+        self.ai_model = ai_model
+        # A failed poll stops the run, the submitted batch is saved and polled again by the next run
+        self.client = client or create_client(ai_key)
+
+    def make_request(self, custom_id, prompt, response_schema=None):
+        return {
+            "custom_id": custom_id,
+            "method": "POST",
+            "url": self.endpoint,
+            "body": build_translation_request(self.ai_model, prompt, response_schema)
+        }
+
+    def submit(self, requests_path):
+        try:
+            with open(requests_path, "rb") as f:
+                input_file = self.client.files.create(file=f, purpose="batch")
+
+            batch = self.client.batches.create(
+                input_file_id=input_file.id,
+                endpoint=self.endpoint,
+                completion_window=self.completion_window
+            )
+        except Exception as e:
+            raise map_translation_error(e)
+
+        if _is_debug:
+            print(f"Submitted OpenAI batch {batch.id}")
+
+        return batch.id
+
+    def retrieve(self, batch_id):
+        try:
+            batch = self.client.batches.retrieve(batch_id)
+        except Exception as e:
+            raise map_translation_error(e)
+
+        counts = batch.request_counts
+        return {
+            "status": batch.status,
+            "total": getattr(counts, "total", 0) if counts else 0,
+            "completed": getattr(counts, "completed", 0) if counts else 0,
+            "failed": getattr(counts, "failed", 0) if counts else 0,
+            "output_file_id": batch.output_file_id,
+            "error_file_id": batch.error_file_id
+        }
+
+    def download(self, batch_id):
+        status = self.retrieve(batch_id)
+
+        results = {}
+        for file_id in (status["output_file_id"], status["error_file_id"]):
+            if not file_id:
+                continue
+
+            try:
+                content = self.client.files.content(file_id).text
+            except Exception as e:
+                raise map_translation_error(e)
+
+            for line in content.splitlines():
+                if line.strip():
+                    item = json.loads(line)
+                    results[item["custom_id"]] = parse_batch_result(item)
+
+        return results
+
+
+def parse_batch_result(item):
+    response = item.get("response") or {}
+    body = response.get("body") or {}
+
+    if response.get("status_code") != 200 or not body.get("choices"):
+        error = item.get("error") or body.get("error") or {"message": f"status {response.get('status_code')}"}
+        return {"error": error.get("message", str(error)) if isinstance(error, dict) else str(error)}
+
+    usage = body.get("usage") or {}
+    return {
+        "text": body["choices"][0]["message"]["content"],
+        "usage": {
+            "input_tokens": usage.get("prompt_tokens", 0),
+            "cached_tokens": (usage.get("prompt_tokens_details") or {}).get("cached_tokens", 0),
+            "output_tokens": usage.get("completion_tokens", 0)
+        }
+    }
+
+
+def create_batch_backend(ai_key, ai_folder, ai_model, state_dir=None):
+    return OpenAIBatchBackend(ai_key, ai_model)
+
+
+def record_response_usage(response):
+    usage = getattr(response, "usage", None)
+    if usage is None:
+        return
+
+    prompt_tokens_details = getattr(usage, "prompt_tokens_details", None)
+    record_usage(
+        "openai",
+        input_tokens=usage.prompt_tokens,
+        cached_tokens=getattr(prompt_tokens_details, "cached_tokens", 0),
+        output_tokens=usage.completion_tokens
+    )
+
+
+def get_stream_delta(chunk):
+    if not chunk.choices:
+        return None
+
+    return chunk.choices[0].delta.content
+
+
+def build_translation_request(ai_model, prompt, response_schema=None):
+    if ai_model is None or ai_model == "":
+        ai_model = default_ai_model
+
+    request = {
+        "model": ai_model,
+        "messages": [
+            {"role": "developer",
+             "content": "You are a professional translator specialized in UI/UX localization."},
+            {"role": "user", "content": prompt}
+        ]
+    }
+
+    if not ai_model.startswith(reasoning_models):
+        request["temperature"] = gpt_temperature
+
+    if response_schema is not None and ai_model.startswith(structured_output_models):
+        request["response_format"] = {
+            "type": "json_schema",
+            "json_schema": {
+                "name": "translations",
+                "strict": True,
+                "schema": response_schema
+            }
+        }
+
+    return request
+
+
+def get_translation_text(response):
+    if not response.choices:
+        raise ValueError("No translation response received.")
+
+    return response.choices[0].message.content
+
+
+def map_translation_error(e):
+    from openai import APIConnectionError, APITimeoutError, AuthenticationError, InternalServerError, RateLimitError
+
+    status_code = getattr(e, "status_code", None)
+    response = getattr(e, "response", None)
+    headers = getattr(response, "headers", None) or {}
+
+    # The SDK wraps timeouts and connection failures of httpx in its own errors, they carry no status code
+    if isinstance(e, AuthenticationError) or status_code == 401:
+        return PermissionError("Unauthorized: Invalid API key or access denied.")
+    elif isinstance(e, (APIConnectionError, APITimeoutError, RateLimitError, InternalServerError)) \
+            or status_code in retryable_status_codes:
+        return RetryableError(
+            f"Translation failed: {e}",
+            status_code=status_code,
+            retry_after=parse_retry_after(headers.get("retry-after"))
+        )
+    else:
+        return RuntimeError(f"Translation failed: {e}")
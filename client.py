@@ -11,19 +11,46 @@
 # WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
 # See the License for the specific language governing permissions and
 # limitations under the License.
-from ai_client import validate_ai, translate_ai
+from ai_client import validate_ai, translate_ai, set_provider_concurrency, get_provider_concurrency, token_limits_ai, \
+    close_sessions, translate_ai_async, close_async_sessions, set_provider_rate_limits, set_max_retries, \
+    set_mock_provider_settings, translate_ai_stream, translate_ai_stream_async, prices_ai
+from ai_errors import RetryableError
+from metrics import track_call, mark_first_token
+from tracing import span, traced
+from json_stream import JsonItemDecoder, JsonMemberDecoder, salvage_items, salvage_members
 from models import Configuration
+from translation_cache import hash_text, make_cache_key
+from validation_cache import make_credentials_fingerprint, is_validation_fresh, save_validation
+from wire_encoding import ENCODING_JSON, ENCODING_KEYED, ENCODING_LINES, LineItemDecoder, decode_lines, encode_words, \
+    get_response_format
+import functools
 import json
 import pycountry
 import os
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
 
 _is_debug = False
 
+_multi_language_template_lock = threading.Lock()
 
-def validate(config: Configuration):
+# Credentials of the run, validated before its first request that the cache does not answer
+_validation_lock = threading.Lock()
+_pending_validation = None
+_validation_error = None
+
+
+def validate(config: Configuration, state_dir=None):
     if _is_debug:
         print("Validate!")
 
+    # The validation request is a paid round-trip, credentials validated within the TTL are trusted
+    ttl_seconds = config.validation_ttl_hours * 3600
+    fingerprint = make_credentials_fingerprint(config.ai_provider, config.ai_key, config.ai_folder, config.ai_model)
+    if is_validation_fresh(state_dir, fingerprint, ttl_seconds):
+        return
+
     validate_ai(
         ai_provider=config.ai_provider,
         ai_key=config.ai_key,
@@ -31,29 +58,586 @@ def validate(config: Configuration):
         ai_model=config.ai_model
     )
 
+    save_validation(state_dir, fingerprint, ttl_seconds)
+
+
+def validate_lazily(config: Configuration, state_dir=None):
+    global _pending_validation, _validation_error
+
+    with _validation_lock:
+        _pending_validation = (config, state_dir)
+        _validation_error = None
+
+
+def ensure_validated():
+    global _pending_validation, _validation_error
+
+    # Every worker waits for the one that validates, a failed validation fails all of them
+    with _validation_lock:
+        if _validation_error is not None:
+            raise _validation_error
+        if _pending_validation is None:
+            return
+
+        config, state_dir = _pending_validation
+        try:
+            with span("validate client", "client", {"ai_provider": config.ai_provider}):
+                validate(config, state_dir)
+        except Exception as e:
+            _validation_error = e
+            raise
+        finally:
+            _pending_validation = None
+
+
+def configure_requests(config: Configuration):
+    if _is_debug:
+        print("Configure requests!")
+
+    for ai_provider, limit in config.provider_concurrency.items():
+        set_provider_concurrency(ai_provider, limit)
+
+    for ai_provider, rate_limits in config.provider_rate_limits.items():
+        set_provider_rate_limits(
+            ai_provider,
+            requests_per_minute=rate_limits.get("requestsPerMinute"),
+            tokens_per_minute=rate_limits.get("tokensPerMinute")
+        )
 
-def translate(prompt_path, global_config, module_description, target_language, words):
+    set_max_retries(config.max_retries)
+
+    if config.mock_settings:
+        set_mock_provider_settings(config.mock_settings)
+
+
+def close_clients():
+    if _is_debug:
+        print("Close clients!")
+
+    close_sessions()
+
+
+async def close_clients_async():
+    if _is_debug:
+        print("Close async clients!")
+
+    await close_async_sessions()
+
+
+def translate(prompt_path, global_config, module_description, target_language, words, cache=None, module=None):
     if _is_debug:
         print("Translate!")
 
-    prompt = __generate_prompt__(
-        prompt_path=prompt_path,
-        app_description=global_config.app_description,
-        module_description=module_description,
-        source_language=global_config.source_language,
-        target_language=target_language,
-        words=words
+    plan = plan_translation(prompt_path, global_config, module_description, [target_language], words, cache,
+                            module)
+    chunk_results = translate_chunks(global_config, plan)
+
+    return finish_translation(plan, chunk_results)[target_language]
+
+
+def translate_multi(prompt_path, global_config, module_description, target_languages, words, cache=None,
+                    module=None):
+    if _is_debug:
+        print(f"Translate to {len(target_languages)} languages!")
+
+    plan = plan_translation(prompt_path, global_config, module_description, target_languages, words, cache, module)
+    chunk_results = translate_chunks(global_config, plan)
+
+    return finish_translation(plan, chunk_results)
+
+
+async def translate_async(prompt_path, global_config, module_description, target_language, words, cache=None,
+                          module=None):
+    if _is_debug:
+        print("Translate (async)!")
+
+    plan = plan_translation(prompt_path, global_config, module_description, [target_language], words, cache,
+                            module)
+    chunk_results = await translate_chunks_async(global_config, plan)
+
+    return finish_translation(plan, chunk_results)[target_language]
+
+
+async def translate_multi_async(prompt_path, global_config, module_description, target_languages, words, cache=None,
+                                module=None):
+    if _is_debug:
+        print(f"Translate to {len(target_languages)} languages (async)!")
+
+    plan = plan_translation(prompt_path, global_config, module_description, target_languages, words, cache, module)
+    chunk_results = await translate_chunks_async(global_config, plan)
+
+    return finish_translation(plan, chunk_results)
+
+
+def plan_translation(prompt_path, global_config, module_description, target_languages, words, cache, module=None):
+    with span("plan translation", "client", {"languages": target_languages, "strings": len(words)}):
+        return make_translation_plan(prompt_path, global_config, module_description, target_languages, words, cache,
+                                     module)
+
+
+def make_translation_plan(prompt_path, global_config, module_description, target_languages, words, cache, module):
+    is_multi_language = len(target_languages) > 1
+
+    # Entries are keyed on what the translation into one language depends on: the project prompt, not the template
+    # of the request, so that single and multi-language requests of the same strings share them
+    prompt_hash = hash_text(load_prompt_template(prompt_path)) if cache is not None else None
+
+    cache_lookups = {
+        language: lookup_cache(cache, prompt_hash, global_config, module_description, language, words)
+        for language in target_languages
+    }
+
+    # One request carries the union of the words missing in any of the languages
+    missing_keys = {
+        word["key"]
+        for word in words
+        for language in target_languages
+        if word["key"] not in cache_lookups[language][1]
+    }
+    missing_words = [word for word in words if word["key"] in missing_keys]
+
+    encoding = global_config.wire_encoding
+
+    if is_multi_language:
+        def generate_prompt(chunk):
+            return __generate_multi_language_prompt__(
+                prompt_path=prompt_path,
+                app_description=global_config.app_description,
+                module_description=module_description,
+                source_language=global_config.source_language,
+                target_languages=target_languages,
+                words=chunk,
+                encoding=encoding
+            )
+    else:
+        def generate_prompt(chunk):
+            return __generate_prompt__(
+                prompt_path=prompt_path,
+                app_description=global_config.app_description,
+                module_description=module_description,
+                source_language=global_config.source_language,
+                target_language=target_languages[0],
+                words=chunk,
+                encoding=encoding
+            )
+
+    def make_response_schema(chunk):
+        if not global_config.structured_output:
+            return None
+
+        return build_response_schema(target_languages, encoding, chunk)
+
+    if missing_words:
+        max_input_tokens, max_output_tokens = get_chunk_token_budget(global_config)
+        chunks = make_chunks(missing_words, max_input_tokens, max_output_tokens // len(target_languages))
+    else:
+        # Everything came from the cache, the provider is not even loaded
+        chunks = []
+
+    if _is_debug:
+        print(f"Split {len(missing_words)} string(s) into {len(chunks)} chunk(s)")
+
+    return {
+        "target_languages": target_languages,
+        "words": words,
+        "missing_words": missing_words,
+        "chunks": chunks,
+        "cache": cache,
+        "cache_lookups": cache_lookups,
+        # Label of the per-call metrics
+        "module": module,
+        "encoding": encoding,
+        "generate_prompt": traced("build prompt", "client", generate_prompt),
+        "parse": traced("parse response", "client", make_parse(encoding, target_languages)),
+        "make_response_schema": make_response_schema,
+        "streaming": global_config.streaming
+    }
+
+
+def finish_translation(plan, chunk_results):
+    language_with_words = {}
+
+    for language in plan["target_languages"]:
+        cache_keys, cached_values = plan["cache_lookups"][language]
+
+        translated_by_key = collect_translated_words(
+            plan["missing_words"],
+            [chunk_result.get(language, []) for chunk_result in chunk_results]
+        )
+        store_cache(plan["cache"], cache_keys, translated_by_key)
+
+        language_with_words[language] = merge_words(plan["words"], cached_values, translated_by_key)
+
+    return language_with_words
+
+
+def lookup_cache(cache, prompt_hash, global_config, module_description, target_language, words):
+    if cache is None:
+        return {}, {}
+
+    cache_keys = {
+        word["key"]: make_cache_key(
+            source_value=word["value"],
+            source_language=global_config.source_language,
+            target_language=target_language,
+            ai_provider=global_config.ai_provider,
+            ai_model=global_config.ai_model,
+            app_description=global_config.app_description,
+            module_description=module_description,
+            prompt_hash=prompt_hash
+        )
+        for word in words
+    }
+    found = cache.get_many(list(cache_keys.values()))
+    cached_values = {key: found[cache_key] for key, cache_key in cache_keys.items() if cache_key in found}
+
+    if _is_debug:
+        print(f"Translation cache ({target_language}): {len(cached_values)} hit(s), "
+              f"{len(words) - len(cached_values)} miss(es)")
+
+    return cache_keys, cached_values
+
+
+def store_cache(cache, cache_keys, translated_by_key):
+    if cache is None:
+        return
+
+    cache.put_many(
+        {
+            cache_keys[key]: word["value"]
+            for key, word in translated_by_key.items()
+            if isinstance(word.get("value"), str) and word["value"]
+        }
+    )
+
+
+def collect_translated_words(requested_words, chunk_results):
+    requested_keys = {word["key"] for word in requested_words}
+    translated_by_key = {}
+
+    for chunk_result in chunk_results:
+        for word in chunk_result:
+            if isinstance(word, dict) and word.get("key") in requested_keys:
+                translated_by_key[word["key"]] = word
+
+    return translated_by_key
+
+
+def merge_words(words, cached_values, translated_by_key):
+    # Merge cached and translated words back in the order of the source keys
+    result = []
+    for word in words:
+        if word["key"] in cached_values:
+            result.append({"key": word["key"], "value": cached_values[word["key"]]})
+        elif word["key"] in translated_by_key:
+            result.append(translated_by_key[word["key"]])
+
+    return result
+
+
+def translate_chunks(global_config, plan):
+    chunks = plan["chunks"]
+    if chunks:
+        ensure_validated()
+
+    if len(chunks) <= 1:
+        return [translate_chunk_traced(global_config, chunk, plan) for chunk in chunks]
+
+    max_workers = min(len(chunks), get_provider_concurrency(global_config.ai_provider))
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        return list(executor.map(lambda chunk: translate_chunk_traced(global_config, chunk, plan, track=True), chunks))
+
+
+async def translate_chunks_async(global_config, plan):
+    if plan["chunks"]:
+        # The validation request is blocking, the event loop keeps serving the units answered by the cache
+        await asyncio.get_running_loop().run_in_executor(None, ensure_validated)
+
+    async def translate_chunk_traced_async(chunk):
+        # Chunks run concurrently on the event loop, each takes a lane of its own in the trace
+        with span_chunk(plan, chunk, track=len(plan["chunks"]) > 1):
+            return await translate_chunk_async(global_config, chunk, plan)
+
+    return list(await asyncio.gather(*[translate_chunk_traced_async(chunk) for chunk in plan["chunks"]]))
+
+
+def translate_chunk_traced(global_config, words, plan, track=False):
+    with span_chunk(plan, words, track):
+        return translate_chunk(global_config, words, plan)
+
+
+def span_chunk(plan, words, track=False):
+    return span(
+        f"chunk of {len(words)} string(s)",
+        "client",
+        {"module": plan["module"], "languages": plan["target_languages"], "strings": len(words)},
+        track=track
     )
 
-    result = translate_ai(
+
+def translate_chunk(global_config, words, plan):
+    steps = make_chunk_steps(global_config, words, plan)
+    try:
+        step = next(steps)
+        while True:
+            try:
+                result = request_chunk(global_config, plan, *step)
+            except BaseException as e:
+                step = steps.throw(e)
+            else:
+                step = steps.send(result)
+    except StopIteration as stop:
+        return stop.value
+
+
+async def translate_chunk_async(global_config, words, plan):
+    steps = make_chunk_steps(global_config, words, plan)
+    try:
+        step = next(steps)
+        while True:
+            try:
+                result = await request_chunk_async(global_config, plan, *step)
+            except BaseException as e:
+                step = steps.throw(e)
+            else:
+                step = steps.send(result)
+    except StopIteration as stop:
+        return stop.value
+
+
+# The retry loop of one chunk, shared by the sync and async paths. It yields the words of every request together with
+# the items translated so far, is sent the response text or thrown the error of the request, and returns the items.
+def make_chunk_steps(global_config, words, plan):
+    translated = {language: {} for language in plan["target_languages"]}
+    pending_words = words
+
+    attempt = 0
+    while True:
+        try:
+            with track_chunk_call(global_config, pending_words, plan) as call:
+                translated_before = count_translated(pending_words, translated)
+                try:
+                    result = yield pending_words, translated
+                    # With streaming this picks up what the incremental decoder could not finish, like the last line
+                    collect_valid_items(plan["parse"](result, pending_words), pending_words, translated)
+                finally:
+                    call["strings"] = count_translated(pending_words, translated) - translated_before
+            error = None
+        except RetryableError:
+            # Already retried by the request governor
+            raise
+        except (ValueError, RuntimeError) as e:
+            error = e
+
+        pending_words, attempt = get_words_to_rerequest(global_config, words, translated, error, attempt)
+        if not pending_words:
+            return {language: list(items.values()) for language, items in translated.items()}
+
+
+def request_chunk(global_config, plan, words, translated):
+    if plan["streaming"]:
+        return translate_ai_stream(
+            ai_provider=global_config.ai_provider,
+            ai_key=global_config.ai_key,
+            ai_folder=global_config.ai_folder,
+            ai_model=global_config.ai_model,
+            prompt=plan["generate_prompt"](words),
+            on_start=make_stream_collector(plan, words, translated),
+            response_schema=plan["make_response_schema"](words)
+        )
+
+    return translate_ai(
         ai_provider=global_config.ai_provider,
         ai_key=global_config.ai_key,
         ai_folder=global_config.ai_folder,
         ai_model=global_config.ai_model,
-        prompt=prompt
+        prompt=plan["generate_prompt"](words),
+        response_schema=plan["make_response_schema"](words)
+    )
+
+
+async def request_chunk_async(global_config, plan, words, translated):
+    if plan["streaming"]:
+        return await translate_ai_stream_async(
+            ai_provider=global_config.ai_provider,
+            ai_key=global_config.ai_key,
+            ai_folder=global_config.ai_folder,
+            ai_model=global_config.ai_model,
+            prompt=plan["generate_prompt"](words),
+            on_start=make_stream_collector(plan, words, translated),
+            response_schema=plan["make_response_schema"](words)
+        )
+
+    return await translate_ai_async(
+        ai_provider=global_config.ai_provider,
+        ai_key=global_config.ai_key,
+        ai_folder=global_config.ai_folder,
+        ai_model=global_config.ai_model,
+        prompt=plan["generate_prompt"](words),
+        response_schema=plan["make_response_schema"](words)
+    )
+
+
+def track_chunk_call(global_config, words, plan):
+    return track_call(
+        ai_provider=global_config.ai_provider,
+        ai_model=global_config.ai_model,
+        module=plan["module"],
+        languages=plan["target_languages"],
+        chunk_size=len(words),
+        streaming=plan["streaming"]
+    )
+
+
+def count_translated(requested_words, translated):
+    return sum(1 for items in translated.values() for word in requested_words if word["key"] in items)
+
+
+def make_stream_collector(plan, requested_words, translated):
+    target_languages = plan["target_languages"]
+    requested_keys = {word["key"] for word in requested_words}
+
+    def on_start():
+        decoder = make_item_decoder(plan["encoding"], target_languages, requested_words)
+
+        def on_text(delta):
+            mark_first_token()
+
+            for language, item in decoder.feed(delta):
+                language = language if len(target_languages) > 1 else target_languages[0]
+
+                # Stop reading as soon as the model answers with something that was not asked for
+                if language not in translated or not is_valid_item(item, requested_keys):
+                    raise ValueError(f"Unexpected item in response: {language}: {item}")
+
+                translated[language][item["key"]] = item
+
+        return on_text
+
+    return on_start
+
+
+def collect_valid_items(parsed, requested_words, translated):
+    requested_keys = {word["key"] for word in requested_words}
+
+    for language, items in parsed.items():
+        if language not in translated or not isinstance(items, list):
+            continue
+
+        for item in items:
+            if is_valid_item(item, requested_keys):
+                translated[language][item["key"]] = item
+            elif _is_debug:
+                print(f"Skipping invalid item in response: {language}: {item}")
+
+
+def is_valid_item(item, requested_keys):
+    return (
+            isinstance(item, dict) and
+            item.get("key") in requested_keys and
+            isinstance(item.get("value"), str) and
+            item["value"] != ""
     )
 
-    return parse_(result)
+
+def get_words_to_rerequest(global_config, words, translated, error, attempt):
+    # Items that arrived before a truncation or an invalid item are kept, only the missing keys are asked again
+    missing_words = [
+        word for word in words
+        if any(word["key"] not in items for items in translated.values())
+    ]
+
+    if not missing_words:
+        return [], attempt
+
+    attempt += 1
+    if attempt > global_config.chunk_retries:
+        # Nothing usable came back at all, the request itself is broken
+        if len(missing_words) == len(words):
+            if error is not None:
+                raise error
+            raise ValueError(f"Response is missing all {len(words)} string(s)")
+
+        # The rest is left out of the file and translated again on the next run
+        print(f"⚠️ Skipping {len(missing_words)} of {len(words)} string(s) still missing after "
+              f"{global_config.chunk_retries} retries: {', '.join(word['key'] for word in missing_words)}")
+        return [], attempt
+
+    if _is_debug:
+        print(f"Re-requesting {len(missing_words)} of {len(words)} string(s) after error: {error}")
+
+    return missing_words, attempt
+
+
+def get_chunk_token_budget(global_config):
+    max_input_tokens, max_output_tokens = token_limits_ai(global_config.ai_provider, global_config.ai_model)
+
+    # Leave headroom for the instructions and for inaccurate estimates
+    input_budget = max_input_tokens // 2
+    output_budget = max_output_tokens // 2
+
+    if global_config.chunk_token_budget:
+        input_budget = min(input_budget, global_config.chunk_token_budget)
+        output_budget = min(output_budget, global_config.chunk_token_budget)
+
+    return input_budget, output_budget
+
+
+def get_model_prices(global_config):
+    # (input, cached input, output) per 1M tokens and the currency, None prices when the model is unknown
+    prices, currency = prices_ai(global_config.ai_provider, global_config.ai_model)
+
+    if global_config.model_price:
+        price = global_config.model_price
+        input_price = price.get("input", 0.0)
+        prices = (input_price, price.get("cachedInput", input_price), price.get("output", 0.0))
+        currency = price.get("currency", currency)
+
+    return prices, currency
+
+
+def estimate_tokens(text):
+    # Roughly 3 characters per token, which is pessimistic for English and closer for other scripts
+    return len(text) // 3 + 1
+
+
+def estimate_word_tokens(word):
+    key_tokens = estimate_tokens(word["key"])
+    value_tokens = estimate_tokens(word["value"])
+
+    # Each JSON item adds braces, quotes and field names; translations are usually longer than the source
+    input_tokens = key_tokens + value_tokens + 8
+    output_tokens = key_tokens + value_tokens * 2 + 8
+
+    return input_tokens, output_tokens
+
+
+def make_chunks(words, max_input_tokens, max_output_tokens):
+    chunks = []
+    chunk = []
+    chunk_input_tokens = 0
+    chunk_output_tokens = 0
+
+    for word in words:
+        input_tokens, output_tokens = estimate_word_tokens(word)
+
+        if chunk and (
+                chunk_input_tokens + input_tokens > max_input_tokens or
+                chunk_output_tokens + output_tokens > max_output_tokens
+        ):
+            chunks.append(chunk)
+            chunk = []
+            chunk_input_tokens = 0
+            chunk_output_tokens = 0
+
+        chunk.append(word)
+        chunk_input_tokens += input_tokens
+        chunk_output_tokens += output_tokens
+
+    if chunk:
+        chunks.append(chunk)
+
+    return chunks
 
 
 def parse_(response_text):
@@ -67,46 +651,275 @@ def parse_(response_text):
 
         return json.loads(json_str)
     except Exception as e:
+        # Keep every complete item of a truncated or partly malformed response
+        items = [item for _, item in salvage_items(response_text or "", root="[")]
+        if items:
+            if _is_debug:
+                print(f"Salvaged {len(items)} item(s) from a malformed response: {e}")
+            return items
+
+        raise ValueError(f"Failed to parse response: {e}\nOriginal response: {response_text}")
+
+
+def parse_multi_(response_text):
+    if _is_debug:
+        print(f"Parsing multi-language GPT response: {response_text}")
+
+    try:
+        json_start = response_text.find('{')
+        json_end = response_text.rfind('}') + 1
+        json_str = response_text[json_start:json_end]
+
+        result = json.loads(json_str)
+        if not isinstance(result, dict):
+            raise ValueError("Expected a JSON object keyed by language code")
+
+        return result
+    except Exception as e:
+        result = {}
+        for language, item in salvage_items(response_text or "", root="{"):
+            result.setdefault(language, []).append(item)
+        if result:
+            if _is_debug:
+                print(f"Salvaged {sum(len(items) for items in result.values())} item(s) from a malformed response: {e}")
+            return result
+
+        raise ValueError(f"Failed to parse response: {e}\nOriginal response: {response_text}")
+
+
+def parse_keyed_(response_text):
+    if _is_debug:
+        print(f"Parsing keyed GPT response: {response_text}")
+
+    try:
+        json_start = response_text.find('{')
+        json_end = response_text.rfind('}') + 1
+        result = json.loads(response_text[json_start:json_end])
+        if not isinstance(result, dict):
+            raise ValueError("Expected a JSON object keyed by string key")
+
+        return [{"key": key, "value": value} for key, value in result.items()]
+    except Exception as e:
+        items = [item for _, item in salvage_members(response_text or "")]
+        if items:
+            return items
+
+        raise ValueError(f"Failed to parse response: {e}\nOriginal response: {response_text}")
+
+
+def parse_keyed_multi_(response_text):
+    if _is_debug:
+        print(f"Parsing multi-language keyed GPT response: {response_text}")
+
+    try:
+        json_start = response_text.find('{')
+        json_end = response_text.rfind('}') + 1
+        result = json.loads(response_text[json_start:json_end])
+        if not isinstance(result, dict) or not all(isinstance(values, dict) for values in result.values()):
+            raise ValueError("Expected a JSON object of objects keyed by language code")
+
+        return {
+            language: [{"key": key, "value": value} for key, value in values.items()]
+            for language, values in result.items()
+        }
+    except Exception as e:
+        result = {}
+        for language, item in salvage_members(response_text or "", nested=True):
+            result.setdefault(language, []).append(item)
+        if result:
+            return result
+
         raise ValueError(f"Failed to parse response: {e}\nOriginal response: {response_text}")
 
 
+def parse_lines_(response_text, words):
+    if _is_debug:
+        print(f"Parsing numbered lines GPT response: {response_text}")
+
+    items = [item for _, item in decode_lines(response_text or "", words)]
+    if not items:
+        raise ValueError(f"Failed to parse response: no numbered lines\nOriginal response: {response_text}")
+
+    return items
+
+
+def parse_lines_multi_(response_text, words):
+    if _is_debug:
+        print(f"Parsing multi-language numbered lines GPT response: {response_text}")
+
+    result = {}
+    for language, item in decode_lines(response_text or "", words, is_multi_language=True):
+        if language is not None:
+            result.setdefault(language, []).append(item)
+    if not result:
+        raise ValueError(f"Failed to parse response: no language sections\nOriginal response: {response_text}")
+
+    return result
+
+
+def make_parse(encoding, target_languages):
+    is_multi_language = len(target_languages) > 1
+
+    # Every parser answers {language: items}
+    if encoding == ENCODING_KEYED:
+        if is_multi_language:
+            return lambda response_text, words: parse_keyed_multi_(response_text)
+        return lambda response_text, words: {target_languages[0]: parse_keyed_(response_text)}
+    elif encoding == ENCODING_LINES:
+        if is_multi_language:
+            return parse_lines_multi_
+        return lambda response_text, words: {target_languages[0]: parse_lines_(response_text, words)}
+
+    if is_multi_language:
+        return lambda response_text, words: parse_multi_(response_text)
+    return lambda response_text, words: {target_languages[0]: parse_(response_text)}
+
+
+def make_item_decoder(encoding, target_languages, words):
+    is_multi_language = len(target_languages) > 1
+
+    if encoding == ENCODING_KEYED:
+        return JsonMemberDecoder(nested=is_multi_language)
+    elif encoding == ENCODING_LINES:
+        return LineItemDecoder(words, is_multi_language)
+
+    return JsonItemDecoder(root="{" if is_multi_language else "[")
+
+
+def build_response_schema(target_languages, encoding=ENCODING_JSON, words=None):
+    # Numbered lines are not JSON
+    if encoding == ENCODING_LINES:
+        return None
+
+    # Keys of the keyed encoding are the properties, so the schema follows the words of the chunk
+    if encoding == ENCODING_KEYED:
+        words_schema = {
+            "type": "object",
+            "properties": {word["key"]: {"type": "string"} for word in words or []},
+            "required": [word["key"] for word in words or []],
+            "additionalProperties": False
+        }
+        if len(target_languages) == 1:
+            return words_schema
+
+        return {
+            "type": "object",
+            "properties": {language: words_schema for language in target_languages},
+            "required": list(target_languages),
+            "additionalProperties": False
+        }
+
+    words_schema = {
+        "type": "array",
+        "items": {
+            "type": "object",
+            "properties": {
+                "key": {"type": "string"},
+                "value": {"type": "string"}
+            },
+            "required": ["key", "value"],
+            "additionalProperties": False
+        }
+    }
+
+    # A single language is wrapped into an object, JSON-schema constrained output needs an object at the root
+    properties = {language: words_schema for language in target_languages} if len(target_languages) > 1 else {
+        "translations": words_schema
+    }
+
+    return {
+        "type": "object",
+        "properties": properties,
+        "required": list(properties),
+        "additionalProperties": False
+    }
+
+
+# The parts that are the same for every request of a run come first and the ones that change come last, so the
+# providers that cache prompt prefixes (OpenAI does it automatically) can reuse the instructions between requests.
 DEFAULT_PROMPT_TEMPLATE = """
-You are an assistant that translates Android string resources from one language to another. 
-Translate the following list of UI strings from {source_lang_full} to {target_lang_full}.
+You are an assistant that translates Android string resources from one language to another.
+Translate the list of UI strings at the end of this message from {source_lang_full} to the target language given
+right before it.
 
 Project description: {app_description}
+
+{response_format}
+
+Target language: {target_lang_full}
 Module (screen) description: {module_description}
 
-Each string is a key-value pair. Return a JSON array where each item contains:
-- "key": the original key
-- "value": the translated text
+Here is the list to translate:
+{words_json}
+"""
+
+
+DEFAULT_MULTI_LANGUAGE_PROMPT_TEMPLATE = """
+You are an assistant that translates Android string resources from one language to another.
+Translate the list of UI strings at the end of this message from {source_lang_full} to each of the target languages
+given right before it.
 
-Example response:
-[
-  {{ "key": "title_hello", "value": "Hola" }},
-  ...
-]
+Project description: {app_description}
+
+{response_format}
+
+Target languages: {target_langs_full}
+Target language codes ({target_lang_codes})
+Module (screen) description: {module_description}
 
 Here is the list to translate:
 {words_json}
 """
 
 
+# The template is read once per path, every chunk of every module uses it
+@functools.lru_cache(maxsize=None)
 def load_prompt_template(prompt_path):
-    if os.path.exists(prompt_path):
+    if prompt_path and os.path.exists(prompt_path):
         with open(prompt_path, "r", encoding="utf-8") as f:
             return f.read()
 
     return DEFAULT_PROMPT_TEMPLATE
 
 
-def __generate_prompt__(prompt_path, app_description, module_description, source_language, target_language, words):
-    def get_language_name(code):
-        try:
-            return pycountry.languages.get(alpha_2=code).name
-        except:
-            return code
+# A project prompt is used for multi-language requests as well when it has the placeholders of the target languages,
+# otherwise these requests fall back to the built-in multi-language prompt. The lock lets the warning print once.
+def load_multi_language_prompt_template(prompt_path):
+    with _multi_language_template_lock:
+        return __load_multi_language_prompt_template__(prompt_path)
+
+
+@functools.lru_cache(maxsize=None)
+def __load_multi_language_prompt_template__(prompt_path):
+    template = load_prompt_template(prompt_path)
+    if template == DEFAULT_PROMPT_TEMPLATE:
+        return DEFAULT_MULTI_LANGUAGE_PROMPT_TEMPLATE
+
+    if "{target_langs_full}" not in template:
+        print(f"Warning: {prompt_path} has no {{target_langs_full}} placeholder, requests for several languages use "
+              f"the built-in prompt!")
+        return DEFAULT_MULTI_LANGUAGE_PROMPT_TEMPLATE
 
+    return template
+
+
+def validate_prompt_template(config: Configuration, prompt_path):
+    # Only JSON is described by the prompt itself, the other encodings are explained by the `{response_format}` text
+    if config.wire_encoding != ENCODING_JSON and "{response_format}" not in load_prompt_template(prompt_path):
+        raise ValueError(f"Error: The prompt file {prompt_path} has no {{response_format}} placeholder, which "
+                         f"'wireEncoding: {config.wire_encoding}' requires.")
+
+
+@functools.lru_cache(maxsize=None)
+def get_language_name(code):
+    try:
+        return pycountry.languages.get(alpha_2=code).name
+    except:
+        return code
+
+
+def __generate_prompt__(prompt_path, app_description, module_description, source_language, target_language, words,
+                        encoding=ENCODING_JSON):
     source_lang_full = get_language_name(source_language)
     target_lang_full = get_language_name(target_language)
 
@@ -116,6 +929,27 @@ def __generate_prompt__(prompt_path, app_description, module_description, source
         module_description=module_description,
         source_lang_full=source_lang_full,
         target_lang_full=target_lang_full,
-        words_json=json.dumps(words, indent=2)
+        target_langs_full=f"{target_lang_full} ({target_language})",
+        target_lang_codes=target_language,
+        response_format=get_response_format(encoding, is_multi_language=False),
+        words_json=encode_words(words, encoding)
+    )
+    return prompt.strip()
+
+
+def __generate_multi_language_prompt__(prompt_path, app_description, module_description, source_language,
+                                       target_languages, words, encoding=ENCODING_JSON):
+    target_langs_full = ", ".join(f"{get_language_name(code)} ({code})" for code in target_languages)
+
+    template = load_multi_language_prompt_template(prompt_path=prompt_path)
+    prompt = template.format(
+        app_description=app_description,
+        module_description=module_description,
+        source_lang_full=get_language_name(source_language),
+        target_lang_full=target_langs_full,
+        target_langs_full=target_langs_full,
+        target_lang_codes=", ".join(target_languages),
+        response_format=get_response_format(encoding, is_multi_language=True),
+        words_json=encode_words(words, encoding)
     )
     return prompt.strip()
@@ -13,93 +13,218 @@
 # limitations under the License.
 
 import os
+import subprocess
 import yaml
+from manifest import load_manifest, save_manifest
 from models import ModuleConfiguration
+from tracing import span
 
 _is_debug = False
 
 
-def configure(project_dir):
+default_ignored_dirs = [
+    "build",
+    ".gradle",
+    ".git",
+    ".idea",
+    "node_modules",
+    ".cxx",
+    ".externalNativeBuild",
+    ".aitranslator",
+]
+
+
+def configure(project_dir, ignored_dirs=None, state_dir=None, changed_since=None):
     print("Configure!")
 
-    all_strings, all_configurations = find_all_modules(project_dir)
+    if ignored_dirs is None:
+        ignored_dirs = default_ignored_dirs
+
+    manifest = load_manifest(state_dir, ignored_dirs) if state_dir else None
+
+    with span("scan project", "configure"):
+        all_strings, all_configurations, module_roots = scan_project(project_dir, ignored_dirs, manifest)
+
+    with span("load module configurations", "configure", {"files": len(all_configurations)}):
+        module_configs = load_module_configurations(project_dir, all_configurations, manifest)
+
+    if manifest is not None:
+        save_manifest(state_dir, manifest)
 
-    execution_graph = build_execution_graph(all_strings, all_configurations)
+    execution_graph = build_execution_graph(all_strings, all_configurations, module_roots, module_configs)
+
+    if changed_since:
+        with span("filter changed modules", "configure", {"git_ref": changed_since}):
+            execution_graph = filter_changed_modules(project_dir, execution_graph, changed_since)
 
     return execution_graph
 
 
-def find_all_modules(project_dir):
+def find_all_modules(project_dir, ignored_dirs=None):
     if _is_debug:
         print("Find all modules!")
 
-    all_strings = find_all_strings_files(project_dir)
-    all_configurations = find_all_configuration_files(project_dir)
+    all_strings, all_configurations, _ = scan_project(project_dir, ignored_dirs)
 
     return all_strings, all_configurations
 
 
-def find_all_strings_files(project_dir):
+def find_all_strings_files(project_dir, ignored_dirs=None):
+    return scan_project(project_dir, ignored_dirs)[0]
+
+
+def find_all_configuration_files(project_dir, ignored_dirs=None):
+    return scan_project(project_dir, ignored_dirs)[1]
+
+
+def scan_project(project_dir, ignored_dirs=None, manifest=None):
     if _is_debug:
-        print("Find all strings files!")
+        print("Scan project!")
+
+    ignored = set(default_ignored_dirs if ignored_dirs is None else ignored_dirs)
+    previous_dirs = manifest["dirs"] if manifest is not None else {}
+    scanned_dirs = {}
 
     strings_files = []
-    for root, _, files in os.walk(project_dir):
-        for file in files:
-            if file == "strings.xml":
-                values_dir = os.path.basename(root)
+    config_files = []
+    # Directories that contain a `src` directory, i.e. module roots
+    module_roots = set()
 
-                # Only include 'values' directory (exclude 'values-xx' folders)
-                if values_dir == "values":
-                    strings_files.append(os.path.join(root, file))
+    rescanned_count = 0
+    pending_dirs = [project_dir]
+    while pending_dirs:
+        current_dir = pending_dirs.pop()
+
+        try:
+            mtime_ns = os.stat(current_dir).st_mtime_ns if manifest is not None else None
+            relative_dir = os.path.relpath(current_dir, project_dir)
+
+            entry = previous_dirs.get(relative_dir)
+            if entry is None or entry["mtime_ns"] != mtime_ns:
+                entry = scan_directory(current_dir, ignored, mtime_ns)
+                rescanned_count += 1
+        except OSError as e:
+            print(f"Skipping unreadable directory {current_dir}: {e}")
+            continue
+
+        scanned_dirs[relative_dir] = entry
+
+        if entry["has_src"]:
+            module_roots.add(current_dir)
+        if entry["has_strings"]:
+            strings_files.append(os.path.join(current_dir, "strings.xml"))
+        if entry["has_config"]:
+            config_files.append(os.path.join(current_dir, "translator-config.yml"))
+
+        # Reverse so that directories are visited in the order they were listed
+        pending_dirs.extend(reversed([os.path.join(current_dir, name) for name in entry["dirs"]]))
+
+    if manifest is not None:
+        manifest["dirs"] = scanned_dirs
+
+    strings_files.sort()
+    config_files.sort()
 
     if _is_debug:
+        print(f"Scanned {rescanned_count} of {len(scanned_dirs)} directories.")
         print(f"Found {len(strings_files)} strings.xml files.")
+        print(f"Found {len(config_files)} translator-config.yml files.")
 
-    return strings_files
+    return strings_files, config_files, module_roots
+
+
+def scan_directory(directory, ignored, mtime_ns):
+    entry = {
+        "mtime_ns": mtime_ns,
+        "dirs": [],
+        "has_src": False,
+        "has_strings": False,
+        "has_config": False
+    }
+
+    with os.scandir(directory) as entries:
+        for dir_entry in entries:
+            if dir_entry.is_dir(follow_symlinks=False):
+                if dir_entry.name == "src":
+                    entry["has_src"] = True
+                if dir_entry.name not in ignored:
+                    entry["dirs"].append(dir_entry.name)
+            elif dir_entry.name == "strings.xml":
+                # Only include 'values' directory (exclude 'values-xx' folders)
+                entry["has_strings"] = os.path.basename(directory) == "values"
+            elif dir_entry.name == "translator-config.yml":
+                entry["has_config"] = True
 
+    entry["dirs"].sort()
 
-def find_all_configuration_files(project_dir):
-    if _is_debug:
-        print("Find all configuration files!")
+    return entry
 
-    config_files = []
-    for root, _, files in os.walk(project_dir):
-        for file in files:
-            if file == "translator-config.yml":
-                config_files.append(os.path.join(root, file))
 
+def load_module_configurations(project_dir, config_files, manifest=None):
     if _is_debug:
-        print(f"Found {len(config_files)} translator-config.yml files.")
+        print("Load module configurations!")
+
+    previous_configs = manifest["configs"] if manifest is not None else {}
+    loaded_configs = {}
+    module_configs = {}
+
+    for config_file in config_files:
+        relative_path = os.path.relpath(config_file, project_dir)
+        stat = os.stat(config_file)
+
+        cached = previous_configs.get(relative_path)
+        if cached and cached["mtime_ns"] == stat.st_mtime_ns and cached["size"] == stat.st_size:
+            module_config_data = cached["data"]
+        else:
+            module_config_data = load_yaml(config_file)
+
+        loaded_configs[relative_path] = {
+            "mtime_ns": stat.st_mtime_ns,
+            "size": stat.st_size,
+            "data": module_config_data
+        }
+        module_configs[config_file] = ModuleConfiguration(module_config_data)
 
-    return config_files
+    if manifest is not None:
+        manifest["configs"] = loaded_configs
 
+    return module_configs
 
-def find_module_root(strings_file: str) -> str:
+
+def find_module_root(strings_file: str, module_roots=None) -> str:
     current_dir = os.path.dirname(strings_file)
 
-    while current_dir and not os.path.exists(os.path.join(current_dir, 'src')):
-        current_dir = os.path.dirname(current_dir)
+    def is_module_root(directory):
+        if module_roots is not None:
+            return directory in module_roots
+        return os.path.exists(os.path.join(directory, 'src'))
+
+    while current_dir and not is_module_root(current_dir):
+        parent_dir = os.path.dirname(current_dir)
+        if parent_dir == current_dir:
+            return ""
+        current_dir = parent_dir
 
     return current_dir
 
 
-def build_execution_graph(all_strings_files, all_configurations_files):
+def build_execution_graph(all_strings_files, all_configurations_files, module_roots=None, module_configs=None):
     if _is_debug:
         print("Building execution graph!")
 
     execution_graph = []
 
-    for strings_file in all_strings_files:
-        module_root = find_module_root(strings_file)
+    config_files_by_dir = {}
+    for config_file in all_configurations_files:
+        config_files_by_dir.setdefault(os.path.dirname(config_file), config_file)
 
-        matching_config_files = [
-            config_file for config_file in all_configurations_files
-            if os.path.dirname(config_file) == module_root
-        ]
+    for strings_file in all_strings_files:
+        module_root = find_module_root(strings_file, module_roots)
 
-        if matching_config_files:
-            config_file = matching_config_files[0]
+        config_file = config_files_by_dir.get(module_root)
+        if config_file and module_configs is not None and config_file in module_configs:
+            module_config = module_configs[config_file]
+        elif config_file:
             module_config_data = load_yaml(config_file)
             module_config = ModuleConfiguration(module_config_data)
         else:
@@ -109,7 +234,8 @@ def build_execution_graph(all_strings_files, all_configurations_files):
             {
                 "module_path": module_root,
                 "strings": strings_file,
-                "configuration": module_config
+                "configuration": module_config,
+                "configuration_file": config_file
             }
         )
 
@@ -120,6 +246,49 @@ def build_execution_graph(all_strings_files, all_configurations_files):
     return execution_graph
 
 
+def filter_changed_modules(project_dir, execution_graph, git_ref):
+    if _is_debug:
+        print(f"Filter modules changed since {git_ref}!")
+
+    changed_files = find_changed_files(project_dir, git_ref)
+
+    changed_graph = [
+        entry for entry in execution_graph
+        if os.path.realpath(entry["strings"]) in changed_files or
+        (entry["configuration_file"] and os.path.realpath(entry["configuration_file"]) in changed_files)
+    ]
+
+    print(f"{len(changed_graph)} of {len(execution_graph)} module(s) changed since {git_ref}")
+
+    return changed_graph
+
+
+def find_changed_files(project_dir, git_ref):
+    def run_git(*args):
+        try:
+            result = subprocess.run(
+                ["git", *args],
+                cwd=project_dir,
+                capture_output=True,
+                text=True,
+                check=True
+            )
+        except (OSError, subprocess.CalledProcessError) as e:
+            stderr = getattr(e, "stderr", "") or ""
+            raise ValueError(f"Error: Failed to list files changed since '{git_ref}': {e} {stderr.strip()}")
+
+        return [line for line in result.stdout.splitlines() if line]
+
+    top_level = run_git("rev-parse", "--show-toplevel")[0]
+
+    # Committed and uncommitted changes since the ref, plus new files that are not tracked yet
+    changed_paths = run_git("diff", "--name-only", git_ref, "--")
+    changed_paths += run_git("ls-files", "--others", "--exclude-standard", "--full-name")
+
+    # Git resolves symlinks in the top level, the project dir may be given through one (like /tmp on macOS)
+    return {os.path.realpath(os.path.join(top_level, path)) for path in changed_paths}
+
+
 def load_yaml(file_path):
     with open(file_path, 'r', encoding='utf-8') as file:
         try:
@@ -0,0 +1,192 @@
+# Copyright 2025 Roman Likhachev
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from client import estimate_word_tokens, get_chunk_token_budget, make_chunks
+
+_is_debug = False
+
+
+# Strings like "OK", "Cancel" or "Retry" repeat across modules. Every distinct (value, language) pair that is pending
+# more than once is translated a single time, in the context of the module where it appears most often, and the
+# result is fanned back out to every key with that value.
+def normalize_value(value):
+    return " ".join(value.split())
+
+
+def plan_deduplication(work_units, prepared_units):
+    # (value, language) -> {module_index: number of keys}
+    occurrences = {}
+    for unit, prepared in zip(work_units, prepared_units):
+        for language, words in prepared["pending_words_by_language"].items():
+            for word in words:
+                counts = occurrences.setdefault((normalize_value(word["value"]), language), {})
+                counts[unit["module_index"]] = counts.get(unit["module_index"], 0) + 1
+
+    # module_index -> language -> words translated in the context of that module
+    shared_words = {}
+    shared_keys = {}
+    for (value, language), counts in occurrences.items():
+        # Repeats within one module are already sent in the same requests, only other modules save anything
+        if len(counts) < 2:
+            continue
+
+        module_index = max(counts, key=lambda index: (counts[index], -index))
+        shared_words.setdefault(module_index, {}).setdefault(language, []).append(value)
+        shared_keys[(value, language)] = module_index
+
+    plan = {
+        "shared_keys": shared_keys,
+        "shared_words": shared_words,
+        "duplicates": sum(sum(counts.values()) - 1 for pair, counts in occurrences.items() if pair in shared_keys)
+    }
+
+    if _is_debug:
+        print(f"Deduplication: {len(shared_keys)} distinct string(s) cover {plan['duplicates']} duplicate(s)")
+
+    return plan
+
+
+def make_shared_work_units(plan, execution_graph, modules_words, batch_size):
+    shared_units = []
+
+    for module_index, values_by_language in sorted(plan["shared_words"].items()):
+        # The real key of the value in the context module tells the AI more than a synthetic one
+        keys_by_value = {}
+        for word in modules_words[module_index]:
+            keys_by_value.setdefault(normalize_value(word["value"]), word["key"])
+
+        words_by_language = {}
+        for language, values in values_by_language.items():
+            words_by_language[language] = [
+                {"key": keys_by_value.get(value, f"shared_{index}"), "value": value}
+                for index, value in enumerate(values)
+            ]
+
+        # Languages that share the same values go together, like in the regular work units
+        languages = list(words_by_language)
+        for start in range(0, len(languages), max(1, batch_size)):
+            batch = languages[start:start + batch_size]
+            shared_units.append(
+                {
+                    "module_index": module_index,
+                    "module": execution_graph[module_index],
+                    "languages": batch,
+                    "words_by_language": {language: words_by_language[language] for language in batch}
+                }
+            )
+
+    return shared_units
+
+
+def is_deduplication_worthwhile(configuration, plan, prepared_units, shared_units):
+    # The shared units are requests of their own: when the modules would still need as many chunks without the shared
+    # strings, they only add requests
+    expected_translations = {pair: pair[0] for pair in plan["shared_keys"]}
+    savings = estimate_savings(configuration, prepared_units, shared_units, expected_translations)
+
+    if _is_debug:
+        print(f"Deduplication: ~{savings['requests_before']} request(s) without, ~{savings['requests_after']} with")
+
+    return savings["requests_after"] < savings["requests_before"]
+
+
+def collect_shared_translations(shared_units, results):
+    translations = {}
+
+    for unit, language_with_words in zip(shared_units, results):
+        for language, translated_words in language_with_words.items():
+            value_by_key = {word["key"]: word["value"] for word in translated_words}
+            for word in unit["words_by_language"][language]:
+                if word["key"] in value_by_key:
+                    translations[(word["value"], language)] = value_by_key[word["key"]]
+
+    return translations
+
+
+def split_shared_words(pending_words_by_language, shared_translations):
+    remaining_by_language = {}
+    shared_by_language = {}
+
+    for language, words in pending_words_by_language.items():
+        remaining_by_language[language] = []
+        shared_by_language[language] = []
+
+        for word in words:
+            translation = shared_translations.get((normalize_value(word["value"]), language))
+            if translation is None:
+                remaining_by_language[language].append(word)
+            else:
+                shared_by_language[language].append({"key": word["key"], "value": translation})
+
+    return remaining_by_language, shared_by_language
+
+
+def merge_shared_words(pending_words_by_language, language_with_words, shared_by_language):
+    merged = {}
+
+    for language, words in pending_words_by_language.items():
+        translated_by_key = {word["key"]: word for word in language_with_words.get(language, [])}
+        translated_by_key.update({word["key"]: word for word in shared_by_language.get(language, [])})
+
+        # Keep the order of the source keys
+        merged[language] = [translated_by_key[word["key"]] for word in words if word["key"] in translated_by_key]
+
+    return merged
+
+
+# Estimated requests and tokens of the pending words with and without deduplication
+def estimate_savings(configuration, prepared_units, shared_units, shared_translations):
+    max_input_tokens, max_output_tokens = get_chunk_token_budget(configuration)
+
+    def estimate(words_by_language):
+        requests = 0
+        tokens = 0
+
+        groups = {}
+        for language, words in words_by_language.items():
+            if words:
+                groups.setdefault(tuple(word["key"] for word in words), []).append(words)
+
+        for group in groups.values():
+            words = group[0]
+            requests += len(make_chunks(words, max_input_tokens, max_output_tokens // len(group)))
+            for word in words:
+                input_tokens, output_tokens = estimate_word_tokens(word)
+                tokens += input_tokens + output_tokens * len(group)
+
+        return requests, tokens
+
+    requests_before = tokens_before = requests_after = tokens_after = 0
+
+    for prepared in prepared_units:
+        requests, tokens = estimate(prepared["pending_words_by_language"])
+        requests_before += requests
+        tokens_before += tokens
+
+        remaining_by_language, _ = split_shared_words(prepared["pending_words_by_language"], shared_translations)
+        requests, tokens = estimate(remaining_by_language)
+        requests_after += requests
+        tokens_after += tokens
+
+    for unit in shared_units:
+        requests, tokens = estimate(unit["words_by_language"])
+        requests_after += requests
+        tokens_after += tokens
+
+    return {
+        "requests_before": requests_before,
+        "requests_after": requests_after,
+        "tokens_before": tokens_before,
+        "tokens_after": tokens_after
+    }
@@ -12,44 +12,633 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import asyncio
+import json
 import os
 import xml.etree.ElementTree as ET
-from xml.dom import minidom
 
-from client import translate
+from client import translate, translate_multi, translate_async, translate_multi_async, close_clients_async, \
+    get_model_prices, validate_lazily, load_prompt_template
+from dedup import plan_deduplication, make_shared_work_units, collect_shared_translations, split_shared_words, \
+    merge_shared_words, estimate_savings, is_deduplication_worthwhile
+from journal import Journal, make_source_hash
+from metrics import get_usage, add_usage, start_run, build_report, merge_reports, format_prometheus
 from models import Configuration
-import html
+from planner import Planner, get_pending_words_by_language, get_shared_words_by_language, print_plan
+from tracing import span
+from translation_cache import hash_text
+from scheduler import make_work_units, run_work_units, run_work_units_async
+from shard import select_shard_units, get_shard_dir, save_shard, find_shard_dirs, load_shards, merge_shards
+from snapshot import load_snapshot, save_snapshot
+from strings_file import StringsFileWriter, unescape_android_string, write_strings_file, iter_string_resources, \
+    drop_incomplete_arrays
+
+# Reports of the latest run in the state directory
+run_report_file_name = "report.json"
+run_metrics_file_name = "metrics.prom"
 
 _is_debug = False
 
 
-def execute(prompt_path, configuration, execution_graph):
+def execute(prompt_path, configuration, execution_graph, cache=None, state_dir=None, use_async=False,
+            report_paths=None, resume=False, shard=None):
+    if use_async:
+        asyncio.run(execute_async(prompt_path, configuration, execution_graph, cache, state_dir, report_paths, resume,
+                                  shard))
+        return
+
     print("Execute!")
+    start_run()
+
+    journal = Journal(state_dir).open() if state_dir else None
+
+    with span("prepare work units", "execute", {"modules": len(execution_graph)}):
+        languages, modules_words, work_units = prepare_work_units(
+            configuration,
+            execution_graph,
+            state_dir,
+            journal,
+            resume,
+            prompt_path,
+            shard
+        )
+    writer = StringsFileWriter()
+
+    with span("plan deduplication", "execute"):
+        deduplication, shared_units = prepare_deduplication(configuration, execution_graph, modules_words, work_units)
+
+    validate_before_requests(configuration, work_units, shared_units, state_dir)
+
+    def shared_worker(unit):
+        with span_work_unit(unit, "shared strings"):
+            return translate_all_words_to_languages(
+                prompt_path,
+                unit["words_by_language"],
+                configuration,
+                unit["module"]["configuration"],
+                cache,
+                get_module_label(unit["module"])
+            )
 
+    def worker(unit):
+        with span_work_unit(unit):
+            return execute_work_unit(
+                prompt_path,
+                configuration,
+                modules_words[unit["module_index"]],
+                unit,
+                cache,
+                state_dir,
+                writer,
+                deduplication,
+                journal
+            )
+
+    try:
+        if shared_units:
+            shared_results = run_work_units(
+                shared_units,
+                shared_worker,
+                configuration.concurrency,
+                make_planner(configuration, shared_units, get_shared_words_by_language)
+            )
+            finish_deduplication(configuration, deduplication, work_units, shared_units, shared_results)
+
+        results = run_work_units(work_units, worker, configuration.concurrency, make_planner(configuration, work_units))
+    finally:
+        with span("wait for strings files", "execute"):
+            writer.close()
+        if journal is not None:
+            journal.close()
+
+    finish_execution(configuration, execution_graph, languages, work_units, results, cache, writer, deduplication,
+                     state_dir, report_paths, journal, shard)
+
+
+async def execute_async(prompt_path, configuration, execution_graph, cache=None, state_dir=None, report_paths=None,
+                        resume=False, shard=None):
+    print("Execute (async)!")
+    start_run()
+
+    journal = Journal(state_dir).open() if state_dir else None
+
+    with span("prepare work units", "execute", {"modules": len(execution_graph)}):
+        languages, modules_words, work_units = prepare_work_units(
+            configuration,
+            execution_graph,
+            state_dir,
+            journal,
+            resume,
+            prompt_path,
+            shard
+        )
+    writer = StringsFileWriter()
+
+    with span("plan deduplication", "execute"):
+        deduplication, shared_units = prepare_deduplication(configuration, execution_graph, modules_words, work_units)
+
+    validate_before_requests(configuration, work_units, shared_units, state_dir)
+
+    async def shared_worker(unit):
+        with span_work_unit(unit, "shared strings"):
+            return await translate_all_words_to_languages_async(
+                prompt_path,
+                unit["words_by_language"],
+                configuration,
+                unit["module"]["configuration"],
+                cache,
+                get_module_label(unit["module"])
+            )
+
+    async def worker(unit):
+        with span_work_unit(unit):
+            return await execute_work_unit_async(
+                prompt_path,
+                configuration,
+                modules_words[unit["module_index"]],
+                unit,
+                cache,
+                state_dir,
+                writer,
+                deduplication,
+                journal
+            )
+
+    try:
+        if shared_units:
+            shared_results = await run_work_units_async(
+                shared_units,
+                shared_worker,
+                configuration.concurrency,
+                make_planner(configuration, shared_units, get_shared_words_by_language)
+            )
+            finish_deduplication(configuration, deduplication, work_units, shared_units, shared_results)
+
+        results = await run_work_units_async(
+            work_units,
+            worker,
+            configuration.concurrency,
+            make_planner(configuration, work_units)
+        )
+    finally:
+        await close_clients_async()
+        with span("wait for strings files", "execute"):
+            writer.close()
+        if journal is not None:
+            journal.close()
+
+    finish_execution(configuration, execution_graph, languages, work_units, results, cache, writer, deduplication,
+                     state_dir, report_paths, journal, shard)
+
+
+def plan_execution(prompt_path, configuration, execution_graph, state_dir=None, resume=False, shard=None):
+    # Prints the expected schedule without validating the credentials or sending any request
+    print("Plan!")
+
+    # The state directory is only read, it may not even exist yet
+    journal = Journal(state_dir).load() if state_dir else None
+    _, _, work_units = prepare_work_units(
+        configuration,
+        execution_graph,
+        state_dir,
+        journal,
+        resume,
+        prompt_path,
+        shard
+    )
+
+    planner = make_planner(configuration, work_units)
+    if planner is None:
+        print("Nothing to translate!")
+        return
+
+    print_plan(planner, get_module_label)
+
+
+def make_planner(configuration, work_units, get_words_by_language=get_pending_words_by_language):
+    # Without pending strings the units finish right away, and the provider limits are not even loaded
+    if not any(words for unit in work_units for words in get_words_by_language(unit).values()):
+        return None
+
+    with span("plan schedule", "execute", {"units": len(work_units)}):
+        return Planner(configuration, work_units, configuration.concurrency, get_words_by_language)
+
+
+def prepare_work_units(configuration, execution_graph, state_dir=None, journal=None, resume=False, prompt_path=None,
+                       shard=None):
     languages = get_languages(configuration)
 
-    modules_language_data = []
+    modules_words = [get_words_from_strings_file(module) for module in execution_graph]
 
-    for module in execution_graph:
-        words = get_words_from_strings_file(module)
+    work_units = make_work_units(execution_graph, languages, configuration.multi_language_batch_size)
 
-        language_with_words = {}
+    # The partition is planned on all units before anything is skipped, so that every runner and every resumed run
+    # of a shard gets the same units
+    if shard is not None:
+        work_units = select_shard_units(work_units, modules_words, shard)
 
-        for language in languages:
-            lang_dir_path = make_language_dir_if_not_exists(language, module)
-            translated_words = translate_all_words_to_language(
-                prompt_path,
-                words,
-                language,
+    if journal is not None:
+        prompt_hash = hash_text(load_prompt_template(prompt_path))
+        for unit in work_units:
+            unit["source_hash"] = make_source_hash(
                 configuration,
-                module["configuration"]
+                unit["module"],
+                modules_words[unit["module_index"]],
+                prompt_hash
+            )
+
+        if resume:
+            work_units = skip_journaled_languages(work_units, journal)
+
+    # Pending words of every unit are known up front, so duplicates across modules can be found
+    for unit in work_units:
+        unit["prepared"] = prepare_work_unit(configuration, modules_words[unit["module_index"]], unit, state_dir)
+
+    return languages, modules_words, work_units
+
+
+def skip_journaled_languages(work_units, journal):
+    remaining_units = []
+
+    for unit in work_units:
+        languages = [
+            language for language in unit["languages"]
+            if not journal.is_done(
+                unit["module"],
+                language,
+                unit["source_hash"],
+                get_language_dir_path(language, unit["module"])
             )
-            language_with_words[language] = translated_words
-            write_words_to_strings_file(lang_dir_path, translated_words)
+        ]
+        journal.resumed_count += len(unit["languages"]) - len(languages)
 
-        modules_language_data.append((module, language_with_words))
+        if languages:
+            unit["languages"] = languages
+            remaining_units.append(unit)
 
-    make_report(configuration, execution_graph, modules_language_data)
+    if journal.resumed_count:
+        print(f"Resuming: {journal.resumed_count} module language(s) already done are skipped!")
+
+    return remaining_units
+
+
+def validate_before_requests(configuration, work_units, shared_units, state_dir=None):
+    # Without pending strings no request is made, so the credentials are not needed at all
+    has_pending_words = bool(shared_units) or any(
+        words
+        for unit in work_units
+        for words in unit["prepared"]["pending_words_by_language"].values()
+    )
+    if not has_pending_words:
+        print("Nothing to translate!")
+        return
+
+    # Strings may still all come from the cache, the credentials are validated before the first real request
+    validate_lazily(configuration, state_dir)
+
+
+def prepare_deduplication(configuration, execution_graph, modules_words, work_units):
+    if not configuration.deduplicate:
+        return None, []
+
+    prepared_units = [unit["prepared"] for unit in work_units]
+    deduplication = plan_deduplication(work_units, prepared_units)
+    shared_units = make_shared_work_units(
+        deduplication,
+        execution_graph,
+        modules_words,
+        configuration.multi_language_batch_size
+    )
+
+    if shared_units and not is_deduplication_worthwhile(configuration, deduplication, prepared_units, shared_units):
+        print("Strings shared across modules would not save any request, translating them in every module!")
+        return None, []
+
+    if shared_units:
+        print(f"Translating {len(deduplication['shared_keys'])} string(s) shared across modules first!")
+
+    return deduplication, shared_units
+
+
+def finish_deduplication(configuration, deduplication, work_units, shared_units, shared_results):
+    deduplication["translations"] = collect_shared_translations(shared_units, shared_results)
+    deduplication.update(
+        estimate_savings(
+            configuration,
+            [unit["prepared"] for unit in work_units],
+            shared_units,
+            deduplication["translations"]
+        )
+    )
+
+
+def finish_execution(configuration, execution_graph, languages, work_units, results, cache, writer=None,
+                     deduplication=None, state_dir=None, report_paths=None, journal=None, shard=None):
+    modules_language_data = [(module, {}) for module in execution_graph]
+    for unit, language_with_words in zip(work_units, results):
+        modules_language_data[unit["module_index"]][1].update(language_with_words)
+
+    # Keep the languages in configuration order when they were translated in batches
+    for _, language_with_words in modules_language_data:
+        ordered = {language: language_with_words[language] for language in languages if language in language_with_words}
+        language_with_words.clear()
+        language_with_words.update(ordered)
+
+    with span("report", "execute"):
+        run_report = build_run_report(configuration, execution_graph, cache, writer, deduplication)
+
+        # A shard keeps its report next to its strings files, for `merge`
+        if shard is not None:
+            save_shard(state_dir, shard, work_units, results, run_report, get_usage())
+            write_run_report(run_report, get_shard_dir(state_dir, shard), report_paths)
+        else:
+            write_run_report(run_report, state_dir, report_paths)
+
+        make_report(configuration, execution_graph, modules_language_data, cache, writer, deduplication, run_report,
+                    journal)
+
+
+def build_run_report(configuration, execution_graph, cache=None, writer=None, deduplication=None):
+    # Prices come from the provider module, which is not loaded when nothing was requested
+    return build_report(
+        {configuration.ai_provider: get_model_prices(configuration)} if get_usage() else {},
+        extra={
+            "ai_provider": configuration.ai_provider,
+            "ai_model": configuration.ai_model,
+            "modules": len(execution_graph),
+            "target_languages": list(configuration.target_languages),
+            "cache": {"hits": cache.hits, "misses": cache.misses} if cache is not None else None,
+            "deduplication": {
+                "strings": len(deduplication["shared_keys"]),
+                "duplicates": deduplication["duplicates"]
+            } if deduplication is not None else None,
+            "strings_files": {
+                "written": writer.written_count,
+                "unchanged": writer.unchanged_count
+            } if writer is not None else None
+        }
+    )
+
+
+def write_run_report(run_report, state_dir=None, report_paths=None):
+    # report_paths: {"json": path, "prometheus": path}, the state directory holds the latest report by default
+    report_paths = report_paths or {}
+    json_path = report_paths.get("json") or (os.path.join(state_dir, run_report_file_name) if state_dir else None)
+    prometheus_path = report_paths.get("prometheus") or (
+        os.path.join(state_dir, run_metrics_file_name) if state_dir else None
+    )
+
+    if json_path:
+        with open(json_path, "w", encoding="utf-8") as file:
+            json.dump(run_report, file, indent=2, ensure_ascii=False)
+    if prometheus_path:
+        with open(prometheus_path, "w", encoding="utf-8") as file:
+            file.write(format_prometheus(run_report))
+
+    if _is_debug:
+        print(f"Run report written to {json_path} and {prometheus_path}")
+
+
+def merge_sharded_run(configuration, execution_graph, state_dir, shard_dirs=None, report_paths=None):
+    print("Merge!")
+
+    shards = load_shards(shard_dirs or find_shard_dirs(state_dir))
+    if not shards:
+        raise ValueError("Error: No shards to merge, run with --shard i/N first.")
+
+    # The journal learns the complete languages of every shard, so that --resume works on the merged project
+    journal = Journal(state_dir).open()
+    try:
+        with span("merge shards", "execute", {"shards": len(shards)}):
+            translated_keys = merge_shards(state_dir, shards, journal)
+    finally:
+        journal.close()
+
+    for _, shard_data in shards:
+        add_usage(shard_data["usage"])
+
+    languages = get_languages(configuration)
+    modules_language_data = []
+    for module in execution_graph:
+        keys_by_language = translated_keys.get(journal.get_module_key(module), {})
+        modules_language_data.append(
+            (module, {language: keys_by_language[language] for language in languages if language in keys_by_language})
+        )
+
+    with span("report", "execute"):
+        run_report = merge_reports(
+            [shard_data["report"] for _, shard_data in shards],
+            extra={
+                "ai_provider": configuration.ai_provider,
+                "ai_model": configuration.ai_model,
+                "modules": len(execution_graph),
+                "target_languages": list(configuration.target_languages),
+                "shards": sorted(shard_data["shard"][0] for _, shard_data in shards)
+            }
+        )
+        write_run_report(run_report, state_dir, report_paths)
+
+        make_report(configuration, execution_graph, modules_language_data, run_report=run_report, journal=journal)
+
+
+def execute_work_unit(prompt_path, configuration, words, unit, cache=None, state_dir=None, writer=None,
+                      deduplication=None, journal=None):
+    if _is_debug:
+        print(f"Execute work unit: {unit['module']['strings']} → {', '.join(unit['languages'])}")
+
+    prepared = unit.get("prepared") or prepare_work_unit(configuration, words, unit, state_dir)
+
+    # Strings shared with other modules are already translated
+    translations = deduplication.get("translations", {}) if deduplication else {}
+    remaining_words_by_language, shared_words_by_language = split_shared_words(
+        prepared["pending_words_by_language"],
+        translations
+    )
+
+    language_with_words = translate_all_words_to_languages(
+        prompt_path,
+        remaining_words_by_language,
+        configuration,
+        unit["module"]["configuration"],
+        cache,
+        get_module_label(unit["module"])
+    )
+
+    language_with_words = merge_shared_words(
+        prepared["pending_words_by_language"],
+        language_with_words,
+        shared_words_by_language
+    )
+
+    finish_work_unit(words, unit, prepared, language_with_words, state_dir, writer, journal)
+
+    return language_with_words
+
+
+async def execute_work_unit_async(prompt_path, configuration, words, unit, cache=None, state_dir=None, writer=None,
+                                  deduplication=None, journal=None):
+    if _is_debug:
+        print(f"Execute work unit (async): {unit['module']['strings']} → {', '.join(unit['languages'])}")
+
+    prepared = unit.get("prepared") or prepare_work_unit(configuration, words, unit, state_dir)
+
+    # Strings shared with other modules are already translated
+    translations = deduplication.get("translations", {}) if deduplication else {}
+    remaining_words_by_language, shared_words_by_language = split_shared_words(
+        prepared["pending_words_by_language"],
+        translations
+    )
+
+    language_with_words = await translate_all_words_to_languages_async(
+        prompt_path,
+        remaining_words_by_language,
+        configuration,
+        unit["module"]["configuration"],
+        cache,
+        get_module_label(unit["module"])
+    )
+
+    language_with_words = merge_shared_words(
+        prepared["pending_words_by_language"],
+        language_with_words,
+        shared_words_by_language
+    )
+
+    finish_work_unit(words, unit, prepared, language_with_words, state_dir, writer, journal)
+
+    return language_with_words
+
+
+def get_module_label(module):
+    return module["module_path"] or module["strings"]
+
+
+def span_work_unit(unit, category="work unit"):
+    # Every work unit gets its own lane of the trace, the spans of its requests nest under it
+    module_label = get_module_label(unit["module"])
+    return span(
+        f"{os.path.basename(module_label) or module_label} → {', '.join(unit['languages'])}",
+        category,
+        {"module": module_label, "languages": unit["languages"]},
+        track=True
+    )
+
+
+def prepare_work_unit(configuration, words, unit, state_dir):
+    module = unit["module"]
+    exclude_translated = is_exclude_translated(configuration, module["configuration"])
+
+    lang_dir_paths = {}
+    existing_words_by_language = {}
+    pending_words_by_language = {}
+    snapshots_by_language = {}
+
+    # Nothing is created before the strings are written, a `--plan` run leaves the project as it was
+    for language in unit["languages"]:
+        lang_dir_path = get_language_dir_path(language, module)
+        strings_file_path = os.path.join(lang_dir_path, "strings.xml")
+        lang_dir_paths[language] = lang_dir_path
+
+        if exclude_translated and os.path.exists(strings_file_path):
+            existing_words = read_words_from_strings_file(strings_file_path)
+            snapshot = load_snapshot(state_dir, lang_dir_path)
+            pending_words = get_pending_words(words, existing_words, snapshot)
+            existing_words_by_language[language] = existing_words
+            snapshots_by_language[language] = snapshot
+
+            if _is_debug:
+                print(f"Incremental translation ({language}): "
+                      f"{len(pending_words)} of {len(words)} string(s) are new or changed")
+        else:
+            pending_words = words
+
+        pending_words_by_language[language] = pending_words
+
+    return {
+        "lang_dir_paths": lang_dir_paths,
+        "existing_words_by_language": existing_words_by_language,
+        "pending_words_by_language": pending_words_by_language,
+        "snapshots_by_language": snapshots_by_language
+    }
+
+
+def finish_work_unit(words, unit, prepared, language_with_words, state_dir, writer=None, journal=None):
+    for language in unit["languages"]:
+        translated_words = language_with_words[language]
+        lang_dir_path = prepared["lang_dir_paths"][language]
+
+        # A language with strings skipped after failed retries is not journaled, and the snapshot keeps the skipped
+        # strings pending, so the next run translates them again, resumed or not
+        pending_words = prepared["pending_words_by_language"][language]
+        is_complete = len(translated_words) >= len(pending_words)
+
+        snapshot_words = make_snapshot_words(
+            words,
+            pending_words,
+            translated_words,
+            prepared.get("snapshots_by_language", {}).get(language, {})
+        )
+
+        if language in prepared["existing_words_by_language"]:
+            existing_words = prepared["existing_words_by_language"][language]
+            output_words = merge_translated_words(words, existing_words, translated_words)
+        else:
+            output_words = translated_words
+
+        output_words = drop_incomplete_arrays(words, output_words)
+
+        # The snapshot and the journal record are saved only once the file is in place
+        def on_written(lang_dir_path=lang_dir_path, language=language, is_complete=is_complete,
+                       snapshot_words=snapshot_words):
+            save_snapshot(state_dir, lang_dir_path, snapshot_words)
+            if journal is not None and is_complete:
+                journal.record(unit["module"], language, unit["source_hash"], lang_dir_path)
+
+        make_language_dir_if_not_exists(language, unit["module"])
+
+        if writer is not None:
+            writer.submit(lang_dir_path, output_words, on_written)
+        else:
+            write_words_to_strings_file(lang_dir_path, output_words)
+            on_written()
+
+
+def make_snapshot_words(words, pending_words, translated_words, previous_snapshot):
+    translated_keys = {word["key"] for word in translated_words}
+    missing_keys = {word["key"] for word in pending_words if word["key"] not in translated_keys}
+    if not missing_keys:
+        return words
+
+    # A missing key without a previous value is left out, it is not in the strings file and stays pending anyway
+    return [
+        word if word["key"] not in missing_keys else {"key": word["key"], "value": previous_snapshot[word["key"]]}
+        for word in words
+        if word["key"] not in missing_keys or word["key"] in previous_snapshot
+    ]
+
+
+def is_exclude_translated(global_config, module_config):
+    if module_config and module_config.exclude_translated is not None:
+        return bool(module_config.exclude_translated)
+
+    return bool(global_config.exclude_translated)
+
+
+def get_pending_words(words, existing_words, snapshot):
+    existing_keys = {word["key"] for word in existing_words}
+
+    return [
+        word for word in words
+        if word["key"] not in existing_keys or snapshot.get(word["key"], word["value"]) != word["value"]
+    ]
+
+
+def merge_translated_words(words, existing_words, translated_words):
+    # Keep the order of the source file and drop keys that no longer exist in it
+    values = {word["key"]: word["value"] for word in existing_words}
+    values.update({word["key"]: word["value"] for word in translated_words})
+
+    return [{"key": word["key"], "value": values[word["key"]]} for word in words if word["key"] in values]
 
 
 def get_words_from_strings_file(module):
@@ -59,21 +648,31 @@ def get_words_from_strings_file(module):
     strings_path = module["strings"]
     configuration = module.get("configuration")
     excluded_keys = set(configuration.exclude) if configuration and configuration.exclude else set()
+
+    return parse_strings_file(strings_path, excluded_keys)
+
+
+def read_words_from_strings_file(strings_path):
+    if _is_debug:
+        print("Read words from translated strings file!")
+
+    words = parse_strings_file(strings_path, set())
+
+    return [{"key": word["key"], "value": unescape_android_string(word["value"])} for word in words]
+
+
+def parse_strings_file(strings_path, excluded_keys):
     words = []
 
     try:
-        tree = ET.parse(strings_path)
-        root = tree.getroot()
-
-        for string_element in root.findall("string"):
-            key = string_element.attrib.get("name", "")
-            if key in excluded_keys:
+        for resource in iter_string_resources(strings_path):
+            if resource.name in excluded_keys or resource.key in excluded_keys:
                 continue
 
-            value = string_element.text
+            value = resource.value
             if value:
                 cleaned_value = " ".join(value.split())
-                words.append({"key": key, "value": cleaned_value})
+                words.append({"key": resource.key, "value": cleaned_value})
         if _is_debug:
             print(f"Collected {len(words)} string(s) from {strings_path}")
         return words
@@ -95,17 +694,22 @@ def get_languages(global_config: Configuration):
     return global_config.target_languages
 
 
+def get_language_dir_path(language, module):
+    strings_path = module["strings"]
+    res_dir = os.path.abspath(os.path.join(strings_path, "..", ".."))  # this gets to the `res` directory
+    lang_dir_name = f"values-{language}"
+
+    return os.path.join(res_dir, lang_dir_name)
+
+
 def make_language_dir_if_not_exists(language, module):
     if _is_debug:
         print("Make language dir!")
 
-    strings_path = module["strings"]
-    res_dir = os.path.abspath(os.path.join(strings_path, "..", ".."))  # this gets to the `res` directory
-    lang_dir_name = f"values-{language}"
-    lang_dir_path = os.path.join(res_dir, lang_dir_name)
+    lang_dir_path = get_language_dir_path(language, module)
 
     if not os.path.exists(lang_dir_path):
-        os.makedirs(lang_dir_path)
+        os.makedirs(lang_dir_path, exist_ok=True)
         if _is_debug:
             print(f"Created directory: {lang_dir_path}")
     else:
@@ -115,7 +719,102 @@ def make_language_dir_if_not_exists(language, module):
     return lang_dir_path
 
 
-def translate_all_words_to_language(prompt_path, words, target_language, global_config, module_config):
+def translate_all_words_to_languages(prompt_path, words_by_language, global_config, module_config, cache=None,
+                                     module=None):
+    if _is_debug:
+        print("Translate all words to languages!")
+
+    language_with_words = {language: [] for language in words_by_language}
+
+    for languages in group_languages_by_words(words_by_language):
+        words = words_by_language[languages[0]]
+
+        if len(languages) == 1:
+            language_with_words[languages[0]] = translate_all_words_to_language(
+                prompt_path,
+                words,
+                languages[0],
+                global_config,
+                module_config,
+                cache,
+                module
+            )
+        else:
+            translated = translate_multi(
+                prompt_path=prompt_path,
+                global_config=global_config,
+                module_description=module_config.module_description if module_config else "",
+                target_languages=languages,
+                words=words,
+                cache=cache,
+                module=module
+            )
+
+            for language in languages:
+                validate_translated_words(translated[language])
+                language_with_words[language] = translated[language]
+
+    return language_with_words
+
+
+async def translate_all_words_to_languages_async(prompt_path, words_by_language, global_config, module_config,
+                                                 cache=None, module=None):
+    if _is_debug:
+        print("Translate all words to languages (async)!")
+
+    language_with_words = {language: [] for language in words_by_language}
+
+    groups = group_languages_by_words(words_by_language)
+
+    async def translate_group(languages):
+        # Groups run concurrently on the event loop, each takes a lane of its own in the trace
+        with span(", ".join(languages), "language group", track=len(groups) > 1):
+            words = words_by_language[languages[0]]
+
+            if len(languages) == 1:
+                translated = {
+                    languages[0]: await translate_async(
+                        prompt_path=prompt_path,
+                        global_config=global_config,
+                        module_description=module_config.module_description if module_config else "",
+                        target_language=languages[0],
+                        words=words,
+                        cache=cache,
+                        module=module
+                    )
+                }
+            else:
+                translated = await translate_multi_async(
+                    prompt_path=prompt_path,
+                    global_config=global_config,
+                    module_description=module_config.module_description if module_config else "",
+                    target_languages=languages,
+                    words=words,
+                    cache=cache,
+                    module=module
+                )
+
+            for language in languages:
+                validate_translated_words(translated[language])
+                language_with_words[language] = translated[language]
+
+    await asyncio.gather(*[translate_group(languages) for languages in groups])
+
+    return language_with_words
+
+
+def group_languages_by_words(words_by_language):
+    # Languages that need the same strings share one multi-language request
+    groups = {}
+    for language, words in words_by_language.items():
+        if words:
+            groups.setdefault(tuple(word["key"] for word in words), []).append(language)
+
+    return list(groups.values())
+
+
+def translate_all_words_to_language(prompt_path, words, target_language, global_config, module_config, cache=None,
+                                    module=None):
     if _is_debug:
         print("Translate all words to language!")
 
@@ -126,64 +825,34 @@ def translate_all_words_to_language(prompt_path, words, target_language, global_
         global_config=global_config,
         module_description=module_description,
         target_language=target_language,
-        words=words
+        words=words,
+        cache=cache,
+        module=module
     )
 
     if _is_debug:
         print(f"Translated count {len(translated_words)} string(s)")
 
-    for word in translated_words:
-        if not word.get("key") or not word.get("value"):
-            raise ValueError(f"Invalid translated word: {word}")
+    validate_translated_words(translated_words)
 
     return translated_words
 
 
-def escape_android_string(value):
-    if value is None:
-        return ""
-
-    # First, escape &, <, > with XML-safe sequences
-    escaped = html.escape(value, quote=False)
-
-    # Then handle Android-specific rules
-    escaped = escaped.replace("'", "\\'")
-    escaped = escaped.replace('"', '\\"')
-
-    return escaped
+def validate_translated_words(translated_words):
+    for word in translated_words:
+        if not word.get("key") or not word.get("value"):
+            raise ValueError(f"Invalid translated word: {word}")
 
 
 def write_words_to_strings_file(lang_dir_path, words):
     if _is_debug:
         print("Write words to strings file!")
 
-    # Path to strings.xml
-    strings_file_path = os.path.join(lang_dir_path, "strings.xml")
-
-    # Build new XML structure
-    resources = ET.Element("resources")
-    resources.insert(0, ET.Comment("Generated Translator AI"))
-
-    for word in words:
-        string_element = ET.SubElement(resources, "string")
-        string_element.set("name", word["key"])
-        string_element.text = escape_android_string(word["value"])
-
-    # Convert to pretty XML string
-    rough_string = ET.tostring(resources, encoding="utf-8")
-    parsed = minidom.parseString(rough_string)
-    pretty_xml = parsed.toprettyxml(indent="    ", encoding="utf-8")
+    return write_strings_file(lang_dir_path, words)
 
-    # Write to file (overwrite existing or create new)
-    with open(strings_file_path, "wb") as f:
-        f.write(pretty_xml)
 
-    # Ensure the file is closed properly
-    if _is_debug:
-        print(f"Wrote {len(words)} translated strings to {strings_file_path}")
-
-
-def make_report(configuration, execution_graph, modules_language_data):
+def make_report(configuration, execution_graph, modules_language_data, cache=None, writer=None,
+                deduplication=None, run_report=None, journal=None):
     print("\n===== TRANSLATION REPORT =====\n")
 
     print("🔧 Configuration Used:")
@@ -210,4 +879,52 @@ def make_report(configuration, execution_graph, modules_language_data):
 
     print("🧾 Summary:")
     print(f"- Total translated lines: {total_translated_lines}")
+    if cache is not None:
+        print(f"- Translation cache     : {cache.hits} hit(s), {cache.misses} miss(es)")
+    if deduplication is not None and deduplication["shared_keys"]:
+        print(f"- Deduplication         : {deduplication['duplicates']} duplicate(s) of "
+              f"{len(deduplication['shared_keys'])} string(s) translated once")
+        print(f"- Without / with dedup  : ~{deduplication.get('requests_before', 0)} / "
+              f"~{deduplication.get('requests_after', 0)} request(s), ~{deduplication.get('tokens_before', 0)} / "
+              f"~{deduplication.get('tokens_after', 0)} token(s)")
+    for ai_provider, usage in get_usage().items():
+        cached_share = usage["cached_tokens"] / usage["input_tokens"] if usage["input_tokens"] else 0
+        print(f"- Tokens ({ai_provider}){' ' * max(0, 15 - len(ai_provider))}: {usage['calls']} call(s), "
+              f"{usage['input_tokens']} input ({usage['cached_tokens']} cached, {cached_share:.0%}), "
+              f"{usage['output_tokens']} output")
+    if writer is not None:
+        print(f"- Strings files         : {writer.written_count} written, {writer.unchanged_count} unchanged")
+    if journal is not None:
+        print(f"- Checkpoint journal    : {journal.recorded_count} recorded, {journal.resumed_count} resumed")
+    if run_report is not None and run_report["totals"]["calls"]:
+        print_performance(run_report)
     print("\n✅ Translation completed.\n")
+
+
+def format_seconds(value):
+    return f"{value:.2f}s" if value is not None else "-"
+
+
+def print_performance(run_report):
+    totals = run_report["totals"]
+
+    print("\n⏱️ Performance:")
+    print(f"- Wall time             : {format_seconds(run_report['run']['elapsed'])}")
+    print(f"- Calls                 : {totals['calls']} "
+          f"({', '.join(f'{count} {outcome}' for outcome, count in sorted(totals['outcomes'].items()))}), "
+          f"{totals['retries']} retried")
+    print(f"- Latency p50/p90/p99   : {format_seconds(totals['latency']['p50'])} / "
+          f"{format_seconds(totals['latency']['p90'])} / {format_seconds(totals['latency']['p99'])}")
+    if totals["ttft"]["p50"] is not None:
+        print(f"- First token p50/p90   : {format_seconds(totals['ttft']['p50'])} / "
+              f"{format_seconds(totals['ttft']['p90'])}")
+    print(f"- Throughput            : {totals['strings_per_second'] or 0:.1f} strings/s, "
+          f"{totals['tokens_per_second'] or 0:.0f} tokens/s")
+    for currency, cost in totals["cost"].items():
+        print(f"- Estimated cost        : {cost:.4f} {currency}")
+
+    # The slowest modules are where a smaller chunk or a higher concurrency pays off first
+    slowest = sorted(run_report["by_module"].items(), key=lambda item: item[1]["latency"]["sum"], reverse=True)
+    for module, summary in slowest[:3]:
+        print(f"  🐢 {module}: {summary['calls']} call(s), {format_seconds(summary['latency']['sum'])} in calls, "
+              f"p90 {format_seconds(summary['latency']['p90'])}")
@@ -15,22 +15,28 @@
 import os
 import yaml
 
-from client import validate
+from client import configure_requests, validate_prompt_template
 from models import Configuration
+from tracing import span
 
 _is_debug = False
 
 
-def init(project_dir):
+def init(project_dir, configure_client=True):
     print("Init!")
 
     file = find_configuration_file(project_dir)
 
     prompt_path = find_prompt_file(project_dir)
 
-    config = parse_configuration_file(file)
+    with span("parse configuration", "init"):
+        config = parse_configuration_file(file)
 
-    init_client(config)
+    validate_prompt_template(config, prompt_path)
+
+    # A plan is made from the configuration and the strings only, it never sets up a request to the AI provider
+    if configure_client:
+        init_client(config)
 
     return config, prompt_path
 
@@ -92,4 +98,6 @@ def init_client(configuration_config):
     if _is_debug:
         print("Init client!")
 
-    validate(configuration_config)
+    # The credentials are validated by `execute` right before the first request, a run with nothing to translate
+    # never talks to the AI provider
+    configure_requests(configuration_config)
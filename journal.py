@@ -0,0 +1,186 @@
+# Copyright 2025 Roman Likhachev
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import hashlib
+import json
+import os
+import threading
+import time
+
+from strings_file import hash_file, strings_file_name
+
+journal_file_name = "journal.jsonl"
+journal_version = 1
+
+_is_debug = False
+
+
+# The checkpoint journal records every (module, language) whose strings.xml was written, together with a hash of
+# everything the translation depends on and a hash of the written file. Each record is one JSON line, appended and
+# fsynced as soon as the file is in place, so a crash loses at most the record being written. A resumed run skips
+# the languages whose record still matches the source strings and whose file was not touched since.
+def make_source_hash(configuration, module, words, prompt_hash):
+    module_config = module["configuration"]
+    data = {
+        "words": [[word["key"], word["value"]] for word in words],
+        "module_description": module_config.module_description if module_config else "",
+        "source_language": configuration.source_language,
+        "app_description": configuration.app_description,
+        "ai_provider": configuration.ai_provider,
+        "ai_model": configuration.ai_model,
+        "prompt_hash": prompt_hash
+    }
+
+    return hashlib.sha256(json.dumps(data, ensure_ascii=False, sort_keys=True).encode("utf-8")).hexdigest()
+
+
+class Journal:
+
+    def __init__(self, state_dir):
+        self.state_dir = state_dir
+        self.project_dir = os.path.dirname(os.path.abspath(state_dir))
+        self.journal_path = os.path.join(state_dir, journal_file_name)
+
+        self.recorded_count = 0
+        self.resumed_count = 0
+
+        # (module, language) -> latest record
+        self._records = {}
+        self._file = None
+        self._lock = threading.Lock()
+
+    def open(self):
+        line_count = self._load()
+
+        # Superseded records are dropped once they outnumber the live ones
+        if line_count > 2 * len(self._records):
+            self._compact()
+        else:
+            self._drop_partial_record()
+
+        self._file = open(self.journal_path, "a", encoding="utf-8")
+
+        return self
+
+    def load(self):
+        # The records only, the journal is not opened for writing
+        self._load()
+
+        return self
+
+    def close(self):
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+    def get_module_key(self, module):
+        return self._relative_path(module["strings"])
+
+    def is_done(self, module, language, source_hash, lang_dir_path):
+        record = self._records.get((self.get_module_key(module), language))
+        if record is None or record.get("source_hash") != source_hash:
+            return False
+
+        # The file must still be the one the run wrote, an edited or deleted file is translated again
+        output_path = os.path.join(lang_dir_path, strings_file_name)
+        if self._relative_path(output_path) != record.get("output") or not os.path.exists(output_path):
+            return False
+
+        return hash_file(output_path) == record.get("output_hash")
+
+    def record(self, module, language, source_hash, lang_dir_path):
+        output_path = os.path.join(lang_dir_path, strings_file_name)
+        record = {
+            "version": journal_version,
+            "module": self.get_module_key(module),
+            "language": language,
+            "source_hash": source_hash,
+            "output": self._relative_path(output_path),
+            "output_hash": hash_file(output_path),
+            "time": time.time()
+        }
+        line = json.dumps(record, ensure_ascii=False) + "\n"
+
+        with self._lock:
+            if self._file is None:
+                return
+
+            self._file.write(line)
+            self._file.flush()
+            os.fsync(self._file.fileno())
+
+            self._records[(record["module"], language)] = record
+            self.recorded_count += 1
+
+        if _is_debug:
+            print(f"Journal: {record['module']} → {language} done")
+
+    def _relative_path(self, path):
+        return os.path.relpath(os.path.abspath(path), self.project_dir).replace(os.sep, "/")
+
+    def _load(self):
+        if not os.path.exists(self.journal_path):
+            return 0
+
+        line_count = 0
+        with open(self.journal_path, "r", encoding="utf-8") as f:
+            for line in f:
+                line_count += 1
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    # The tail of a record that was being written during a crash
+                    continue
+
+                if isinstance(record, dict) and record.get("version") == journal_version:
+                    self._records[(record.get("module"), record.get("language"))] = record
+
+        if _is_debug:
+            print(f"Journal: loaded {len(self._records)} record(s) from {line_count} line(s)")
+
+        return line_count
+
+    def _drop_partial_record(self):
+        # A record cut off by a crash has no newline, the next record appended to it would be lost with it
+        if not os.path.exists(self.journal_path):
+            return
+
+        with open(self.journal_path, "rb+") as f:
+            f.seek(0, os.SEEK_END)
+            size = f.tell()
+            if size == 0:
+                return
+
+            f.seek(size - 1)
+            if f.read(1) == b"\n":
+                return
+
+            f.seek(0)
+            content = f.read()
+            f.truncate(content.rfind(b"\n") + 1)
+            f.flush()
+            os.fsync(f.fileno())
+
+        if _is_debug:
+            print("Journal: dropped a partial record at the end")
+
+    def _compact(self):
+        temp_path = f"{self.journal_path}.tmp"
+        with open(temp_path, "w", encoding="utf-8") as f:
+            for record in self._records.values():
+                f.write(json.dumps(record, ensure_ascii=False) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp_path, self.journal_path)
@@ -0,0 +1,212 @@
+# Copyright 2025 Roman Likhachev
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import json
+
+_is_debug = False
+
+
+# Incremental decoder of the JSON the AI answers with. Text can be fed in arbitrary pieces, every object of the
+# root array is returned as soon as its closing brace arrives. Two layouts are supported:
+# - root "[": an array of items, returned as (None, item)
+# - root "{": an object of arrays keyed by language code, returned as (language, item)
+# Any text before the root and after it is ignored. With `strict=False` malformed items are skipped.
+class JsonItemDecoder:
+
+    def __init__(self, root="[", strict=True):
+        if root not in ("[", "{"):
+            raise ValueError(f"Unsupported JSON root: {root}")
+
+        self.root = root
+        self.strict = strict
+        self.skipped_count = 0
+        self.is_started = False
+        self.is_complete = False
+
+        self._stack = []
+        self._in_string = False
+        self._escape = False
+
+        self._item_chars = None
+        self._item_depth = 0
+
+        self._key_chars = None
+        self._last_key = None
+        self._current_key = None
+
+    def feed(self, text):
+        items = []
+
+        for char in text:
+            if self.is_complete:
+                break
+
+            if not self.is_started:
+                if char == self.root:
+                    self.is_started = True
+                    self._stack.append(char)
+                continue
+
+            if self._item_chars is not None:
+                self._item_chars.append(char)
+
+            if self._in_string:
+                self._feed_string_char(char)
+                continue
+
+            if char == '"':
+                self._in_string = True
+                # Strings directly inside the root object are the language codes
+                if self._item_chars is None and self._stack == ["{"]:
+                    self._key_chars = []
+            elif char in "[{":
+                if char == "{" and self._item_chars is None and self._is_item_container():
+                    self._item_chars = [char]
+                    self._item_depth = len(self._stack)
+                elif char == "[" and self._stack == ["{"]:
+                    self._current_key = self._last_key
+                self._stack.append(char)
+            elif char in "]}":
+                if self._stack:
+                    self._stack.pop()
+
+                if self._item_chars is not None and len(self._stack) == self._item_depth:
+                    item_text = "".join(self._item_chars)
+                    self._item_chars = None
+
+                    try:
+                        item = json.loads(item_text)
+                    except ValueError:
+                        if self.strict:
+                            raise
+                        self.skipped_count += 1
+                        continue
+
+                    items.append((self._current_key if self.root == "{" else None, item))
+
+                if not self._stack:
+                    self.is_complete = True
+
+        return items
+
+    def _feed_string_char(self, char):
+        if self._escape:
+            self._escape = False
+        elif char == "\\":
+            self._escape = True
+        elif char == '"':
+            self._in_string = False
+            if self._key_chars is not None:
+                self._last_key = json.loads('"' + "".join(self._key_chars) + '"')
+                self._key_chars = None
+            return
+
+        if self._key_chars is not None:
+            self._key_chars.append(char)
+
+    def _is_item_container(self):
+        if self.root == "[":
+            return self._stack == ["["]
+        return self._stack == ["{", "["]
+
+
+def salvage_items(text, root="["):
+    decoder = JsonItemDecoder(root=root, strict=False)
+    items = decoder.feed(text)
+
+    if _is_debug:
+        print(f"Salvaged {len(items)} item(s), skipped {decoder.skipped_count} malformed item(s)")
+
+    return items
+
+
+# Incremental decoder of the keyed encoding: {"key": "value", ...}, or {"es": {"key": "value", ...}, ...} with
+# `nested=True`. Every member is returned as (language or None, {"key": ..., "value": ...}) as soon as its value
+# string is closed. Members whose value is not a string are skipped.
+class JsonMemberDecoder:
+
+    def __init__(self, nested=False):
+        self.nested = nested
+        self.is_started = False
+        self.is_complete = False
+
+        self._member_depth = 2 if nested else 1
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self._string_chars = None
+
+        self._is_value = False
+        self._key = None
+        self._language = None
+
+    def feed(self, text):
+        items = []
+
+        for char in text:
+            if self.is_complete:
+                break
+
+            if not self.is_started:
+                if char == "{":
+                    self.is_started = True
+                    self._depth = 1
+                continue
+
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif char == "\\":
+                    self._escape = True
+                elif char == '"':
+                    self._in_string = False
+                    self._on_string(json.loads('"' + "".join(self._string_chars) + '"'), items)
+                    continue
+
+                self._string_chars.append(char)
+                continue
+
+            if char == '"':
+                self._in_string = True
+                self._string_chars = []
+            elif char == ":":
+                self._is_value = True
+            elif char == ",":
+                self._is_value = False
+                self._key = None
+            elif char in "{[":
+                self._depth += 1
+                self._is_value = False
+            elif char in "}]":
+                self._depth -= 1
+                self._is_value = False
+                self._key = None
+                if self._depth == 0:
+                    self.is_complete = True
+
+        return items
+
+    def _on_string(self, value, items):
+        if self._depth == self._member_depth:
+            if not self._is_value:
+                self._key = value
+            elif self._key is not None:
+                items.append((self._language, {"key": self._key, "value": value}))
+                self._key = None
+        elif self.nested and self._depth == 1 and not self._is_value:
+            self._language = value
+
+
+def salvage_members(text, nested=False):
+    return JsonMemberDecoder(nested=nested).feed(text)
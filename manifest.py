@@ -0,0 +1,68 @@
+# Copyright 2025 Roman Likhachev
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import json
+import os
+
+manifest_file_name = "manifest.json"
+manifest_version = 1
+
+_is_debug = False
+
+
+# The manifest remembers what the previous run discovered: for every scanned directory its mtime, its child
+# directories and which files of interest it contains, and for every translator-config.yml its parsed content.
+# A directory whose mtime did not change is not listed again, a config file whose mtime and size did not change
+# is not parsed again.
+def new_manifest(ignored_dirs):
+    return {
+        "version": manifest_version,
+        "ignored_dirs": sorted(ignored_dirs),
+        "dirs": {},
+        "configs": {}
+    }
+
+
+def load_manifest(state_dir, ignored_dirs):
+    manifest_path = os.path.join(state_dir, manifest_file_name)
+    if not os.path.exists(manifest_path):
+        return new_manifest(ignored_dirs)
+
+    try:
+        with open(manifest_path, "r", encoding="utf-8") as f:
+            manifest = json.load(f)
+    except (OSError, ValueError) as e:
+        print(f"Ignoring unreadable manifest {manifest_path}: {e}")
+        return new_manifest(ignored_dirs)
+
+    # A different ignore list changes what is discovered, so nothing can be reused
+    if manifest.get("version") != manifest_version or manifest.get("ignored_dirs") != sorted(ignored_dirs):
+        return new_manifest(ignored_dirs)
+
+    if _is_debug:
+        print(f"Loaded manifest with {len(manifest['dirs'])} directories from {manifest_path}")
+
+    return manifest
+
+
+def save_manifest(state_dir, manifest):
+    manifest_path = os.path.join(state_dir, manifest_file_name)
+
+    temp_path = f"{manifest_path}.tmp"
+    with open(temp_path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, ensure_ascii=False)
+    os.replace(temp_path, manifest_path)
+
+    if _is_debug:
+        print(f"Saved manifest with {len(manifest['dirs'])} directories to {manifest_path}")
@@ -0,0 +1,391 @@
+# Copyright 2025 Roman Likhachev
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import contextlib
+import contextvars
+import math
+import threading
+import time
+from datetime import datetime, timezone
+
+_lock = threading.Lock()
+# ai_provider -> token usage reported by the provider
+_usage = {}
+
+_is_debug = False
+
+
+def record_usage(ai_provider, input_tokens, cached_tokens=0, output_tokens=0):
+    input_tokens = input_tokens or 0
+    cached_tokens = cached_tokens or 0
+    output_tokens = output_tokens or 0
+
+    if _is_debug:
+        print(f"Usage ({ai_provider}): {input_tokens} input token(s), {cached_tokens} cached, "
+              f"{output_tokens} output token(s)")
+
+    with _lock:
+        usage = _usage.setdefault(
+            ai_provider,
+            {"calls": 0, "input_tokens": 0, "cached_tokens": 0, "output_tokens": 0}
+        )
+        usage["calls"] += 1
+        usage["input_tokens"] += input_tokens
+        usage["cached_tokens"] += cached_tokens
+        usage["output_tokens"] += output_tokens
+
+    record = _current_call.get()
+    if record is not None:
+        record["input_tokens"] += input_tokens
+        record["cached_tokens"] += cached_tokens
+        record["output_tokens"] += output_tokens
+
+
+def get_usage():
+    with _lock:
+        return {ai_provider: dict(usage) for ai_provider, usage in _usage.items()}
+
+
+def reset_usage():
+    with _lock:
+        _usage.clear()
+
+
+def add_usage(usage_by_provider):
+    # Adds the usage of other processes, like the shards of a sharded run
+    with _lock:
+        for ai_provider, usage in usage_by_provider.items():
+            total = _usage.setdefault(
+                ai_provider,
+                {"calls": 0, "input_tokens": 0, "cached_tokens": 0, "output_tokens": 0}
+            )
+            for name in total:
+                total[name] += usage.get(name, 0)
+
+
+# Per-call metrics. `track_call` wraps one provider call: the token usage and the governor retries reported while it
+# runs are added to the record of the call through a context variable, which follows the thread or the asyncio task.
+CALL_OK = "ok"
+CALL_PARTIAL = "partial"
+CALL_INVALID = "invalid"
+CALL_FAILED = "failed"
+
+_current_call = contextvars.ContextVar("current_call", default=None)
+_calls = []
+_run = {"started": time.time(), "started_monotonic": time.monotonic()}
+
+
+def start_run():
+    with _lock:
+        _calls.clear()
+        _run["started"] = time.time()
+        _run["started_monotonic"] = time.monotonic()
+
+
+@contextlib.contextmanager
+def track_call(ai_provider, ai_model, module, languages, chunk_size, streaming=False):
+    record = {
+        "provider": ai_provider,
+        "model": ai_model or "",
+        "module": module or "",
+        "languages": list(languages),
+        "chunk_size": chunk_size,
+        "streaming": streaming,
+        "started": time.monotonic() - _run["started_monotonic"],
+        "latency": None,
+        "ttft": None,
+        "input_tokens": 0,
+        "cached_tokens": 0,
+        "output_tokens": 0,
+        "retries": 0,
+        "strings": 0,
+        "outcome": CALL_OK
+    }
+
+    token = _current_call.set(record)
+    started = time.monotonic()
+    try:
+        yield record
+    except ValueError:
+        record["outcome"] = CALL_INVALID
+        raise
+    except BaseException:
+        record["outcome"] = CALL_FAILED
+        raise
+    finally:
+        record["latency"] = time.monotonic() - started
+        _current_call.reset(token)
+
+        # `strings` is set by the caller: the translated items over every language of the call
+        if record["outcome"] == CALL_OK and record["strings"] < chunk_size * len(record["languages"]):
+            record["outcome"] = CALL_PARTIAL
+
+        if _is_debug:
+            print(f"Call ({ai_provider}): {record['outcome']} in {record['latency']:.3f}s, "
+                  f"{record['strings']} of {chunk_size} string(s)")
+
+        with _lock:
+            _calls.append(record)
+
+
+def mark_first_token():
+    record = _current_call.get()
+    if record is not None and record["ttft"] is None:
+        record["ttft"] = time.monotonic() - _run["started_monotonic"] - record["started"]
+
+
+def record_retry(error=None):
+    record = _current_call.get()
+    if record is not None:
+        record["retries"] += 1
+
+
+def get_calls(start=0):
+    with _lock:
+        return [dict(record) for record in _calls[start:]]
+
+
+def percentile(values, share):
+    # Nearest-rank percentile, None without values
+    if not values:
+        return None
+
+    values = sorted(values)
+    return values[max(0, math.ceil(share * len(values)) - 1)]
+
+
+def estimate_cost(prices, input_tokens, cached_tokens, output_tokens):
+    if prices is None:
+        return None
+
+    input_price, cached_price, output_price = prices
+    return ((input_tokens - cached_tokens) * input_price + cached_tokens * cached_price +
+            output_tokens * output_price) / 1_000_000
+
+
+def summarize_calls(calls, prices_by_provider, elapsed=None):
+    summary = {
+        "calls": len(calls),
+        "outcomes": {},
+        "retries": 0,
+        "strings": 0,
+        "input_tokens": 0,
+        "cached_tokens": 0,
+        "output_tokens": 0,
+        "cost": {}
+    }
+
+    for call in calls:
+        summary["outcomes"][call["outcome"]] = summary["outcomes"].get(call["outcome"], 0) + 1
+        summary["retries"] += call["retries"]
+        summary["strings"] += call["strings"]
+        summary["input_tokens"] += call["input_tokens"]
+        summary["cached_tokens"] += call["cached_tokens"]
+        summary["output_tokens"] += call["output_tokens"]
+
+        prices, currency = prices_by_provider.get(call["provider"], (None, None))
+        cost = estimate_cost(prices, call["input_tokens"], call["cached_tokens"], call["output_tokens"])
+        if cost is not None:
+            summary["cost"][currency] = summary["cost"].get(currency, 0.0) + cost
+
+    latencies = [call["latency"] for call in calls]
+    ttfts = [call["ttft"] for call in calls if call["ttft"] is not None]
+    summary["latency"] = {
+        "p50": percentile(latencies, 0.5),
+        "p90": percentile(latencies, 0.9),
+        "p99": percentile(latencies, 0.99),
+        "max": max(latencies, default=None),
+        "sum": sum(latencies),
+        "count": len(latencies)
+    }
+    summary["ttft"] = {
+        "p50": percentile(ttfts, 0.5),
+        "p90": percentile(ttfts, 0.9),
+        "p99": percentile(ttfts, 0.99),
+        "sum": sum(ttfts),
+        "count": len(ttfts)
+    }
+
+    # Throughput over the wall time the calls spanned, concurrent calls overlap
+    if elapsed is None and calls:
+        elapsed = max(call["started"] + call["latency"] for call in calls) - min(call["started"] for call in calls)
+    summary["elapsed"] = elapsed or 0.0
+    tokens = summary["input_tokens"] + summary["output_tokens"]
+    summary["strings_per_second"] = summary["strings"] / elapsed if elapsed else None
+    summary["tokens_per_second"] = tokens / elapsed if elapsed else None
+
+    return summary
+
+
+def split_call(call):
+    # One record per language of a multi-language call, with the strings and tokens shared equally. The call itself
+    # and its retries count for every language.
+    count = max(1, len(call["languages"]))
+    if count == 1:
+        return [call]
+
+    return [
+        dict(
+            call,
+            languages=[language],
+            strings=call["strings"] / count,
+            input_tokens=call["input_tokens"] / count,
+            cached_tokens=call["cached_tokens"] / count,
+            output_tokens=call["output_tokens"] / count
+        )
+        for language in call["languages"]
+    ]
+
+
+def group_calls(calls, get_label):
+    groups = {}
+    for call in calls:
+        groups.setdefault(get_label(call), []).append(call)
+
+    return groups
+
+
+# prices_by_provider: ai_provider -> ((input, cached input, output) per 1M tokens or None, currency)
+def build_report(prices_by_provider, extra=None):
+    return build_calls_report(
+        get_calls(),
+        prices_by_provider,
+        time.monotonic() - _run["started_monotonic"],
+        datetime.fromtimestamp(_run["started"], timezone.utc).isoformat(),
+        extra
+    )
+
+
+def build_calls_report(calls, prices_by_provider, elapsed, started, extra=None):
+    language_calls = [part for call in calls for part in split_call(call)]
+
+    report = {
+        "run": {
+            "started": started,
+            "elapsed": elapsed,
+            **(extra or {})
+        },
+        "prices": {
+            ai_provider: {"per_million_tokens": list(prices) if prices else None, "currency": currency}
+            for ai_provider, (prices, currency) in prices_by_provider.items()
+        },
+        "totals": summarize_calls(calls, prices_by_provider, elapsed),
+        "by_provider": {
+            label: summarize_calls(group, prices_by_provider)
+            for label, group in group_calls(calls, lambda call: call["provider"]).items()
+        },
+        "by_module": {
+            label: summarize_calls(group, prices_by_provider)
+            for label, group in group_calls(calls, lambda call: call["module"]).items()
+        },
+        "by_language": {
+            label: summarize_calls(group, prices_by_provider)
+            for label, group in group_calls(language_calls, lambda call: call["languages"][0]).items()
+        },
+        "calls": calls
+    }
+
+    return report
+
+
+def merge_reports(reports, extra=None):
+    # Reports of runs that ran side by side: the calls are pooled and the wall time is the one of the longest run
+    prices_by_provider = {}
+    calls = []
+    for report in reports:
+        for ai_provider, price in report["prices"].items():
+            prices = price["per_million_tokens"]
+            prices_by_provider[ai_provider] = (tuple(prices) if prices else None, price["currency"])
+        calls.extend(report["calls"])
+
+    return build_calls_report(
+        calls,
+        prices_by_provider,
+        max((report["run"]["elapsed"] for report in reports), default=0.0),
+        min((report["run"]["started"] for report in reports), default=None),
+        extra
+    )
+
+
+def escape_label(value):
+    return str(value).replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+
+def format_labels(labels):
+    return "{" + ",".join(f'{name}="{escape_label(value)}"' for name, value in labels.items()) + "}"
+
+
+# Prometheus text exposition format, for a node exporter textfile collector or a push gateway. The aggregates by
+# module and by language are separate metric families, so that summing over a family never counts a call twice.
+def format_prometheus(report):
+    lines = []
+
+    def metric(name, metric_type, help_text, samples):
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} {metric_type}")
+        for labels, value in samples:
+            if value is not None:
+                lines.append(f"{name}{format_labels(labels) if labels else ''} {value:g}")
+
+    metric("aitranslator_run_duration_seconds", "gauge", "Wall time of the translation run.",
+           [({}, report["run"]["elapsed"])])
+
+    for prefix, label_name, summaries in (
+            ("aitranslator", "provider", report["by_provider"]),
+            ("aitranslator_module", "module", report["by_module"]),
+            ("aitranslator_language", "language", report["by_language"])
+    ):
+        metric(f"{prefix}_calls_total", "counter", f"Provider calls by {label_name} and outcome.", [
+            ({label_name: label, "outcome": outcome}, count)
+            for label, summary in summaries.items()
+            for outcome, count in summary["outcomes"].items()
+        ])
+        metric(f"{prefix}_retries_total", "counter", f"Retries of the request governor by {label_name}.", [
+            ({label_name: label}, summary["retries"]) for label, summary in summaries.items()
+        ])
+        metric(f"{prefix}_strings_total", "counter", f"Strings translated by provider calls by {label_name}.", [
+            ({label_name: label}, summary["strings"]) for label, summary in summaries.items()
+        ])
+        metric(f"{prefix}_tokens_total", "counter", f"Tokens reported by the provider by {label_name}.", [
+            ({label_name: label, "type": token_type}, summary[f"{token_type}_tokens"])
+            for label, summary in summaries.items()
+            for token_type in ("input", "cached", "output")
+        ])
+        metric(f"{prefix}_cost_total", "counter", f"Estimated cost from the model prices by {label_name}.", [
+            ({label_name: label, "currency": currency}, cost)
+            for label, summary in summaries.items()
+            for currency, cost in summary["cost"].items()
+        ])
+        metric(f"{prefix}_strings_per_second", "gauge", f"Translated strings per second by {label_name}.", [
+            ({label_name: label}, summary["strings_per_second"]) for label, summary in summaries.items()
+        ])
+        metric(f"{prefix}_tokens_per_second", "gauge", f"Input and output tokens per second by {label_name}.", [
+            ({label_name: label}, summary["tokens_per_second"]) for label, summary in summaries.items()
+        ])
+
+    for name, key, help_text in (
+            ("aitranslator_call_latency_seconds", "latency", "Wall latency of provider calls."),
+            ("aitranslator_time_to_first_token_seconds", "ttft", "Time to the first streamed token.")
+    ):
+        metric(name, "summary", help_text, [
+            ({"provider": label, "quantile": quantile}, summary[key][percentile_key])
+            for label, summary in report["by_provider"].items()
+            for quantile, percentile_key in (("0.5", "p50"), ("0.9", "p90"), ("0.99", "p99"))
+        ])
+        # A summary is read through its sum and count, the quantiles alone cannot be aggregated
+        for label, summary in report["by_provider"].items():
+            lines.append(f"{name}_sum{format_labels({'provider': label})} {summary[key]['sum']:g}")
+            lines.append(f"{name}_count{format_labels({'provider': label})} {summary[key]['count']:g}")
+
+    return "\n".join(lines) + "\n"
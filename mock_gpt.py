@@ -0,0 +1,460 @@
+# Copyright 2025 Roman Likhachev
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+# Local stand-in for an AI provider. It does not translate anything: it answers every prompt with the
+# strings it was asked to translate, after a configurable delay, and fails at configurable rates.
+# Used to measure and regression-test the pipeline without paying for API calls.
+
+import asyncio
+import json
+import os
+import random
+import re
+import threading
+import time
+
+from ai_errors import RetryableError
+from batch_backend import BatchBackend, BATCH_COMPLETED, BATCH_IN_PROGRESS
+from metrics import record_usage
+from tracing import traced
+from wire_encoding import ENCODING_COMPACT, ENCODING_JSON, ENCODING_KEYED, ENCODING_LINES, format_response, \
+    line_item_pattern
+
+default_ai_model = "mock"
+
+# (max input tokens, max output tokens)
+default_token_limits = (128_000, 16_384)
+
+default_settings = {
+    # Seconds before the first token and per generated token
+    "latency": 0.5,
+    "tokenLatency": 0.0,
+    # Probability of a 503 error, a 429 error and a response cut in the middle
+    "errorRate": 0.0,
+    "rateLimitRate": 0.0,
+    "truncationRate": 0.0,
+    # Retry-After header value sent with 429 errors, None to omit it
+    "retryAfter": None,
+    "seed": None,
+    # Prompt prefix caching like OpenAI: prefixes of at least `cacheMinTokens` tokens are cached
+    # in blocks of `cacheBlockTokens` tokens
+    "cacheMinTokens": 1024,
+    "cacheBlockTokens": 128,
+    # Seconds before a submitted batch job completes, `errorRate` and `truncationRate` apply to its lines
+    "batchLatency": 0.0,
+    # Requests of one batch job, None for no limit
+    "batchMaxRequests": None,
+}
+
+supports_batch = True
+
+_settings = dict(default_settings)
+
+_stats_lock = threading.Lock()
+_stats = {
+    "requests": 0,
+    "errors": 0,
+    "rate_limited": 0,
+    "truncated": 0,
+    "input_tokens": 0,
+    "cached_tokens": 0,
+    "output_tokens": 0,
+}
+
+# Hashes of the prompt prefixes seen so far
+_prefix_cache_lock = threading.Lock()
+_prefix_cache = set()
+
+_is_debug = False
+
+
+def set_mock_settings(settings):
+    _settings.clear()
+    _settings.update(default_settings)
+    _settings.update(settings or {})
+
+
+def get_mock_stats():
+    with _stats_lock:
+        return dict(_stats)
+
+
+def reset_mock_stats():
+    with _stats_lock:
+        for name in _stats:
+            _stats[name] = 0
+
+    with _prefix_cache_lock:
+        _prefix_cache.clear()
+
+
+def create_session(ai_key, ai_folder=None, max_connections=None):
+    if _is_debug:
+        print("Creating mock client!")
+
+    return MockClient(dict(_settings))
+
+
+def create_async_session(ai_key, ai_folder=None, max_connections=None):
+    # The mock client holds no connections, the async path uses the same kind of client
+    return create_session(ai_key, ai_folder, max_connections)
+
+
+def validate(ai_key, ai_folder, ai_model, client=None):
+    if _is_debug:
+        print("Initializing mock client!")
+
+    if not ai_key:
+        raise ValueError("Error: Failed to authenticate with mock API. Exception: empty key")
+
+
+def token_limits(ai_model):
+    return default_token_limits
+
+
+def prices(ai_model):
+    return (0.0, 0.0, 0.0), "USD"
+
+
+@traced("mock request", "network")
+def translate(ai_key, ai_folder, ai_model, prompt, client=None, response_schema=None):
+    if _is_debug:
+        print("Translating via mock GPT...")
+
+    if client is None:
+        client = create_session(ai_key)
+
+    response_text, delay, usage = client.complete(prompt, response_schema)
+    time.sleep(delay)
+    client.raise_if_failed(response_text)
+    record_usage("mock", **usage)
+
+    return client.finish(response_text)
+
+
+@traced("mock request", "network")
+async def translate_async(ai_key, ai_folder, ai_model, prompt, client=None, response_schema=None):
+    if _is_debug:
+        print("Translating via mock GPT (async)...")
+
+    if client is None:
+        client = create_session(ai_key)
+
+    response_text, delay, usage = client.complete(prompt, response_schema)
+    await asyncio.sleep(delay)
+    client.raise_if_failed(response_text)
+    record_usage("mock", **usage)
+
+    return client.finish(response_text)
+
+
+@traced("mock stream", "network")
+def stream(ai_key, ai_folder, ai_model, prompt, on_text, client=None, response_schema=None):
+    if _is_debug:
+        print("Streaming translation via mock GPT...")
+
+    if client is None:
+        client = create_session(ai_key)
+
+    response_text, _, usage = client.complete(prompt, response_schema)
+    client.raise_if_failed(response_text)
+    record_usage("mock", **usage)
+    response_text = client.finish(response_text)
+
+    parts = client.split_stream(response_text)
+    time.sleep(client.settings["latency"])
+    for part in parts:
+        time.sleep(client.get_part_delay(part))
+        on_text(part)
+
+    return response_text
+
+
+@traced("mock stream", "network")
+async def stream_async(ai_key, ai_folder, ai_model, prompt, on_text, client=None, response_schema=None):
+    if _is_debug:
+        print("Streaming translation via mock GPT (async)...")
+
+    if client is None:
+        client = create_session(ai_key)
+
+    response_text, _, usage = client.complete(prompt, response_schema)
+    client.raise_if_failed(response_text)
+    record_usage("mock", **usage)
+    response_text = client.finish(response_text)
+
+    parts = client.split_stream(response_text)
+    await asyncio.sleep(client.settings["latency"])
+    for part in parts:
+        await asyncio.sleep(client.get_part_delay(part))
+        on_text(part)
+
+    return response_text
+
+
+class MockClient:
+
+    def __init__(self, settings):
+        self.settings = settings
+        self._random = random.Random(settings.get("seed"))
+        self._lock = threading.Lock()
+
+    def complete(self, prompt, response_schema=None):
+        response_text = build_mock_response(prompt, response_schema)
+
+        input_tokens = len(prompt) // 3 + 1
+        cached_tokens = self.get_cached_tokens(prompt)
+        output_tokens = len(response_text) // 3 + 1
+        # Cached input is not processed again, like with the real providers the first token comes sooner
+        delay = self.settings["latency"] * (1 - 0.5 * cached_tokens / input_tokens) + \
+            self.settings["tokenLatency"] * output_tokens
+
+        with _stats_lock:
+            _stats["requests"] += 1
+            _stats["input_tokens"] += input_tokens
+            _stats["cached_tokens"] += cached_tokens
+            _stats["output_tokens"] += output_tokens
+
+        usage = {"input_tokens": input_tokens, "cached_tokens": cached_tokens, "output_tokens": output_tokens}
+
+        return response_text, delay, usage
+
+    def get_cached_tokens(self, prompt):
+        block_chars = self.settings["cacheBlockTokens"] * 3
+        min_chars = self.settings["cacheMinTokens"] * 3
+        if block_chars <= 0:
+            return 0
+
+        cached_chars = 0
+        with _prefix_cache_lock:
+            for end in range(min_chars, len(prompt) + 1, block_chars):
+                prefix_hash = hash(prompt[:end])
+                if prefix_hash in _prefix_cache:
+                    cached_chars = end
+                else:
+                    _prefix_cache.add(prefix_hash)
+
+        return cached_chars // 3
+
+    def raise_if_failed(self, response_text):
+        with self._lock:
+            roll = self._random.random()
+
+        if roll < self.settings["rateLimitRate"]:
+            with _stats_lock:
+                _stats["rate_limited"] += 1
+            raise RetryableError(
+                "Translation failed: Error code: 429 - Rate limit reached (mock)",
+                status_code=429,
+                retry_after=self.settings["retryAfter"]
+            )
+
+        roll -= self.settings["rateLimitRate"]
+        if roll < self.settings["errorRate"]:
+            with _stats_lock:
+                _stats["errors"] += 1
+            raise RetryableError("Translation failed: Error code: 503 - Service unavailable (mock)", status_code=503)
+
+    def finish(self, response_text):
+        with self._lock:
+            truncate = self._random.random() < self.settings["truncationRate"]
+            cut = self._random.randint(0, max(0, len(response_text) - 1))
+
+        if truncate:
+            with _stats_lock:
+                _stats["truncated"] += 1
+            return response_text[:cut]
+
+        return response_text
+
+    def split_stream(self, response_text, part_size=24):
+        return [response_text[start:start + part_size] for start in range(0, len(response_text), part_size)]
+
+    def get_part_delay(self, part):
+        return self.settings["tokenLatency"] * (len(part) / 3)
+
+
+# Batch jobs are directories under the state directory, so a later process can poll and download them:
+# `requests.jsonl` is the submitted file, `job.json` its status and `output.jsonl` the answers once completed
+class MockBatchBackend(BatchBackend):
+
+    name = "mock"
+
+    def __init__(self, ai_model, jobs_dir, settings):
+        self.ai_model = ai_model
+        self.jobs_dir = jobs_dir
+        self.settings = settings
+        self.max_requests = settings["batchMaxRequests"]
+
+    def make_request(self, custom_id, prompt, response_schema=None):
+        return {"custom_id": custom_id, "model": self.ai_model, "prompt": prompt, "response_schema": response_schema}
+
+    def submit(self, requests_path):
+        batch_id = f"mock_batch_{time.time_ns()}"
+        job_dir = os.path.join(self.jobs_dir, batch_id)
+        os.makedirs(job_dir)
+
+        with open(requests_path, "r", encoding="utf-8") as source, \
+                open(os.path.join(job_dir, "requests.jsonl"), "w", encoding="utf-8") as target:
+            requests = source.read()
+            target.write(requests)
+
+        job = {"status": BATCH_IN_PROGRESS, "created_at": time.time(), "total": requests.count("\n")}
+        self._save_job(batch_id, job)
+
+        if _is_debug:
+            print(f"Submitted mock batch {batch_id}")
+
+        return batch_id
+
+    def retrieve(self, batch_id):
+        job = self._load_job(batch_id)
+
+        if job["status"] == BATCH_IN_PROGRESS and time.time() - job["created_at"] >= self.settings["batchLatency"]:
+            job = self._complete(batch_id, job)
+
+        return {
+            "status": job["status"],
+            "total": job.get("total", 0),
+            "completed": job.get("completed", 0),
+            "failed": job.get("failed", 0)
+        }
+
+    def download(self, batch_id):
+        results = {}
+
+        output_path = os.path.join(self.jobs_dir, batch_id, "output.jsonl")
+        with open(output_path, "r", encoding="utf-8") as f:
+            for line in f:
+                item = json.loads(line)
+                results[item.pop("custom_id")] = item
+
+        return results
+
+    def _complete(self, batch_id, job):
+        client = MockClient(self.settings)
+        job_dir = os.path.join(self.jobs_dir, batch_id)
+
+        total = failed = 0
+        with open(os.path.join(job_dir, "requests.jsonl"), "r", encoding="utf-8") as source, \
+                open(os.path.join(job_dir, "output.jsonl"), "w", encoding="utf-8") as target:
+            for line in source:
+                request = json.loads(line)
+                total += 1
+
+                response_text, _, usage = client.complete(request["prompt"], request["response_schema"])
+                try:
+                    client.raise_if_failed(response_text)
+                    result = {"text": client.finish(response_text), "usage": usage}
+                except RetryableError as e:
+                    failed += 1
+                    result = {"error": str(e)}
+
+                target.write(json.dumps(dict(result, custom_id=request["custom_id"]), ensure_ascii=False) + "\n")
+
+        job = dict(job, status=BATCH_COMPLETED, total=total, completed=total - failed, failed=failed)
+        self._save_job(batch_id, job)
+
+        return job
+
+    def _load_job(self, batch_id):
+        job_path = os.path.join(self.jobs_dir, batch_id, "job.json")
+        if not os.path.exists(job_path):
+            raise ValueError(f"Error: Unknown mock batch {batch_id}")
+
+        with open(job_path, "r", encoding="utf-8") as f:
+            return json.load(f)
+
+    def _save_job(self, batch_id, job):
+        job_path = os.path.join(self.jobs_dir, batch_id, "job.json")
+        with open(f"{job_path}.tmp", "w", encoding="utf-8") as f:
+            json.dump(job, f)
+        os.replace(f"{job_path}.tmp", job_path)
+
+
+def create_batch_backend(ai_key, ai_folder, ai_model, state_dir):
+    if not ai_key:
+        raise ValueError("Error: Failed to authenticate with mock API. Exception: empty key")
+
+    return MockBatchBackend(ai_model, os.path.join(state_dir, "batch", "mock"), dict(_settings))
+
+
+def build_mock_response(prompt, response_schema=None):
+    encoding = find_encoding(prompt)
+    words = find_words(prompt, encoding)
+
+    language_codes = re.search(r"language codes \(([^)]*)\)", prompt)
+    if language_codes:
+        languages = [code.strip() for code in language_codes.group(1).split(",")]
+        return format_response(
+            {language: [mock_translate(word, language) for word in words] for language in languages},
+            encoding,
+            is_multi_language=True
+        )
+
+    translations = [mock_translate(word, None) for word in words]
+
+    # Structured output wraps the array into an object, like the real providers have to
+    if response_schema is not None and encoding in (ENCODING_JSON, ENCODING_COMPACT):
+        return json.dumps({"translations": translations}, ensure_ascii=False)
+
+    return format_response({None: translations}, encoding, is_multi_language=False)
+
+
+def mock_translate(word, language):
+    prefix = f"[{language}] " if language else "[mock] "
+    return {"key": word.get("key"), "value": prefix + str(word.get("value", ""))}
+
+
+def find_encoding(prompt):
+    # The instructions of `get_response_format` tell the encodings apart
+    if "The strings are numbered lines" in prompt:
+        return ENCODING_LINES
+    elif "maps every key to its text" in prompt:
+        return ENCODING_KEYED
+    elif '[{"key":"' in prompt:
+        return ENCODING_COMPACT
+
+    return ENCODING_JSON
+
+
+def find_words(prompt, encoding=ENCODING_JSON):
+    if encoding == ENCODING_LINES:
+        # The list to translate is the numbered lines at the end of the prompt
+        lines = []
+        for line in reversed(prompt.rstrip().split("\n")):
+            match = line_item_pattern.match(line)
+            if not match:
+                break
+            lines.append({"key": match.group(1), "value": match.group(2)})
+        return list(reversed(lines))
+
+    # The list to translate is the last JSON array (or object with the keyed encoding) in the prompt
+    decoder = json.JSONDecoder()
+    root = "{" if encoding == ENCODING_KEYED else "["
+    position = prompt.rfind(root)
+
+    while position >= 0:
+        try:
+            words, _ = decoder.raw_decode(prompt, position)
+            if encoding == ENCODING_KEYED and isinstance(words, dict) and \
+                    all(isinstance(value, str) for value in words.values()):
+                return [{"key": key, "value": value} for key, value in words.items()]
+            if isinstance(words, list) and all(isinstance(word, dict) and "key" in word for word in words):
+                return words
+        except ValueError:
+            pass
+        position = prompt.rfind(root, 0, position)
+
+    return []
@@ -14,6 +14,8 @@
 
 import json
 
+from wire_encoding import default_wire_encoding, wire_encodings
+
 _is_debug = False
 
 
@@ -30,8 +32,41 @@ class Configuration:
         self.ai_folder = config_data["config"].get("aiFolder", "")
         self.ai_model = config_data["config"].get("aiModel", "")
 
+        self.concurrency = config_data["config"].get("concurrency", 4)
+        self.provider_concurrency = config_data["config"].get("providerConcurrency", {}) or {}
+        self.provider_rate_limits = config_data["config"].get("providerRateLimits", {}) or {}
+        self.max_retries = config_data["config"].get("maxRetries", 5)
+
+        self.chunk_token_budget = config_data["config"].get("chunkTokenBudget", 0)
+        self.chunk_retries = config_data["config"].get("chunkRetries", 2)
+        self.streaming = config_data["config"].get("streaming", False)
+        self.structured_output = config_data["config"].get("structuredOutput", True)
+        self.wire_encoding = config_data["config"].get("wireEncoding", default_wire_encoding)
+
+        # Number of target languages requested in one prompt, 1 disables the multi-language mode
+        self.multi_language_batch_size = config_data["config"].get("multiLanguageBatchSize", 1)
+        self.deduplicate = config_data["config"].get("deduplicate", True)
+
+        # Price of the model per 1M tokens for the run report: input, cachedInput, output and currency
+        self.model_price = config_data["config"].get("modelPrice", {}) or {}
+
+        # Hours a successful validation request of the same key and model is trusted, 0 validates on every run
+        self.validation_ttl_hours = config_data["config"].get("validationTtlHours", 24)
+
+        # Seconds between the status checks of a submitted batch job (`--batch`)
+        self.batch_poll_seconds = config_data["config"].get("batchPollSeconds", 30)
+
+        self.cache_max_entries = config_data["config"].get("cacheMaxEntries", 100_000)
+        self.cache_max_age_days = config_data["config"].get("cacheMaxAgeDays", 90)
+
         self.exclude = config_data.get("exclude", [])
 
+        # Directory names skipped while looking for modules, None means the default list
+        self.ignore_directories = config_data["config"].get("ignoreDirectories")
+
+        # Settings of the local `mock` AI provider
+        self.mock_settings = config_data.get("mock", {}) or {}
+
         self.validate()
 
     def validate(self):
@@ -39,6 +74,18 @@ class Configuration:
             raise ValueError("Error: Missing required AI settings in configuration file.")
         elif not self.source_language or not self.target_languages:
             raise ValueError("Error: Missing required config settings in configuration file.")
+        elif not isinstance(self.concurrency, int) or self.concurrency < 1:
+            raise ValueError("Error: 'concurrency' must be a positive integer in configuration file.")
+        elif not isinstance(self.multi_language_batch_size, int) or self.multi_language_batch_size < 1:
+            raise ValueError("Error: 'multiLanguageBatchSize' must be a positive integer in configuration file.")
+        elif not isinstance(self.validation_ttl_hours, (int, float)) or self.validation_ttl_hours < 0:
+            raise ValueError("Error: 'validationTtlHours' must be a non-negative number in configuration file.")
+        elif not isinstance(self.batch_poll_seconds, (int, float)) or self.batch_poll_seconds <= 0:
+            raise ValueError("Error: 'batchPollSeconds' must be a positive number in configuration file.")
+        elif not isinstance(self.model_price, dict):
+            raise ValueError("Error: 'modelPrice' must be a mapping in configuration file.")
+        elif self.wire_encoding not in wire_encodings:
+            raise ValueError(f"Error: 'wireEncoding' must be one of {', '.join(wire_encodings)} in configuration file.")
 
         if _is_debug:
             print("Configuration file successfully parsed and validated.")
@@ -54,7 +101,8 @@ class ModuleConfiguration:
         self.exclude = module_config.get("exclude", [])
 
         self.module_description = self.config_data.get("moduleDescription", "")
-        self.exclude_translated = self.config_data.get("excludeTranslated", False)
+        # None means "not set", the global `excludeTranslated` value is used then
+        self.exclude_translated = self.config_data.get("excludeTranslated")
 
         self.validate()
 
@@ -0,0 +1,267 @@
+# Copyright 2025 Roman Likhachev
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import heapq
+import os
+import threading
+
+from ai_client import default_provider_concurrency, get_ai_service
+from client import estimate_word_tokens, get_chunk_token_budget, make_chunks
+from metrics import get_calls, CALL_OK, CALL_PARTIAL
+
+# Starting point of the latency model until the calls of the run tell better: a fixed time per request (network,
+# queueing, first token) and a time per generated token. An input token costs a fraction of an output token.
+default_request_seconds = 1.0
+default_output_tokens_per_second = 50.0
+input_token_weight = 0.05
+
+# Instructions and descriptions sent with every chunk
+prompt_overhead_tokens = 300
+
+# The order of the pending units is recomputed once the number of observed calls grew by this share
+refit_growth = 0.25
+min_fit_calls = 4
+
+_is_debug = False
+
+
+def estimate_work_unit_tokens(words, languages):
+    # Estimated (input, output) tokens of translating all source strings of a unit, whatever was translated before.
+    # The languages share the input of one multi-language request, every language adds its own output.
+    word_tokens = [estimate_word_tokens(word) for word in words]
+
+    return sum(tokens[0] for tokens in word_tokens), sum(tokens[1] for tokens in word_tokens) * len(languages)
+
+
+def get_pending_words_by_language(unit):
+    return unit["prepared"]["pending_words_by_language"]
+
+
+def get_shared_words_by_language(unit):
+    return unit["words_by_language"]
+
+
+# Latency of one call: request_seconds + seconds_per_token * (output tokens + input_token_weight * input tokens).
+# Refitted by least squares on the calls of the run, or scaled as a whole while the calls are too alike to fit a line.
+class LatencyModel:
+
+    def __init__(self, request_seconds=default_request_seconds,
+                 seconds_per_token=1 / default_output_tokens_per_second):
+        self.request_seconds = request_seconds
+        self.seconds_per_token = seconds_per_token
+        self.sample_count = 0
+
+        self._sums = [0.0, 0.0, 0.0, 0.0, 0.0]
+
+    def predict(self, requests, tokens):
+        return requests * self.request_seconds + tokens * self.seconds_per_token
+
+    def observe(self, calls):
+        for call in calls:
+            if call["outcome"] not in (CALL_OK, CALL_PARTIAL) or call["latency"] is None:
+                continue
+
+            tokens = get_weighted_tokens(call["input_tokens"], call["output_tokens"])
+            self.sample_count += 1
+            for index, value in enumerate((tokens, call["latency"], tokens * tokens, tokens * call["latency"], 1)):
+                self._sums[index] += value
+
+    def fit(self):
+        sum_tokens, sum_latency, sum_tokens_squared, sum_product, count = self._sums
+        if not count:
+            return
+
+        denominator = count * sum_tokens_squared - sum_tokens * sum_tokens
+        if count >= min_fit_calls and denominator > 1e-9:
+            seconds_per_token = (count * sum_product - sum_tokens * sum_latency) / denominator
+            request_seconds = (sum_latency - seconds_per_token * sum_tokens) / count
+
+            if seconds_per_token > 0 and request_seconds >= 0:
+                self.request_seconds = request_seconds
+                self.seconds_per_token = seconds_per_token
+                return
+
+        predicted = self.predict(count, sum_tokens)
+        if predicted > 0 and sum_latency > 0:
+            scale = sum_latency / predicted
+            self.request_seconds *= scale
+            self.seconds_per_token *= scale
+
+
+def get_weighted_tokens(input_tokens, output_tokens):
+    return output_tokens + input_token_weight * input_tokens
+
+
+# Longest processing time first: the units expected to take longest start first, so that the short ones fill the
+# gaps at the end of the run instead of one long unit holding it up. The estimates follow the latency model, which
+# learns from the calls finished so far, so every free worker takes the unit that is longest by the latest estimate.
+class Planner:
+
+    def __init__(self, configuration, work_units, max_workers, get_words_by_language=get_pending_words_by_language,
+                 model=None):
+        self.work_units = work_units
+        self.max_workers = max(1, max_workers or 1)
+        self.model = model or LatencyModel()
+
+        max_input_tokens, max_output_tokens = get_chunk_token_budget(configuration)
+        provider_concurrency = get_configured_provider_concurrency(configuration)
+
+        # (sequential requests, weighted tokens along them, input tokens, output tokens) of every unit
+        self.estimates = [
+            estimate_unit(get_words_by_language(unit), max_input_tokens, max_output_tokens, provider_concurrency)
+            for unit in work_units
+        ]
+
+        self._lock = threading.Lock()
+        self._pending = set(range(len(work_units)))
+        self._heap = []
+        # Calls made before, like the ones of the shared strings, count as well
+        self._seen_calls = 0
+        self._fitted_calls = 0
+        self._rebuild()
+
+    def estimate_seconds(self, position):
+        requests, tokens, _, _ = self.estimates[position]
+        return self.model.predict(requests, tokens)
+
+    def next_position(self):
+        with self._lock:
+            self._observe()
+
+            while self._heap:
+                _, position = heapq.heappop(self._heap)
+                if position in self._pending:
+                    self._pending.remove(position)
+                    return position
+
+        raise IndexError("No pending work units")
+
+    def make_schedule(self):
+        # Static LPT assignment with the current estimates, the lane that finishes last is the critical path
+        lanes = [[] for _ in range(self.max_workers)]
+        free_at = [(0.0, lane) for lane in range(self.max_workers)]
+
+        for position in sorted(range(len(self.work_units)), key=lambda position: -self.estimate_seconds(position)):
+            started, lane = heapq.heappop(free_at)
+            finished = started + self.estimate_seconds(position)
+            lanes[lane].append((position, started, finished))
+            heapq.heappush(free_at, (finished, lane))
+
+        makespan = max((lane[-1][2] for lane in lanes if lane), default=0.0)
+        critical_lane = max(range(len(lanes)), key=lambda lane: lanes[lane][-1][2] if lanes[lane] else 0.0)
+
+        return {"lanes": lanes, "makespan": makespan, "critical_lane": critical_lane}
+
+    def _observe(self):
+        calls = get_calls(self._seen_calls)
+        if not calls:
+            return
+
+        self._seen_calls += len(calls)
+        self.model.observe(calls)
+
+        if self.model.sample_count >= max(min_fit_calls, self._fitted_calls * (1 + refit_growth)):
+            self._fitted_calls = self.model.sample_count
+            self.model.fit()
+            self._rebuild()
+
+            if _is_debug:
+                print(f"Latency model refitted on {self._fitted_calls} call(s): "
+                      f"{self.model.request_seconds:.3f}s per request, {self.model.seconds_per_token * 1000:.3f}ms "
+                      f"per token")
+
+    def _rebuild(self):
+        self._heap = [(-self.estimate_seconds(position), position) for position in self._pending]
+        heapq.heapify(self._heap)
+
+
+def get_configured_provider_concurrency(configuration):
+    # Read from the configuration itself, a plan does not configure the request governors of the providers
+    service = get_ai_service(configuration.ai_provider)
+    for ai_provider, limit in configuration.provider_concurrency.items():
+        if get_ai_service(ai_provider) == service:
+            return int(limit)
+
+    return default_provider_concurrency[service]
+
+
+def estimate_unit(words_by_language, max_input_tokens, max_output_tokens, provider_concurrency):
+    # The chunks of a language group run concurrently up to the provider concurrency, the groups one after another
+    requests = 0
+    path_tokens = 0.0
+    input_tokens = 0
+    output_tokens = 0
+
+    groups = {}
+    for language, words in words_by_language.items():
+        if words:
+            groups.setdefault(tuple(word["key"] for word in words), (words, []))[1].append(language)
+
+    for words, languages in groups.values():
+        chunk_tokens = []
+        for chunk in make_chunks(words, max_input_tokens, max_output_tokens // len(languages)):
+            word_tokens = [estimate_word_tokens(word) for word in chunk]
+            chunk_input_tokens = prompt_overhead_tokens + sum(tokens[0] for tokens in word_tokens)
+            chunk_output_tokens = sum(tokens[1] for tokens in word_tokens) * len(languages)
+
+            input_tokens += chunk_input_tokens
+            output_tokens += chunk_output_tokens
+            chunk_tokens.append(get_weighted_tokens(chunk_input_tokens, chunk_output_tokens))
+
+        # Each round of concurrent chunks lasts as long as its largest chunk
+        chunk_tokens.sort(reverse=True)
+        rounds = chunk_tokens[::max(1, provider_concurrency)]
+        requests += len(rounds)
+        path_tokens += sum(rounds)
+
+    return requests, path_tokens, input_tokens, output_tokens
+
+
+def print_plan(planner, get_label):
+    schedule = planner.make_schedule()
+    estimates = planner.estimates
+    unit_seconds = [planner.estimate_seconds(position) for position in range(len(planner.work_units))]
+    total_seconds = sum(unit_seconds)
+
+    print("\n===== EXECUTION PLAN =====\n")
+    print(f"- Work units          : {len(planner.work_units)} on {planner.max_workers} worker(s)")
+    print(f"- Estimated tokens    : {sum(estimate[2] for estimate in estimates)} input, "
+          f"{sum(estimate[3] for estimate in estimates)} output")
+    print(f"- Latency model       : {planner.model.request_seconds:.2f}s per request + "
+          f"{planner.model.seconds_per_token * 1000:.1f}ms per output token")
+    print(f"- Expected wall time  : {schedule['makespan']:.1f}s "
+          f"(lower bound {max(max(unit_seconds, default=0.0), total_seconds / planner.max_workers):.1f}s, "
+          f"{total_seconds:.1f}s of work)")
+
+    critical_lane = schedule["lanes"][schedule["critical_lane"]]
+    if critical_lane:
+        print(f"\n🧭 Critical path (worker {schedule['critical_lane'] + 1}):")
+        for position, started, finished in critical_lane:
+            print(f"  {started:7.1f}s → {finished:7.1f}s  {describe_unit(planner, position, get_label)}")
+
+    longest = sorted(range(len(planner.work_units)), key=lambda position: -unit_seconds[position])[:10]
+    if longest:
+        print("\n📋 Longest units:")
+        for position in longest:
+            print(f"  {unit_seconds[position]:7.1f}s  {describe_unit(planner, position, get_label)}")
+    print()
+
+
+def describe_unit(planner, position, get_label):
+    unit = planner.work_units[position]
+    requests, _, input_tokens, output_tokens = planner.estimates[position]
+    module_label = get_label(unit["module"])
+
+    return (f"{os.path.basename(module_label) or module_label} → {', '.join(unit['languages'])} "
+            f"(~{input_tokens + output_tokens} token(s), {requests} sequential request(s))")
@@ -0,0 +1,138 @@
+# Copyright 2025 Roman Likhachev
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import asyncio
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+default_max_workers = 4
+
+_is_debug = False
+
+
+def make_work_units(execution_graph, languages, batch_size=1):
+    if _is_debug:
+        print("Make work units!")
+
+    batch_size = max(1, batch_size or 1)
+    work_units = []
+
+    for module_index, module in enumerate(execution_graph):
+        for start in range(0, len(languages), batch_size):
+            work_units.append(
+                {
+                    "module_index": module_index,
+                    "module": module,
+                    "languages": languages[start:start + batch_size]
+                }
+            )
+
+    return work_units
+
+
+def run_work_units(work_units, worker, max_workers, planner=None):
+    if _is_debug:
+        print(f"Run {len(work_units)} work unit(s) on {max_workers} worker(s)!")
+
+    # Results keep the order of `work_units`, regardless of the order in which the units complete
+    results = [None] * len(work_units)
+    if not work_units:
+        return results
+
+    progress = Progress(total=len(work_units))
+
+    def run(position):
+        # With a planner the unit is chosen when a worker becomes free, not when the task is submitted
+        if planner is not None:
+            position = planner.next_position()
+        return position, worker(work_units[position])
+
+    with ThreadPoolExecutor(max_workers=max(1, max_workers or default_max_workers)) as executor:
+        futures = [executor.submit(run, position) for position in range(len(work_units))]
+
+        try:
+            for future in as_completed(futures):
+                position, result = future.result()
+                results[position] = result
+                progress.advance(work_units[position])
+        except BaseException:
+            for future in futures:
+                future.cancel()
+            progress.finish()
+            raise
+
+    progress.finish()
+
+    return results
+
+
+async def run_work_units_async(work_units, worker, max_workers, planner=None):
+    if _is_debug:
+        print(f"Run {len(work_units)} work unit(s) with {max_workers} in flight!")
+
+    results = [None] * len(work_units)
+    if not work_units:
+        return results
+
+    progress = Progress(total=len(work_units))
+    semaphore = asyncio.Semaphore(max(1, max_workers or default_max_workers))
+
+    async def run(position):
+        async with semaphore:
+            if planner is not None:
+                position = planner.next_position()
+            results[position] = await worker(work_units[position])
+        progress.advance(work_units[position])
+
+    tasks = [asyncio.ensure_future(run(position)) for position in range(len(work_units))]
+    try:
+        await asyncio.gather(*tasks)
+    except BaseException:
+        for task in tasks:
+            task.cancel()
+        progress.finish()
+        raise
+
+    progress.finish()
+
+    return results
+
+
+class Progress:
+
+    def __init__(self, total, stream=None):
+        self.total = total
+        self.done = 0
+        self.stream = stream or sys.stdout
+        self.is_tty = hasattr(self.stream, "isatty") and self.stream.isatty()
+        self._lock = threading.Lock()
+
+    def advance(self, unit):
+        with self._lock:
+            self.done += 1
+            module_name = unit["module"]["module_path"] or unit["module"]["strings"]
+            line = f"⏳ Progress: {self.done}/{self.total} | {module_name} → {', '.join(unit['languages'])}"
+
+            if self.is_tty:
+                self.stream.write(f"\r\033[K{line}")
+            else:
+                self.stream.write(f"{line}\n")
+            self.stream.flush()
+
+    def finish(self):
+        with self._lock:
+            if self.is_tty and self.done:
+                self.stream.write("\n")
+                self.stream.flush()
@@ -0,0 +1,253 @@
+# Copyright 2025 Roman Likhachev
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import json
+import os
+import shutil
+
+from planner import estimate_work_unit_tokens
+from snapshot import get_snapshot_path, snapshots_dir_name
+from strings_file import hash_file, strings_file_name
+
+shards_dir_name = "shards"
+shard_file_name = "shard.json"
+shard_files_dir_name = "files"
+shard_snapshots_dir_name = "snapshots"
+shard_version = 1
+
+_is_debug = False
+
+
+# A sharded run translates one part of the work units, `--shard i/N` with 1 <= i <= N. Every runner plans the same
+# partition from the same checkout: the units are balanced by the estimated tokens of their source strings, the largest
+# first onto the least loaded shard. Snapshots, the journal and translated files differ between runners and over time,
+# so they do not take part in the partition. A shard leaves its strings files, snapshots and run report in
+# `.aitranslator/shards/i-of-N`, which `merge` copies into the project to produce one report.
+def parse_shard(text):
+    try:
+        index, count = (int(part) for part in text.split("/"))
+    except ValueError:
+        raise ValueError(f"Error: Invalid shard '{text}', expected i/N like 1/4.")
+
+    if count < 1 or not 1 <= index <= count:
+        raise ValueError(f"Error: Invalid shard '{text}', i must be between 1 and N.")
+
+    return index, count
+
+
+def get_shard_dir(state_dir, shard):
+    index, count = shard
+    return os.path.join(state_dir, shards_dir_name, f"{index}-of-{count}")
+
+
+def assign_shards(work_units, modules_words, count):
+    # Returns the shard index of every unit. Ties keep the order of the execution graph, which is sorted by path.
+    loads = [0] * count
+    assignments = [0] * len(work_units)
+
+    costs = [get_unit_cost(unit, modules_words) for unit in work_units]
+    for position in sorted(range(len(work_units)), key=lambda position: -costs[position]):
+        shard_index = min(range(count), key=lambda index: loads[index])
+        assignments[position] = shard_index + 1
+        loads[shard_index] += costs[position]
+
+    if _is_debug:
+        print(f"Shard loads (estimated tokens): {loads}")
+
+    return assignments
+
+
+def select_shard_units(work_units, modules_words, shard):
+    index, count = shard
+    assignments = assign_shards(work_units, modules_words, count)
+    shard_units = [unit for unit, assignment in zip(work_units, assignments) if assignment == index]
+
+    print(f"Shard {index}/{count}: {len(shard_units)} of {len(work_units)} work unit(s), "
+          f"~{sum(get_unit_cost(unit, modules_words) for unit in shard_units)} token(s) at most")
+
+    return shard_units
+
+
+def get_unit_cost(unit, modules_words):
+    return sum(estimate_work_unit_tokens(modules_words[unit["module_index"]], unit["languages"]))
+
+
+def save_shard(state_dir, shard, work_units, results, run_report, usage):
+    shard_dir = get_shard_dir(state_dir, shard)
+    project_dir = os.path.dirname(os.path.abspath(state_dir))
+
+    def relative_path(path):
+        return os.path.relpath(os.path.abspath(path), project_dir).replace(os.sep, "/")
+
+    outputs = []
+    for unit, language_with_words in zip(work_units, results):
+        prepared = unit["prepared"]
+
+        for language in unit["languages"]:
+            lang_dir_path = prepared["lang_dir_paths"][language]
+            output_path = os.path.join(lang_dir_path, strings_file_name)
+            if not os.path.exists(output_path):
+                continue
+
+            translated_words = language_with_words[language]
+            outputs.append({
+                "module": relative_path(unit["module"]["strings"]),
+                "language": language,
+                "output": relative_path(output_path),
+                "output_hash": hash_file(output_path),
+                "source_hash": unit.get("source_hash"),
+                "is_complete": len(translated_words) >= len(prepared["pending_words_by_language"][language]),
+                "keys": [word["key"] for word in translated_words]
+            })
+
+            copy_file(output_path, os.path.join(shard_dir, shard_files_dir_name, relative_path(output_path)))
+
+            snapshot_path = get_snapshot_path(state_dir, lang_dir_path)
+            if os.path.exists(snapshot_path):
+                copy_file(snapshot_path, os.path.join(shard_dir, shard_snapshots_dir_name,
+                                                      os.path.basename(snapshot_path)))
+
+    # A resumed run of the shard skips the languages done before, their outputs are kept while the files are unchanged
+    saved_outputs = {output["output"] for output in outputs}
+    for output in load_shard_outputs(shard_dir, shard):
+        output_path = os.path.join(project_dir, output["output"])
+        if output["output"] not in saved_outputs and os.path.exists(output_path) \
+                and hash_file(output_path) == output["output_hash"]:
+            outputs.append(output)
+
+    # Runners check the project out in different places, the merged report labels the modules by relative path
+    report = dict(run_report, calls=[
+        dict(call, module=relative_path(call["module"]) if os.path.isabs(call["module"]) else call["module"])
+        for call in run_report["calls"]
+    ])
+
+    shard_data = {
+        "version": shard_version,
+        "shard": list(shard),
+        "usage": usage,
+        "report": report,
+        "outputs": outputs
+    }
+    write_json(os.path.join(shard_dir, shard_file_name), shard_data)
+
+    print(f"Shard {shard[0]}/{shard[1]} saved to {shard_dir}")
+
+    return shard_dir
+
+
+def load_shard_outputs(shard_dir, shard):
+    shard_path = os.path.join(shard_dir, shard_file_name)
+    if not os.path.exists(shard_path):
+        return []
+
+    try:
+        with open(shard_path, "r", encoding="utf-8") as f:
+            shard_data = json.load(f)
+    except (OSError, ValueError):
+        return []
+
+    if shard_data.get("version") != shard_version or shard_data.get("shard") != list(shard):
+        return []
+
+    return shard_data.get("outputs", [])
+
+
+def find_shard_dirs(state_dir):
+    shards_dir = os.path.join(state_dir, shards_dir_name)
+    if not os.path.isdir(shards_dir):
+        return []
+
+    return sorted(
+        os.path.join(shards_dir, name)
+        for name in os.listdir(shards_dir)
+        if os.path.exists(os.path.join(shards_dir, name, shard_file_name))
+    )
+
+
+def load_shards(shard_dirs):
+    shards = []
+    for shard_dir in shard_dirs:
+        with open(os.path.join(shard_dir, shard_file_name), "r", encoding="utf-8") as f:
+            shard_data = json.load(f)
+
+        if shard_data.get("version") != shard_version:
+            raise ValueError(f"Error: Unsupported shard format in {shard_dir}.")
+
+        shards.append((shard_dir, shard_data))
+
+    counts = {tuple(shard_data["shard"])[1] for _, shard_data in shards}
+    if len(counts) > 1:
+        raise ValueError(f"Error: Shards of different runs cannot be merged: N is {', '.join(map(str, counts))}.")
+
+    indexes = [shard_data["shard"][0] for _, shard_data in shards]
+    if len(set(indexes)) != len(indexes):
+        raise ValueError("Error: The same shard is given more than once.")
+
+    if counts:
+        missing = sorted(set(range(1, counts.pop() + 1)) - set(indexes))
+        if missing:
+            print(f"Warning: shard(s) {', '.join(map(str, missing))} missing, their strings are not merged!")
+
+    return shards
+
+
+def merge_shards(state_dir, shards, journal=None):
+    # Copies the strings files and snapshots of every shard into the project. Returns the translated keys by module
+    # and language, for the report.
+    project_dir = os.path.dirname(os.path.abspath(state_dir))
+    translated_keys = {}
+    copied_count = 0
+
+    for shard_dir, shard_data in shards:
+        for output in shard_data["outputs"]:
+            source_path = os.path.join(shard_dir, shard_files_dir_name, output["output"])
+            output_path = os.path.join(project_dir, output["output"])
+
+            if not os.path.exists(output_path) or hash_file(output_path) != output["output_hash"]:
+                copy_file(source_path, output_path)
+                copied_count += 1
+
+            if journal is not None and output["is_complete"] and output["source_hash"]:
+                journal.record(
+                    {"strings": os.path.join(project_dir, output["module"])},
+                    output["language"],
+                    output["source_hash"],
+                    os.path.dirname(output_path)
+                )
+
+            translated_keys.setdefault(output["module"], {})[output["language"]] = output["keys"]
+
+        snapshots_dir = os.path.join(shard_dir, shard_snapshots_dir_name)
+        if os.path.isdir(snapshots_dir):
+            for name in os.listdir(snapshots_dir):
+                copy_file(os.path.join(snapshots_dir, name), os.path.join(state_dir, snapshots_dir_name, name))
+
+    print(f"Merged {len(shards)} shard(s): {copied_count} strings file(s) updated")
+
+    return translated_keys
+
+
+def copy_file(source_path, target_path):
+    os.makedirs(os.path.dirname(target_path), exist_ok=True)
+    temp_path = f"{target_path}.tmp"
+    shutil.copyfile(source_path, temp_path)
+    os.replace(temp_path, target_path)
+
+
+def write_json(file_path, data):
+    os.makedirs(os.path.dirname(file_path), exist_ok=True)
+    temp_path = f"{file_path}.tmp"
+    with open(temp_path, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False, indent=2)
+    os.replace(temp_path, file_path)
@@ -0,0 +1,68 @@
+# Copyright 2025 Roman Likhachev
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import hashlib
+import json
+import os
+
+snapshots_dir_name = "snapshots"
+
+_is_debug = False
+
+
+# A snapshot records the source strings a `values-xx` directory was last translated from,
+# so that changed source strings can be detected on the next incremental run.
+def get_snapshot_path(state_dir, lang_dir_path):
+    project_dir = os.path.dirname(os.path.abspath(state_dir))
+    relative_path = os.path.relpath(os.path.abspath(lang_dir_path), project_dir)
+    file_name = hashlib.sha1(relative_path.replace(os.sep, "/").encode("utf-8")).hexdigest() + ".json"
+
+    return os.path.join(state_dir, snapshots_dir_name, file_name)
+
+
+def load_snapshot(state_dir, lang_dir_path):
+    if state_dir is None:
+        return {}
+
+    snapshot_path = get_snapshot_path(state_dir, lang_dir_path)
+    if not os.path.exists(snapshot_path):
+        return {}
+
+    try:
+        with open(snapshot_path, "r", encoding="utf-8") as f:
+            return json.load(f).get("words", {})
+    except (OSError, ValueError) as e:
+        print(f"Ignoring unreadable snapshot {snapshot_path}: {e}")
+        return {}
+
+
+def save_snapshot(state_dir, lang_dir_path, words):
+    if state_dir is None:
+        return
+
+    snapshot_path = get_snapshot_path(state_dir, lang_dir_path)
+    os.makedirs(os.path.dirname(snapshot_path), exist_ok=True)
+
+    data = {
+        "path": os.path.relpath(os.path.abspath(lang_dir_path), os.path.dirname(os.path.abspath(state_dir))),
+        "words": {word["key"]: word["value"] for word in words}
+    }
+
+    temp_path = f"{snapshot_path}.tmp"
+    with open(temp_path, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False, indent=2)
+    os.replace(temp_path, snapshot_path)
+
+    if _is_debug:
+        print(f"Saved snapshot of {len(words)} string(s) to {snapshot_path}")
@@ -0,0 +1,303 @@
+# Copyright 2025 Roman Likhachev
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import hashlib
+import html
+import os
+import threading
+import xml.etree.ElementTree as ET
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+from tracing import span
+
+strings_file_name = "strings.xml"
+
+resource_string = "string"
+resource_string_array = "string-array"
+resource_plurals = "plurals"
+
+plural_quantities = ("zero", "one", "two", "few", "many", "other")
+
+_is_debug = False
+
+
+def escape_android_string(value):
+    if value is None:
+        return ""
+
+    # First, escape &, <, > with XML-safe sequences
+    escaped = html.escape(value, quote=False)
+
+    # Then handle Android-specific rules
+    escaped = escaped.replace("'", "\\'")
+    escaped = escaped.replace('"', '\\"')
+
+    return escaped
+
+
+def unescape_android_string(value):
+    if value is None:
+        return ""
+
+    # Reverse of `escape_android_string`
+    unescaped = value.replace("\\'", "'")
+    unescaped = unescaped.replace('\\"', '"')
+
+    return html.unescape(unescaped)
+
+
+# One translatable entry of a resources file: a <string>, one <item> of a <string-array> (selector is its index)
+# or one <item> of a <plurals> (selector is its quantity). The pipeline works with {"key", "value"} words, where
+# the key is `name`, `name[index]` or `name#quantity`. Android resource names never contain "[" or "#".
+class StringResource(namedtuple("StringResource", ["kind", "name", "selector", "value"])):
+    __slots__ = ()
+
+    @property
+    def key(self):
+        return make_resource_key(self.kind, self.name, self.selector)
+
+
+def make_resource_key(kind, name, selector=None):
+    if kind == resource_string_array:
+        return f"{name}[{selector}]"
+    if kind == resource_plurals:
+        return f"{name}#{selector}"
+
+    return name
+
+
+def split_resource_key(key):
+    if key.endswith("]") and "[" in key:
+        name, index = key[:-1].rsplit("[", 1)
+        if index.isdigit():
+            return resource_string_array, name, int(index)
+
+    if "#" in key:
+        name, quantity = key.rsplit("#", 1)
+        if quantity in plural_quantities:
+            return resource_plurals, name, quantity
+
+    return resource_string, key, None
+
+
+# Reads <string>, <string-array> and <plurals> with iterparse and drops every finished element,
+# so memory does not grow with the size of the file. Resources with translatable="false" are skipped.
+def iter_string_resources(strings_path):
+    root = None
+    container = None
+    index = 0
+    depth = 0
+
+    for event, element in ET.iterparse(strings_path, events=("start", "end")):
+        if event == "start":
+            depth += 1
+            if depth == 1:
+                root = element
+            elif depth == 2 and element.tag in (resource_string_array, resource_plurals):
+                container = element
+                index = 0
+            continue
+
+        depth -= 1
+        if depth == 1:
+            if element.tag == resource_string and is_translatable(element):
+                yield StringResource(resource_string, element.get("name", ""), None, element.text)
+
+            container = None
+            root.clear()
+        elif depth == 2 and container is not None and element.tag == "item":
+            if is_translatable(container):
+                selector = index if container.tag == resource_string_array else element.get("quantity", "other")
+                yield StringResource(container.tag, container.get("name", ""), selector, element.text)
+
+            index += 1
+
+
+def is_translatable(element):
+    return element.get("translatable", "true").lower() != "false"
+
+
+# An array is useless with items missing, Android falls back to the source one when it is left out
+def drop_incomplete_arrays(source_words, words):
+    translated_keys = {word["key"] for word in words}
+
+    incomplete_names = set()
+    for word in source_words:
+        kind, name, _ = split_resource_key(word["key"])
+        if kind == resource_string_array and word["key"] not in translated_keys:
+            incomplete_names.add(name)
+
+    if not incomplete_names:
+        return words
+
+    incomplete_arrays = {(resource_string_array, name) for name in incomplete_names}
+    return [word for word in words if split_resource_key(word["key"])[:2] not in incomplete_arrays]
+
+
+def escape_xml_text(value):
+    # XML parsers turn line breaks into "\n", the previous writer stored them that way too
+    value = value.replace("\r\n", "\n").replace("\r", "\n")
+    return value.replace("&", "&amp;").replace("<", "&lt;").replace('"', "&quot;").replace(">", "&gt;")
+
+
+def escape_xml_attribute(value):
+    value = value.replace("&", "&amp;").replace("<", "&lt;").replace('"', "&quot;").replace(">", "&gt;")
+    return value.replace("\r", "&#13;").replace("\n", "&#10;").replace("\t", "&#9;")
+
+
+# Yields the file in the layout the previous ElementTree + minidom writer produced, one line at a time.
+# Items of arrays and plurals are grouped under their resource at the position of its first item.
+def iter_strings_file_lines(words):
+    yield '<?xml version="1.0" encoding="utf-8"?>\n'
+    yield "<resources>\n"
+    yield "    <!--Generated Translator AI-->\n"
+
+    for kind, name, items in group_resources(words):
+        name = escape_xml_attribute(name)
+
+        if kind == resource_string:
+            yield make_element_line("    ", f'string name="{name}"', "string", items[0][1])
+        elif kind == resource_string_array:
+            yield f'    <string-array name="{name}">\n'
+            # Gaps keep their position, the item index is what the app reads
+            values = dict(items)
+            for index in range(max(values) + 1):
+                yield make_element_line("        ", "item", "item", values.get(index, ""))
+            yield "    </string-array>\n"
+        else:
+            yield f'    <plurals name="{name}">\n'
+            for quantity, value in items:
+                yield make_element_line("        ", f'item quantity="{escape_xml_attribute(quantity)}"', "item", value)
+            yield "    </plurals>\n"
+
+    yield "</resources>\n"
+
+
+def group_resources(words):
+    resources = []
+    resources_by_name = {}
+
+    for word in words:
+        kind, name, selector = split_resource_key(word["key"])
+
+        if kind == resource_string:
+            resources.append((kind, name, [(None, word["value"])]))
+            continue
+
+        if (kind, name) not in resources_by_name:
+            resources_by_name[(kind, name)] = (kind, name, [])
+            resources.append(resources_by_name[(kind, name)])
+        resources_by_name[(kind, name)][2].append((selector, word["value"]))
+
+    return resources
+
+
+def make_element_line(indent, start_tag, end_tag, value):
+    text = escape_android_string(value)
+    if text:
+        return f"{indent}<{start_tag}>{escape_xml_text(text)}</{end_tag}>\n"
+
+    return f"{indent}<{start_tag}/>\n"
+
+
+def hash_file(file_path):
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 16), b""):
+            digest.update(block)
+
+    return digest.hexdigest()
+
+
+# Streams the file into a temp file next to it and renames it into place, so a crash never leaves a half-written
+# strings.xml behind. An identical file is left untouched to keep its mtime and the Gradle resource cache valid.
+# Returns True when the file was written.
+def write_strings_file(lang_dir_path, words):
+    strings_file_path = os.path.join(lang_dir_path, strings_file_name)
+    temp_path = f"{strings_file_path}.tmp"
+
+    digest = hashlib.sha256()
+    try:
+        with open(temp_path, "wb") as f:
+            for line in iter_strings_file_lines(words):
+                data = line.encode("utf-8")
+                digest.update(data)
+                f.write(data)
+
+        if os.path.exists(strings_file_path) and hash_file(strings_file_path) == digest.hexdigest():
+            os.remove(temp_path)
+
+            if _is_debug:
+                print(f"Skipped unchanged {strings_file_path}")
+
+            return False
+
+        os.replace(temp_path, strings_file_path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+
+    if _is_debug:
+        print(f"Wrote {len(words)} translated strings to {strings_file_path}")
+
+    return True
+
+
+# Writes files on a background thread so disk I/O overlaps with waiting for the AI provider.
+# `submit` returns immediately, `close` waits for every pending write and raises the first error.
+class StringsFileWriter:
+
+    def __init__(self):
+        self.written_count = 0
+        self.unchanged_count = 0
+
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="strings-writer")
+        self._futures = []
+        self._lock = threading.Lock()
+
+    def submit(self, lang_dir_path, words, on_written=None):
+        future = self._executor.submit(self._write, lang_dir_path, words, on_written)
+        with self._lock:
+            self._futures.append(future)
+
+        return future
+
+    def close(self):
+        self._executor.shutdown(wait=True)
+
+        with self._lock:
+            futures = self._futures
+            self._futures = []
+
+        for future in futures:
+            future.result()
+
+    def _write(self, lang_dir_path, words, on_written):
+        with span("write strings.xml", "write", {"path": lang_dir_path, "strings": len(words)}) as write_span:
+            is_written = write_strings_file(lang_dir_path, words)
+            if write_span is not None:
+                write_span.set(written=is_written)
+
+        with self._lock:
+            if is_written:
+                self.written_count += 1
+            else:
+                self.unchanged_count += 1
+
+        if on_written is not None:
+            on_written()
+
+        return is_written
@@ -0,0 +1,67 @@
+# Copyright 2025 Roman Likhachev
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import os
+import shutil
+
+import yaml
+
+from models import Configuration
+
+repository_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def make_config_data(**config):
+    return {
+        "config": {
+            "appDescription": "App",
+            "sourceLanguage": "en",
+            "targetLanguages": ["es", "fr"],
+            "aiProvider": "mock",
+            "aiKey": "mock",
+            "aiModel": "mock",
+            **config
+        }
+    }
+
+
+def make_configuration(**config):
+    return Configuration(make_config_data(**config))
+
+
+def write_project(project_dir, modules_words, mock=None, **config):
+    # An Android project with one module per {key: text} dict of `modules_words`
+    config_data = make_config_data(**config)
+    config_data["mock"] = {"latency": 0.0, **(mock or {})}
+
+    with open(os.path.join(project_dir, "default-translator-config.yml"), "w", encoding="utf-8") as f:
+        yaml.safe_dump(config_data, f)
+    shutil.copy(os.path.join(repository_dir, "assets", "default-translator-prompt.txt"), project_dir)
+
+    modules_dirs = []
+    for module_index, words in enumerate(modules_words):
+        module_dir = os.path.join(project_dir, f"feature-{module_index}")
+        write_strings(os.path.join(module_dir, "src", "main", "res", "values"), words)
+        modules_dirs.append(module_dir)
+
+    return modules_dirs
+
+
+def write_strings(values_dir, words):
+    os.makedirs(values_dir, exist_ok=True)
+    with open(os.path.join(values_dir, "strings.xml"), "w", encoding="utf-8") as f:
+        f.write("<resources>\n")
+        for key, value in words.items():
+            f.write(f'    <string name="{key}">{value}</string>\n')
+        f.write("</resources>\n")
@@ -0,0 +1,388 @@
+# Copyright 2025 Roman Likhachev
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import asyncio
+import os
+import subprocess
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+import ai_client
+from ai_client import AIService, RequestGovernor, TokenBucket, check_batch_support_ai, close_sessions, \
+    get_ai_service, set_provider_concurrency, token_limits_ai, translate_ai, translate_ai_async
+from ai_errors import RetryableError, parse_retry_after
+
+project_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+print_provider_sdks = "print([name for name in ('openai', 'yandex_cloud_ml_sdk', 'grpc') if name in sys.modules])"
+
+
+class FakeClock:
+
+    def __init__(self, now=1000.0):
+        self.now = now
+        self.sleeps = []
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+    def advance(self, seconds):
+        self.now += seconds
+
+
+def make_governor(clock, max_concurrency=8, **kwargs):
+    return RequestGovernor("test", max_concurrency, clock=clock, sleep=clock.sleep, **kwargs)
+
+
+def fail_then_succeed(errors):
+    errors = list(errors)
+
+    def request():
+        if errors:
+            raise errors.pop(0)
+        return "done"
+
+    return request
+
+
+def rate_limited(retry_after=0.0):
+    return RetryableError("Too many requests", status_code=429, retry_after=retry_after)
+
+
+def test_token_bucket_refills_at_its_rate_per_minute():
+    clock = FakeClock()
+    bucket = TokenBucket(60, clock)
+
+    assert bucket.reserve(60) == 0.0
+    assert bucket.reserve(1) == pytest.approx(1.0)
+
+    clock.advance(10)
+    assert bucket.reserve(5) == 0.0
+    assert bucket.level == pytest.approx(4.0)
+
+
+def test_token_bucket_caps_a_reservation_at_its_capacity():
+    clock = FakeClock()
+    bucket = TokenBucket(60, clock)
+
+    # A request larger than a whole minute of tokens waits for a full bucket instead of forever
+    assert bucket.reserve(600) == 0.0
+    assert bucket.reserve(600) == pytest.approx(60.0)
+
+
+def test_governor_spaces_requests_over_the_requests_per_minute():
+    clock = FakeClock()
+    governor = make_governor(clock, requests_per_minute=2)
+
+    for _ in range(3):
+        assert governor.call(lambda: "done") == "done"
+
+    assert clock.sleeps == [0.0, 0.0, pytest.approx(30.0)]
+
+
+def test_governor_waits_for_the_estimated_tokens():
+    clock = FakeClock()
+    governor = make_governor(clock, tokens_per_minute=6000)
+
+    governor.call(lambda: "done", estimated_tokens=6000)
+    governor.call(lambda: "done", estimated_tokens=1000)
+
+    assert clock.sleeps == [0.0, pytest.approx(10.0)]
+
+
+def test_governor_waits_for_the_retry_after_of_a_rate_limit():
+    clock = FakeClock()
+    governor = make_governor(clock)
+
+    assert governor.call(fail_then_succeed([rate_limited(retry_after=3.0)])) == "done"
+
+    assert clock.sleeps == [0.0, 3.0, 0.0]
+    assert governor.retries == 1
+    assert governor.rate_limited == 1
+    assert governor.in_flight == 0
+
+
+def test_rate_limit_pauses_every_caller_of_the_provider():
+    clock = FakeClock()
+    governor = make_governor(clock)
+
+    governor._get_backoff_delay(rate_limited(retry_after=5.0), attempt=1)
+    clock.advance(2)
+
+    assert governor._get_admission_delay(0) == pytest.approx(3.0)
+
+
+def test_concurrency_halves_once_per_burst_of_rate_limits_and_grows_back_additively():
+    clock = FakeClock()
+    governor = make_governor(clock, max_concurrency=8)
+
+    # Two rate limits within a second count as one signal
+    governor.call(fail_then_succeed([rate_limited(), rate_limited()]))
+    assert governor.limit == pytest.approx(4.0 + 1 / 4.0)
+
+    clock.advance(2)
+    governor.call(fail_then_succeed([rate_limited()]))
+    halved = (4.0 + 1 / 4.0) / 2
+    assert governor.limit == pytest.approx(halved + 1 / halved)
+
+    for _ in range(100):
+        governor.call(lambda: "done")
+    assert governor.limit == 8.0
+
+
+def test_concurrency_does_not_drop_below_one():
+    clock = FakeClock()
+    governor = make_governor(clock, max_concurrency=2, max_retries=4)
+
+    with pytest.raises(RetryableError):
+        governor.call(fail_then_succeed([rate_limited(retry_after=2.0)] * 5))
+
+    assert governor.limit == 1.0
+    assert governor.rate_limited == 5
+
+
+def test_governor_raises_after_the_maximum_number_of_retries():
+    clock = FakeClock()
+    governor = make_governor(clock, max_retries=2, base_delay=0.0)
+    error = RetryableError("Unavailable", status_code=503)
+
+    with pytest.raises(RetryableError):
+        governor.call(fail_then_succeed([error] * 3))
+
+    assert governor.retries == 2
+    assert governor.in_flight == 0
+
+
+def test_backoff_is_exponential_with_full_jitter():
+    governor = make_governor(FakeClock(), base_delay=1.0, max_delay=6.0)
+    error = RetryableError("Unavailable", status_code=503)
+
+    for attempt, max_delay in ((1, 1.0), (2, 2.0), (3, 4.0), (4, 6.0), (10, 6.0)):
+        assert 0.0 <= governor._get_backoff_delay(error, attempt) <= max_delay
+
+
+def test_other_errors_are_raised_right_away():
+    clock = FakeClock()
+    governor = make_governor(clock)
+
+    with pytest.raises(PermissionError):
+        governor.call(fail_then_succeed([PermissionError("Unauthorized")]))
+
+    assert governor.retries == 0
+    assert governor.in_flight == 0
+    assert governor.limit == 8.0
+
+
+def test_parse_retry_after():
+    assert parse_retry_after("2") == 2.0
+    assert parse_retry_after("0.5") == 0.5
+    assert parse_retry_after("-3") == 0.0
+    assert parse_retry_after(None) is None
+    assert parse_retry_after("Wed, 21 Oct 2015 07:28:00 GMT") is None
+
+
+def test_importing_ai_client_loads_no_provider_sdk():
+    code = f"import sys, ai_client; {print_provider_sdks}"
+    result = subprocess.run([sys.executable, "-c", code], cwd=project_dir, capture_output=True, text=True, check=True)
+
+    assert result.stdout.strip() == "[]"
+
+
+def test_mock_provider_loads_no_provider_sdk():
+    code = "import sys, ai_client; ai_client.set_mock_provider_settings({'latency': 0}); " \
+           f"ai_client.translate_ai('mock', 'key', None, 'mock', 'Translate []'); {print_provider_sdks}"
+    result = subprocess.run([sys.executable, "-c", code], cwd=project_dir, capture_output=True, text=True, check=True)
+
+    assert result.stdout.strip().splitlines()[-1] == "[]"
+
+
+class FakeProvider:
+
+    supports_batch = False
+
+    def __init__(self):
+        self.calls = []
+
+    def create_session(self, ai_key, ai_folder, max_connections):
+        self.calls.append(("create_session", ai_key, ai_folder))
+        return "session"
+
+    def translate(self, ai_key, ai_folder, ai_model, prompt, client=None, response_schema=None):
+        self.calls.append(("translate", ai_model, prompt, client))
+        return "translated"
+
+    def token_limits(self, ai_model):
+        return 1000, 100
+
+
+def test_calls_are_dispatched_to_the_provider_module(monkeypatch):
+    provider = FakeProvider()
+    monkeypatch.setitem(ai_client._providers, AIService.MOCK, provider)
+    monkeypatch.setattr(ai_client, "_sessions", {})
+
+    assert translate_ai("Mock", "key", "folder", "model", "Translate") == "translated"
+    assert translate_ai("mock", "key", "folder", "model", "Again") == "translated"
+    assert token_limits_ai("mock", "model") == (1000, 100)
+    with pytest.raises(ValueError):
+        check_batch_support_ai("mock")
+
+    assert provider.calls == [
+        ("create_session", "key", "folder"),
+        ("translate", "model", "Translate", "session"),
+        ("translate", "model", "Again", "session")
+    ]
+
+
+def test_unknown_provider_is_rejected():
+    with pytest.raises(ValueError):
+        get_ai_service("gemini")
+
+
+class LoopBoundProvider(FakeProvider):
+
+    def create_async_session(self, ai_key, ai_folder, max_connections):
+        self.calls.append(("create_async_session", ai_key, ai_folder))
+        return LoopBoundSession()
+
+    async def translate_async(self, ai_key, ai_folder, ai_model, prompt, client=None, response_schema=None):
+        # Like an httpx.AsyncClient, the session fails on any other loop than its own
+        if client.loop is not asyncio.get_running_loop() or client.is_closed:
+            raise RuntimeError("Event loop is closed")
+        return "translated"
+
+
+class LoopBoundSession:
+
+    def __init__(self):
+        self.loop = asyncio.get_running_loop()
+        self.is_closed = False
+
+    async def close(self):
+        self.is_closed = True
+
+
+def test_async_sessions_are_not_shared_between_event_loops(monkeypatch):
+    provider = LoopBoundProvider()
+    monkeypatch.setitem(ai_client._providers, AIService.MOCK, provider)
+
+    async def run():
+        return [await translate_ai_async("mock", "key", None, "model", "Translate") for _ in range(2)]
+
+    assert asyncio.run(run()) == ["translated"] * 2
+    assert asyncio.run(run()) == ["translated"] * 2
+
+    assert [call[0] for call in provider.calls].count("create_async_session") == 2
+
+
+def test_closing_async_sessions_closes_only_those_of_the_running_loop(monkeypatch):
+    provider = LoopBoundProvider()
+    monkeypatch.setitem(ai_client._providers, AIService.MOCK, provider)
+
+    async def open_session():
+        return ai_client.get_async_session(AIService.MOCK, "key", None)
+
+    async def open_and_close_session():
+        session = ai_client.get_async_session(AIService.MOCK, "key", None)
+        await ai_client.close_async_sessions()
+        return session
+
+    other_loop = asyncio.new_event_loop()
+    try:
+        other_session = other_loop.run_until_complete(open_session())
+        closed_session = asyncio.run(open_and_close_session())
+
+        assert closed_session.is_closed
+        assert not other_session.is_closed
+        assert other_loop.run_until_complete(open_session()) is other_session
+    finally:
+        other_loop.run_until_complete(ai_client.close_async_sessions())
+        other_loop.close()
+
+
+class ClosableSession:
+
+    def __init__(self, max_connections):
+        self.max_connections = max_connections
+        self.is_closed = False
+
+    def close(self):
+        self.is_closed = True
+
+
+class PoolingProvider(FakeProvider):
+
+    def __init__(self):
+        super().__init__()
+        self.sessions = []
+        self._lock = threading.Lock()
+
+    def create_session(self, ai_key, ai_folder, max_connections):
+        session = ClosableSession(max_connections)
+        with self._lock:
+            self.sessions.append(session)
+        return session
+
+
+@pytest.fixture
+def pooling_provider(monkeypatch):
+    provider = PoolingProvider()
+    monkeypatch.setitem(ai_client._providers, AIService.MOCK, provider)
+    monkeypatch.setattr(ai_client, "_sessions", {})
+    monkeypatch.setattr(ai_client, "_governors", {})
+    monkeypatch.setattr(ai_client, "_provider_concurrency", dict(ai_client.default_provider_concurrency))
+
+    return provider
+
+
+def test_threads_share_one_session_sized_to_the_provider_concurrency(pooling_provider):
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        results = list(executor.map(lambda _: translate_ai("mock", "key", None, "model", "Translate"), range(32)))
+
+    assert results == ["translated"] * 32
+    assert len(pooling_provider.sessions) == 1
+    assert pooling_provider.sessions[0].max_connections == ai_client.default_provider_concurrency[AIService.MOCK]
+
+
+def test_every_key_gets_its_own_session(pooling_provider):
+    translate_ai("mock", "key", None, "model", "Translate")
+    translate_ai("mock", "other key", None, "model", "Translate")
+    translate_ai("mock", "key", "folder", "model", "Translate")
+
+    assert len(pooling_provider.sessions) == 3
+
+
+def test_new_concurrency_limit_rebuilds_the_sessions(pooling_provider):
+    translate_ai("mock", "key", None, "model", "Translate")
+
+    set_provider_concurrency("mock", 2)
+    translate_ai("mock", "key", None, "model", "Translate")
+
+    assert [session.max_connections for session in pooling_provider.sessions] == [8, 2]
+    assert [session.is_closed for session in pooling_provider.sessions] == [True, False]
+
+
+def test_closing_the_sessions_closes_every_client(pooling_provider):
+    translate_ai("mock", "key", None, "model", "Translate")
+    translate_ai("mock", "other key", None, "model", "Translate")
+
+    close_sessions()
+    translate_ai("mock", "key", None, "model", "Translate")
+
+    assert [session.is_closed for session in pooling_provider.sessions] == [True, True, False]
@@ -0,0 +1,191 @@
+# Copyright 2025 Roman Likhachev
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import json
+import os
+
+import pytest
+
+import batch
+from ai_client import set_mock_provider_settings
+from batch import execute_batch, load_batch_state, write_batch_requests
+from batch_backend import BATCH_IN_PROGRESS
+from configure import configure
+from execute import parse_strings_file
+from init import init
+from mock_gpt import MockBatchBackend
+from translation_cache import get_state_dir
+from tests import write_project
+
+modules_words = [
+    {f"feature_0_string_{index}": f"Text {index} of the first screen" for index in range(6)},
+    {f"feature_1_string_{index}": f"Text {index} of the second screen" for index in range(6)}
+]
+
+
+@pytest.fixture(autouse=True)
+def reset_mock_settings():
+    yield
+    set_mock_provider_settings(None)
+
+
+def run_batch(project_dir, detach=False):
+    configuration, prompt_path = init(project_dir=project_dir)
+    state_dir = get_state_dir(project_dir)
+    execution_graph = configure(project_dir=project_dir, state_dir=state_dir)
+
+    execute_batch(prompt_path, configuration, execution_graph, state_dir=state_dir, detach=detach)
+
+    return state_dir
+
+
+def get_mock_jobs_dir(state_dir):
+    return os.path.join(state_dir, "batch", "mock")
+
+
+def read_translations(module_dir, language):
+    strings_path = os.path.join(module_dir, "src", "main", "res", f"values-{language}", "strings.xml")
+    if not os.path.exists(strings_path):
+        return None
+
+    return {word["key"]: word["value"] for word in parse_strings_file(strings_path, set())}
+
+
+def assert_translated(modules_dirs, languages=("es", "fr")):
+    for module_dir, words in zip(modules_dirs, modules_words):
+        for language in languages:
+            assert read_translations(module_dir, language) == {key: f"[mock] {value}" for key, value in words.items()}
+
+
+def test_detached_batch_is_resumed_and_collected_by_the_next_run(tmp_path):
+    modules_dirs = write_project(tmp_path, modules_words, mock={"batchLatency": 3600})
+
+    state_dir = run_batch(tmp_path, detach=True)
+
+    # The job is submitted and saved, nothing is written until it completes
+    state = load_batch_state(state_dir)
+    batch_ids = [saved_batch["batch_id"] for saved_batch in state["batches"]]
+    assert state["provider"] == "mock"
+    assert len(batch_ids) == 1
+    assert MockBatchBackend("mock", get_mock_jobs_dir(state_dir), {"batchLatency": 3600, "batchMaxRequests": None}) \
+        .retrieve(batch_ids[0])["status"] == BATCH_IN_PROGRESS
+    assert read_translations(modules_dirs[0], "es") is None
+
+    # The next run polls the saved job instead of submitting the requests again
+    write_project(tmp_path, modules_words, mock={"batchLatency": 0.0})
+    run_batch(tmp_path)
+
+    assert os.listdir(get_mock_jobs_dir(state_dir)) == batch_ids
+    assert load_batch_state(state_dir) is None
+    assert_translated(modules_dirs)
+
+
+def test_strings_missing_from_the_batch_results_are_requested_directly(tmp_path, monkeypatch):
+    modules_dirs = write_project(tmp_path, modules_words)
+    dropped_keys = ("feature_0_string_2", "feature_1_string_5")
+
+    download = MockBatchBackend.download
+
+    def download_without_some_keys(backend, batch_id):
+        results = download(backend, batch_id)
+        for result in results.values():
+            # Structured output wraps the translations into an object
+            translations = json.loads(result["text"])["translations"]
+            result["text"] = json.dumps({"translations": [item for item in translations
+                                                          if item["key"] not in dropped_keys]})
+        return results
+
+    requested_keys = []
+    translate_chunks = batch.translate_chunks
+
+    def record_translate_chunks(configuration, plan):
+        requested_keys.extend(word["key"] for chunk in plan["chunks"] for word in chunk)
+        return translate_chunks(configuration, plan)
+
+    monkeypatch.setattr(MockBatchBackend, "download", download_without_some_keys)
+    monkeypatch.setattr(batch, "translate_chunks", record_translate_chunks)
+
+    run_batch(tmp_path)
+
+    # Only the dropped keys are requested, once for each language of their module
+    assert sorted(requested_keys) == ["feature_0_string_2", "feature_0_string_2", "feature_1_string_5",
+                                      "feature_1_string_5"]
+    assert_translated(modules_dirs)
+
+
+def test_large_run_is_split_across_several_jobs(tmp_path):
+    modules_dirs = write_project(tmp_path, modules_words, mock={"batchMaxRequests": 1})
+
+    state_dir = run_batch(tmp_path)
+
+    # One request per module and language, one request per job
+    assert len(os.listdir(get_mock_jobs_dir(state_dir))) == len(modules_words) * 2
+    assert load_batch_state(state_dir) is None
+    assert_translated(modules_dirs)
+
+
+class RecordingBackend:
+
+    def __init__(self, max_requests=None, max_file_bytes=None):
+        self.max_requests = max_requests
+        self.max_file_bytes = max_file_bytes
+
+    def make_request(self, custom_id, prompt, response_schema=None):
+        return {"custom_id": custom_id, "prompt": prompt}
+
+
+def make_jobs(chunk_counts):
+    return [
+        {
+            "index": index,
+            "plan": {
+                "chunks": [[{"key": f"{index}_{chunk_index}", "value": "Text"}] for chunk_index in range(count)],
+                "generate_prompt": lambda chunk: f"Translate {chunk[0]['key']}",
+                "make_response_schema": lambda chunk: None
+            }
+        }
+        for index, count in enumerate(chunk_counts)
+    ]
+
+
+def read_custom_ids(requests_path):
+    with open(requests_path, "r", encoding="utf-8") as f:
+        return [json.loads(line)["custom_id"] for line in f]
+
+
+def test_requests_are_split_by_the_request_limit_of_a_job(tmp_path):
+    parts = write_batch_requests(RecordingBackend(max_requests=2), make_jobs([3, 2]), str(tmp_path))
+
+    assert [request_count for _, _, request_count in parts] == [2, 2, 1]
+    assert [read_custom_ids(path) for path, _, _ in parts] == [["0:0", "0:1"], ["0:2", "1:0"], ["1:1"]]
+
+
+def test_requests_are_split_by_the_file_size_limit_of_a_job(tmp_path):
+    line_bytes = len(json.dumps({"custom_id": "0:0", "prompt": "Translate 0_0"}, sort_keys=True)) + 1
+
+    parts = write_batch_requests(RecordingBackend(max_file_bytes=line_bytes * 2), make_jobs([5]), str(tmp_path))
+
+    assert [request_count for _, _, request_count in parts] == [2, 2, 1]
+
+
+def test_same_requests_get_the_same_hashes_and_old_files_are_removed(tmp_path):
+    backend = RecordingBackend(max_requests=2)
+
+    first_parts = write_batch_requests(backend, make_jobs([5]), str(tmp_path))
+    second_parts = write_batch_requests(backend, make_jobs([3]), str(tmp_path))
+
+    assert first_parts[0][1] == second_parts[0][1]
+    assert first_parts[1][1] != second_parts[1][1]
+    assert sorted(os.listdir(tmp_path)) == ["requests-1.jsonl", "requests-2.jsonl"]
+
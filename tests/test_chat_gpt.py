@@ -0,0 +1,103 @@
+# Copyright 2025 Roman Likhachev
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from types import SimpleNamespace
+
+import httpx
+import openai
+import pytest
+
+from ai_client import RequestGovernor
+from ai_errors import RetryableError
+from chat_gpt import create_session, map_translation_error, translate
+
+request = httpx.Request("POST", "https://api.openai.com/v1/chat/completions")
+
+
+def make_status_error(error_class, status_code, retry_after=None):
+    headers = {"retry-after": retry_after} if retry_after is not None else {}
+    return error_class("Error", response=httpx.Response(status_code, headers=headers, request=request), body=None)
+
+
+class FailingClient:
+
+    def __init__(self, errors):
+        self.errors = list(errors)
+        self.attempts = 0
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self.create))
+
+    def create(self, **kwargs):
+        self.attempts += 1
+        if self.errors:
+            raise self.errors.pop(0)
+
+        message = SimpleNamespace(content='[{"key": "a", "value": "uno"}]')
+        return SimpleNamespace(choices=[SimpleNamespace(message=message)], usage=None)
+
+
+def translate_through_governor(client):
+    governor = RequestGovernor("openai", max_concurrency=2, base_delay=0.0)
+    text = governor.call(lambda: translate("key", None, "gpt-4.1-mini", "Translate", client=client))
+    return governor, text
+
+
+@pytest.mark.parametrize("error", [
+    openai.APIConnectionError(request=request),
+    openai.APITimeoutError(request=request),
+    make_status_error(openai.RateLimitError, 429, retry_after="0"),
+    make_status_error(openai.InternalServerError, 500),
+    make_status_error(openai.InternalServerError, 503),
+    make_status_error(openai.ConflictError, 409)
+])
+def test_transient_errors_are_retried_by_the_governor(error):
+    client = FailingClient([error])
+
+    governor, text = translate_through_governor(client)
+
+    assert text == '[{"key": "a", "value": "uno"}]'
+    assert client.attempts == 2
+    assert governor.retries == 1
+
+
+def test_rate_limit_error_keeps_the_retry_after_of_the_response():
+    error = map_translation_error(make_status_error(openai.RateLimitError, 429, retry_after="2.5"))
+
+    assert isinstance(error, RetryableError)
+    assert error.is_rate_limited
+    assert error.retry_after == 2.5
+
+
+@pytest.mark.parametrize("error, mapped_class", [
+    (make_status_error(openai.AuthenticationError, 401), PermissionError),
+    (make_status_error(openai.BadRequestError, 400), RuntimeError),
+    (make_status_error(openai.NotFoundError, 404), RuntimeError)
+])
+def test_other_errors_are_not_retried(error, mapped_class):
+    client = FailingClient([error])
+
+    with pytest.raises(mapped_class) as raised:
+        translate_through_governor(client)
+
+    assert not isinstance(raised.value, RetryableError)
+    assert client.attempts == 1
+
+
+def test_session_pools_connections_and_leaves_the_retries_to_the_governor():
+    session = create_session("sk-test", None, max_connections=3)
+    try:
+        assert session.max_retries == 0
+        assert session._client._transport._pool._max_connections == 3
+        assert session.timeout.connect == 10.0
+    finally:
+        session.close()
@@ -0,0 +1,124 @@
+# Copyright 2025 Roman Likhachev
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import asyncio
+import json
+
+import pytest
+
+import client
+from ai_errors import RetryableError
+from client import make_parse, parse_, parse_multi_, parse_keyed_, parse_keyed_multi_, translate_chunk, \
+    translate_chunk_async
+from tests import make_configuration
+from wire_encoding import ENCODING_JSON
+
+
+def test_parse_salvages_the_complete_items_of_a_truncated_response():
+    text = 'Here you go: [{"key": "a", "value": "uno"}, {"key": "b", "value": "dos"}, {"key": "c", "va'
+
+    assert parse_(text) == [{"key": "a", "value": "uno"}, {"key": "b", "value": "dos"}]
+
+
+def test_parse_multi_salvages_items_by_language():
+    text = '{"es": [{"key": "a", "value": "uno"}], "fr": [{"key": "a", "value": "un"}, {"key": "b"'
+
+    assert parse_multi_(text) == {"es": [{"key": "a", "value": "uno"}], "fr": [{"key": "a", "value": "un"}]}
+
+
+def test_parse_keyed_salvages_members():
+    assert parse_keyed_('{"a": "uno", "b": "do') == [{"key": "a", "value": "uno"}]
+    assert parse_keyed_multi_('{"es": {"a": "uno"}, "fr": {"a": "u') == {"es": [{"key": "a", "value": "uno"}]}
+
+
+@pytest.mark.parametrize("parse", [parse_, parse_multi_, parse_keyed_, parse_keyed_multi_])
+def test_parse_raises_without_any_item(parse):
+    with pytest.raises(ValueError):
+        parse("Sorry, I cannot help with that.")
+
+
+words = [{"key": key, "value": f"Text {key}"} for key in ("a", "b", "c")]
+
+
+def make_response(keys):
+    return json.dumps([{"key": key, "value": f"Texto {key}"} for key in keys])
+
+
+class ScriptedProvider:
+
+    def __init__(self, responses):
+        self.responses = list(responses)
+        self.requests = []
+
+    def request(self, global_config, plan, words, translated):
+        self.requests.append([word["key"] for word in words])
+        response = self.responses.pop(0)
+        if isinstance(response, BaseException):
+            raise response
+        return response
+
+
+def run_chunk(monkeypatch, is_async, responses, chunk_retries=2):
+    provider = ScriptedProvider(responses)
+    global_config = make_configuration(targetLanguages=["es"], chunkRetries=chunk_retries)
+    plan = {"module": "app", "target_languages": ["es"], "streaming": False, "parse": make_parse(ENCODING_JSON, ["es"])}
+
+    if is_async:
+        async def request_chunk_async(*args):
+            return provider.request(*args)
+
+        monkeypatch.setattr(client, "request_chunk_async", request_chunk_async)
+        result = asyncio.run(translate_chunk_async(global_config, words, plan))
+    else:
+        monkeypatch.setattr(client, "request_chunk", provider.request)
+        result = translate_chunk(global_config, words, plan)
+
+    return provider.requests, result
+
+
+@pytest.mark.parametrize("is_async", [False, True])
+def test_chunk_requests_only_the_missing_keys_again(monkeypatch, is_async):
+    truncated = '[{"key": "a", "value": "Texto a"}, {"key": "b", "va'
+    requests, result = run_chunk(monkeypatch, is_async, [truncated, make_response("bc")])
+
+    assert requests == [["a", "b", "c"], ["b", "c"]]
+    assert [item["key"] for item in result["es"]] == ["a", "b", "c"]
+
+
+@pytest.mark.parametrize("is_async", [False, True])
+def test_chunk_is_requested_again_after_an_unusable_response(monkeypatch, is_async):
+    requests, result = run_chunk(monkeypatch, is_async, [ValueError("Stopped"), "No JSON", make_response("abc")])
+
+    assert requests == [["a", "b", "c"]] * 3
+    assert len(result["es"]) == 3
+
+
+@pytest.mark.parametrize("is_async", [False, True])
+def test_chunk_does_not_repeat_the_retries_of_the_governor(monkeypatch, is_async):
+    with pytest.raises(RetryableError):
+        run_chunk(monkeypatch, is_async, [RetryableError("Unavailable", status_code=503), make_response("abc")])
+
+
+@pytest.mark.parametrize("is_async", [False, True])
+def test_chunk_keeps_the_partial_result_after_the_last_retry(monkeypatch, is_async):
+    requests, result = run_chunk(monkeypatch, is_async, [make_response("ab"), make_response("")], chunk_retries=1)
+
+    assert requests == [["a", "b", "c"], ["c"]]
+    assert [item["key"] for item in result["es"]] == ["a", "b"]
+
+
+@pytest.mark.parametrize("is_async", [False, True])
+def test_chunk_raises_when_nothing_came_back(monkeypatch, is_async):
+    with pytest.raises(ValueError):
+        run_chunk(monkeypatch, is_async, ["No JSON", "No JSON"], chunk_retries=1)
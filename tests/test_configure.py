@@ -0,0 +1,154 @@
+# Copyright 2025 Roman Likhachev
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import os
+import subprocess
+
+import pytest
+import yaml
+
+import configure as configure_module
+from configure import configure, default_ignored_dirs
+from manifest import load_manifest, manifest_file_name
+from tests import write_project, write_strings
+
+modules_words = [{"title": "Home"}, {"title": "Settings"}, {"title": "Profile"}]
+
+
+@pytest.fixture
+def project_dir(tmp_path):
+    project_dir = tmp_path / "project"
+    os.makedirs(project_dir)
+    write_project(str(project_dir), modules_words)
+    write_module_config(project_dir / "feature-1", "The settings screen.")
+
+    return project_dir
+
+
+@pytest.fixture
+def state_dir(tmp_path):
+    state_dir = tmp_path / "state"
+    os.makedirs(state_dir)
+
+    return str(state_dir)
+
+
+@pytest.fixture
+def scanned_dirs(monkeypatch):
+    # Directories listed by the scan, a directory with the same mtime is taken from the manifest instead
+    scanned_dirs = []
+    scan_directory = configure_module.scan_directory
+
+    def record_scan_directory(directory, ignored, mtime_ns):
+        scanned_dirs.append(directory)
+        return scan_directory(directory, ignored, mtime_ns)
+
+    monkeypatch.setattr(configure_module, "scan_directory", record_scan_directory)
+
+    return scanned_dirs
+
+
+def write_module_config(module_dir, description):
+    with open(module_dir / "translator-config.yml", "w", encoding="utf-8") as f:
+        yaml.safe_dump({"config": {"moduleDescription": description}}, f)
+
+
+def get_modules(execution_graph):
+    return [(os.path.basename(module["module_path"]), module["configuration"].module_description
+             if module["configuration"] else None) for module in execution_graph]
+
+
+def test_unchanged_project_is_taken_from_the_manifest(project_dir, state_dir, scanned_dirs, monkeypatch):
+    first_graph = configure(str(project_dir), state_dir=state_dir)
+    assert os.path.exists(os.path.join(state_dir, manifest_file_name))
+    assert scanned_dirs
+
+    scanned_dirs.clear()
+    parsed_files = []
+    monkeypatch.setattr(configure_module, "load_yaml", lambda path: parsed_files.append(path))
+
+    second_graph = configure(str(project_dir), state_dir=state_dir)
+
+    assert scanned_dirs == []
+    assert parsed_files == []
+    assert get_modules(second_graph) == get_modules(first_graph) == [
+        ("feature-0", None), ("feature-1", "The settings screen."), ("feature-2", None)
+    ]
+
+
+def test_new_module_and_changed_config_are_detected(project_dir, state_dir, scanned_dirs):
+    configure(str(project_dir), state_dir=state_dir)
+    scanned_dirs.clear()
+
+    write_strings(str(project_dir / "feature-3" / "src" / "main" / "res" / "values"), {"title": "Search"})
+    write_module_config(project_dir / "feature-1", "The settings screen of the app.")
+
+    execution_graph = configure(str(project_dir), state_dir=state_dir)
+
+    # Only the project root, whose entries changed, and the new module are listed again
+    assert str(project_dir) in scanned_dirs
+    assert not any(os.path.basename(directory) in ("feature-0", "feature-2") for directory in scanned_dirs)
+    assert get_modules(execution_graph) == [
+        ("feature-0", None), ("feature-1", "The settings screen of the app."), ("feature-2", None), ("feature-3", None)
+    ]
+
+
+def test_removed_module_is_dropped(project_dir, state_dir):
+    configure(str(project_dir), state_dir=state_dir)
+
+    os.remove(project_dir / "feature-2" / "src" / "main" / "res" / "values" / "strings.xml")
+
+    assert [name for name, _ in get_modules(configure(str(project_dir), state_dir=state_dir))] == [
+        "feature-0", "feature-1"
+    ]
+
+
+def test_unreadable_manifest_is_not_used(state_dir):
+    with open(os.path.join(state_dir, manifest_file_name), "w", encoding="utf-8") as f:
+        f.write("{")
+
+    assert load_manifest(state_dir, default_ignored_dirs)["dirs"] == {}
+
+
+def test_manifest_of_other_ignored_dirs_is_not_used(project_dir, state_dir):
+    configure(str(project_dir), state_dir=state_dir)
+
+    assert load_manifest(state_dir, default_ignored_dirs)["dirs"]
+    assert load_manifest(state_dir, default_ignored_dirs + ["feature-0"])["dirs"] == {}
+
+
+def run_git(project_dir, *args):
+    subprocess.run(["git", "-c", "user.name=Test", "-c", "user.email=test@example.com", *args], cwd=project_dir,
+                   capture_output=True, check=True)
+
+
+def test_changed_since_keeps_the_modules_changed_after_the_ref(project_dir):
+    run_git(project_dir, "init", "-q")
+    run_git(project_dir, "add", ".")
+    run_git(project_dir, "commit", "-q", "-m", "Initial")
+
+    write_strings(str(project_dir / "feature-0" / "src" / "main" / "res" / "values"), {"title": "Start"})
+    write_module_config(project_dir / "feature-1", "The settings screen of the app.")
+    write_strings(str(project_dir / "feature-3" / "src" / "main" / "res" / "values"), {"title": "Search"})
+
+    execution_graph = configure(str(project_dir), changed_since="HEAD")
+
+    assert [name for name, _ in get_modules(execution_graph)] == ["feature-0", "feature-1", "feature-3"]
+
+
+def test_changed_since_an_unknown_ref_is_an_error(project_dir):
+    run_git(project_dir, "init", "-q")
+
+    with pytest.raises(ValueError):
+        configure(str(project_dir), changed_since="no-such-ref")
@@ -0,0 +1,148 @@
+# Copyright 2025 Roman Likhachev
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from dedup import collect_shared_translations, estimate_savings, is_deduplication_worthwhile, make_shared_work_units, \
+    merge_shared_words, plan_deduplication, split_shared_words
+from tests import make_configuration
+
+
+def make_words(values):
+    return [{"key": key, "value": value} for key, value in values.items()]
+
+
+def make_unit(module_index, words_by_language):
+    unit = {"module_index": module_index, "languages": list(words_by_language)}
+    prepared = {"pending_words_by_language": words_by_language}
+    return unit, prepared
+
+
+modules_words = [
+    make_words({"home_ok": "OK", "home_title": "Home", "home_cancel": "Cancel"}),
+    make_words({"settings_ok": "OK", "settings_title": "Settings", "settings_close": "Cancel", "settings_ok_2": " OK"}),
+    make_words({"profile_title": "Profile", "profile_ok": "OK"})
+]
+
+
+def plan_modules(languages=("es", "fr")):
+    units = [make_unit(index, {language: words for language in languages}) for index, words in enumerate(modules_words)]
+    work_units = [unit for unit, _ in units]
+    prepared_units = [prepared for _, prepared in units]
+
+    return work_units, prepared_units, plan_deduplication(work_units, prepared_units)
+
+
+def test_values_pending_in_several_modules_are_shared():
+    _, _, plan = plan_modules()
+
+    # "OK" appears twice in the second module, which gives the context, "Cancel" ties and goes to the first module
+    assert plan["shared_keys"] == {("OK", "es"): 1, ("OK", "fr"): 1, ("Cancel", "es"): 0, ("Cancel", "fr"): 0}
+    assert plan["shared_words"] == {1: {"es": ["OK"], "fr": ["OK"]}, 0: {"es": ["Cancel"], "fr": ["Cancel"]}}
+    # 4 keys of "OK" and 2 of "Cancel" per language, each translated once
+    assert plan["duplicates"] == (3 + 1) * 2
+
+
+def test_repeats_within_one_module_are_not_shared():
+    unit, prepared = make_unit(0, {"es": make_words({"a": "OK", "b": "OK"})})
+
+    plan = plan_deduplication([unit], [prepared])
+
+    assert plan["shared_keys"] == {}
+    assert plan["duplicates"] == 0
+
+
+def test_shared_units_use_the_real_key_of_the_context_module():
+    _, _, plan = plan_modules()
+    execution_graph = [{"strings": f"module-{index}"} for index in range(len(modules_words))]
+
+    shared_units = make_shared_work_units(plan, execution_graph, modules_words, batch_size=1)
+
+    assert [(unit["module_index"], unit["languages"]) for unit in shared_units] == [
+        (0, ["es"]), (0, ["fr"]), (1, ["es"]), (1, ["fr"])
+    ]
+    assert shared_units[0]["words_by_language"] == {"es": make_words({"home_cancel": "Cancel"})}
+    assert shared_units[2]["words_by_language"] == {"es": make_words({"settings_ok": "OK"})}
+
+
+def test_shared_translations_fan_out_to_every_module_key():
+    work_units, prepared_units, plan = plan_modules()
+    execution_graph = [{"strings": f"module-{index}"} for index in range(len(modules_words))]
+    shared_units = make_shared_work_units(plan, execution_graph, modules_words, batch_size=2)
+    shared_results = [
+        {language: [{"key": word["key"], "value": f"{language}:{word['value']}"} for word in words]
+         for language, words in unit["words_by_language"].items()}
+        for unit in shared_units
+    ]
+
+    translations = collect_shared_translations(shared_units, shared_results)
+
+    merged_modules = []
+    for prepared in prepared_units:
+        pending_words_by_language = prepared["pending_words_by_language"]
+        remaining_by_language, shared_by_language = split_shared_words(pending_words_by_language, translations)
+
+        # Only the strings of the module itself are left to request
+        assert all(word["value"] not in ("OK", " OK", "Cancel") for words in remaining_by_language.values()
+                   for word in words)
+
+        translated = {language: [{"key": word["key"], "value": f"{language}:{word['value']}"} for word in words]
+                      for language, words in remaining_by_language.items()}
+        merged_modules.append(merge_shared_words(pending_words_by_language, translated, shared_by_language))
+
+    # Every key of every module is translated, in the source order, the shared ones with the shared translation
+    for words, merged in zip(modules_words, merged_modules):
+        for language in ("es", "fr"):
+            assert merged[language] == [
+                {"key": word["key"], "value": f"{language}:{' '.join(word['value'].split())}"} for word in words
+            ]
+
+
+def test_missing_shared_translation_leaves_the_key_to_the_module():
+    pending_words_by_language = {"es": make_words({"a": "OK", "b": "Cancel"})}
+
+    remaining_by_language, shared_by_language = split_shared_words(pending_words_by_language, {("OK", "es"): "Vale"})
+
+    assert remaining_by_language == {"es": make_words({"b": "Cancel"})}
+    assert shared_by_language == {"es": make_words({"a": "Vale"})}
+    assert merge_shared_words(pending_words_by_language, {}, shared_by_language) == {"es": make_words({"a": "Vale"})}
+
+
+def test_deduplication_is_skipped_when_it_saves_no_request():
+    work_units, prepared_units, plan = plan_modules()
+    execution_graph = [{"strings": f"module-{index}"} for index in range(len(modules_words))]
+    shared_units = make_shared_work_units(plan, execution_graph, modules_words, batch_size=1)
+    configuration = make_configuration()
+
+    # Every module fits in one request with or without its shared strings
+    assert not is_deduplication_worthwhile(configuration, plan, prepared_units, shared_units)
+
+    expected_translations = {pair: pair[0] for pair in plan["shared_keys"]}
+    savings = estimate_savings(configuration, prepared_units, shared_units, expected_translations)
+    assert savings["requests_after"] > savings["requests_before"]
+
+
+def test_deduplication_is_kept_when_the_modules_need_fewer_requests():
+    shared_values = {f"common_{index}": f"Common text number {index}" for index in range(20)}
+    words = [
+        make_words({**{f"m{module_index}_{key}": value for key, value in shared_values.items()},
+                    f"m{module_index}_title": f"Title of screen {module_index}"})
+        for module_index in range(4)
+    ]
+    units = [make_unit(index, {"es": module_words}) for index, module_words in enumerate(words)]
+    work_units = [unit for unit, _ in units]
+    prepared_units = [prepared for _, prepared in units]
+    plan = plan_deduplication(work_units, prepared_units)
+    shared_units = make_shared_work_units(plan, [{"strings": "module"}] * 4, words, batch_size=1)
+
+    # A small budget splits every module into several chunks, most of them made of the shared strings
+    assert is_deduplication_worthwhile(make_configuration(chunkTokenBudget=200), plan, prepared_units, shared_units)
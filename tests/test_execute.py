@@ -0,0 +1,71 @@
+# Copyright 2025 Roman Likhachev
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from execute import get_pending_words, make_snapshot_words, merge_translated_words
+
+
+def make_words(values):
+    return [{"key": key, "value": value} for key, value in values.items()]
+
+
+def test_changed_and_new_strings_are_pending():
+    words = make_words({"a": "Hello", "b": "Goodbye", "c": "New"})
+    existing_words = make_words({"a": "Hola", "b": "Adiós"})
+    snapshot = {"a": "Hello", "b": "Bye"}
+
+    assert get_pending_words(words, existing_words, snapshot) == make_words({"b": "Goodbye", "c": "New"})
+
+
+def test_merge_keeps_the_source_order_and_drops_removed_keys():
+    words = make_words({"a": "Hello", "b": "Goodbye", "c": "New"})
+    existing_words = make_words({"old": "Viejo", "b": "Adiós", "a": "Hola"})
+    translated_words = make_words({"c": "Nuevo", "b": "Hasta luego"})
+
+    assert merge_translated_words(words, existing_words, translated_words) == make_words(
+        {"a": "Hola", "b": "Hasta luego", "c": "Nuevo"}
+    )
+
+
+def test_snapshot_of_a_complete_translation_is_the_source():
+    words = make_words({"a": "Hello", "b": "Goodbye"})
+
+    assert make_snapshot_words(words, words, make_words({"a": "Hola", "b": "Adiós"}), {}) == words
+
+
+def test_strings_skipped_after_retries_stay_pending_in_the_next_run():
+    words = make_words({"a": "Hello", "b": "Goodbye", "c": "New"})
+    existing_words = make_words({"a": "Hola", "b": "Adiós"})
+    previous_snapshot = {"a": "Hello", "b": "Bye"}
+
+    pending_words = get_pending_words(words, existing_words, previous_snapshot)
+    # Both pending strings were skipped after failed retries
+    snapshot_words = make_snapshot_words(words, pending_words, [], previous_snapshot)
+    output_words = merge_translated_words(words, existing_words, [])
+    snapshot = {word["key"]: word["value"] for word in snapshot_words}
+
+    # "b" keeps its old source text and "c" is left out, both are translated again
+    assert snapshot == {"a": "Hello", "b": "Bye"}
+    assert get_pending_words(words, output_words, snapshot) == make_words({"b": "Goodbye", "c": "New"})
+
+
+def test_only_the_skipped_strings_stay_pending():
+    words = make_words({"a": "Hello", "b": "Goodbye", "c": "New"})
+    translated_words = make_words({"a": "Hola", "c": "Nuevo"})
+
+    snapshot_words = make_snapshot_words(words, words, translated_words, {})
+    output_words = merge_translated_words(words, [], translated_words)
+    snapshot = {word["key"]: word["value"] for word in snapshot_words}
+
+    assert snapshot == {"a": "Hello", "c": "New"}
+    assert get_pending_words(words, output_words, snapshot) == make_words({"b": "Goodbye"})
@@ -0,0 +1,98 @@
+# Copyright 2025 Roman Likhachev
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import os
+
+import pytest
+
+from journal import Journal, journal_file_name
+
+
+@pytest.fixture
+def project(tmp_path):
+    state_dir = tmp_path / ".aitranslator"
+    state_dir.mkdir()
+
+    module = {"strings": str(tmp_path / "app" / "src" / "main" / "res" / "values" / "strings.xml")}
+    lang_dir_paths = {}
+    for language in ("es", "fr", "de"):
+        lang_dir_path = tmp_path / "app" / "src" / "main" / "res" / f"values-{language}"
+        lang_dir_path.mkdir(parents=True)
+        (lang_dir_path / "strings.xml").write_text(f"<resources>{language}</resources>", encoding="utf-8")
+        lang_dir_paths[language] = str(lang_dir_path)
+
+    return str(state_dir), module, lang_dir_paths
+
+
+def test_recorded_language_is_done_until_its_file_or_source_changes(project):
+    state_dir, module, lang_dir_paths = project
+    journal = Journal(state_dir).open()
+    journal.record(module, "es", "source", lang_dir_paths["es"])
+    journal.close()
+
+    journal = Journal(state_dir).load()
+    assert journal.is_done(module, "es", "source", lang_dir_paths["es"])
+    assert not journal.is_done(module, "es", "changed source", lang_dir_paths["es"])
+    assert not journal.is_done(module, "fr", "source", lang_dir_paths["fr"])
+
+    with open(os.path.join(lang_dir_paths["es"], "strings.xml"), "a", encoding="utf-8") as f:
+        f.write("edited")
+    assert not journal.is_done(module, "es", "source", lang_dir_paths["es"])
+
+
+def test_partial_record_of_a_crash_is_dropped_before_appending(project):
+    state_dir, module, lang_dir_paths = project
+    journal_path = os.path.join(state_dir, journal_file_name)
+
+    journal = Journal(state_dir).open()
+    journal.record(module, "es", "source", lang_dir_paths["es"])
+    journal.close()
+
+    with open(journal_path, "a", encoding="utf-8") as f:
+        f.write('{"version": 1, "module": "app/src/main/res/val')
+
+    journal = Journal(state_dir).open()
+    journal.record(module, "fr", "source", lang_dir_paths["fr"])
+    journal.close()
+
+    with open(journal_path, "r", encoding="utf-8") as f:
+        assert f.read().count("\n") == 2
+
+    journal = Journal(state_dir).load()
+    assert journal.is_done(module, "es", "source", lang_dir_paths["es"])
+    assert journal.is_done(module, "fr", "source", lang_dir_paths["fr"])
+
+
+def test_superseded_records_are_compacted(project):
+    state_dir, module, lang_dir_paths = project
+
+    journal = Journal(state_dir).open()
+    for source_hash in ("first", "second", "third"):
+        journal.record(module, "de", source_hash, lang_dir_paths["de"])
+    journal.close()
+
+    Journal(state_dir).open().close()
+
+    with open(os.path.join(state_dir, journal_file_name), "r", encoding="utf-8") as f:
+        assert f.read().count("\n") == 1
+    assert Journal(state_dir).load().is_done(module, "de", "third", lang_dir_paths["de"])
+
+
+def test_load_does_not_create_the_journal(project):
+    state_dir, module, _ = project
+
+    journal = Journal(state_dir).load()
+    journal.close()
+
+    assert not os.path.exists(os.path.join(state_dir, journal_file_name))
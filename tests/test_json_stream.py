@@ -0,0 +1,112 @@
+# Copyright 2025 Roman Likhachev
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import json
+
+import pytest
+
+from json_stream import JsonItemDecoder, JsonMemberDecoder, salvage_items, salvage_members
+
+items = [
+    {"key": "title", "value": "Hola \"mundo\" {x} [y]"},
+    {"key": "escaped", "value": "a\\b\nc é"},
+    {"key": "last", "value": "Adiós"}
+]
+
+
+def feed_in_pieces(decoder, text, size):
+    result = []
+    for start in range(0, len(text), size):
+        result += decoder.feed(text[start:start + size])
+    return result
+
+
+@pytest.mark.parametrize("size", [1, 2, 3, 7, 1000])
+def test_item_decoder_returns_items_split_at_any_point(size):
+    text = "Sure! Here it is:\n" + json.dumps(items, ensure_ascii=False, indent=2) + "\nDone."
+    decoder = JsonItemDecoder()
+
+    assert feed_in_pieces(decoder, text, size) == [(None, item) for item in items]
+    assert decoder.is_complete
+
+
+@pytest.mark.parametrize("size", [1, 5, 1000])
+def test_item_decoder_returns_items_by_language(size):
+    text = json.dumps({"es": items[:2], "fr": items[2:]}, ensure_ascii=False)
+    decoder = JsonItemDecoder(root="{")
+
+    assert feed_in_pieces(decoder, text, size) == [("es", items[0]), ("es", items[1]), ("fr", items[2])]
+    assert decoder.is_complete
+
+
+def test_item_decoder_keeps_complete_items_of_a_truncated_response():
+    text = json.dumps(items, ensure_ascii=False)
+    decoder = JsonItemDecoder()
+
+    assert decoder.feed(text[:text.index('"last"')]) == [(None, item) for item in items[:2]]
+    assert not decoder.is_complete
+
+
+def test_item_decoder_raises_on_a_malformed_item_when_strict():
+    with pytest.raises(ValueError):
+        JsonItemDecoder().feed('[{"key": "a", "value": "b",}]')
+
+
+def test_salvage_items_skips_malformed_items():
+    text = '[{"key": "a", "value": "1"}, {"key": "b", value: 2}, {"key": "c", "value": "3"}'
+    decoder = JsonItemDecoder(strict=False)
+
+    assert decoder.feed(text) == [(None, {"key": "a", "value": "1"}), (None, {"key": "c", "value": "3"})]
+    assert decoder.skipped_count == 1
+    assert salvage_items(text) == [(None, {"key": "a", "value": "1"}), (None, {"key": "c", "value": "3"})]
+
+
+def test_salvage_items_by_language_from_a_truncated_response():
+    text = '{"es": [{"key": "a", "value": "1"}], "fr": [{"key": "a", "value": "un"}, {"key": "b", "val'
+
+    assert salvage_items(text, root="{") == [("es", {"key": "a", "value": "1"}), ("fr", {"key": "a", "value": "un"})]
+
+
+@pytest.mark.parametrize("size", [1, 4, 1000])
+def test_member_decoder_returns_members_split_at_any_point(size):
+    text = "```json\n" + json.dumps({item["key"]: item["value"] for item in items}, ensure_ascii=False) + "\n```"
+    decoder = JsonMemberDecoder()
+
+    assert feed_in_pieces(decoder, text, size) == [(None, item) for item in items]
+    assert decoder.is_complete
+
+
+@pytest.mark.parametrize("size", [1, 6, 1000])
+def test_member_decoder_returns_nested_members_by_language(size):
+    text = json.dumps({"es": {"a": "uno", "b": "dos"}, "fr": {"a": "un"}}, ensure_ascii=False)
+    decoder = JsonMemberDecoder(nested=True)
+
+    assert feed_in_pieces(decoder, text, size) == [
+        ("es", {"key": "a", "value": "uno"}),
+        ("es", {"key": "b", "value": "dos"}),
+        ("fr", {"key": "a", "value": "un"})
+    ]
+
+
+def test_member_decoder_skips_values_that_are_not_strings():
+    text = '{"a": "uno", "b": 2, "c": ["x"], "d": {"e": "f"}, "g": "siete"}'
+
+    assert salvage_members(text) == [(None, {"key": "a", "value": "uno"}), (None, {"key": "g", "value": "siete"})]
+
+
+def test_salvage_members_of_a_truncated_response():
+    assert salvage_members('{"a": "uno", "b": "do') == [(None, {"key": "a", "value": "uno"})]
+    assert salvage_members('{"es": {"a": "uno"}, "fr": {"a": "u', nested=True) == [
+        ("es", {"key": "a", "value": "uno"})
+    ]
@@ -0,0 +1,90 @@
+# Copyright 2025 Roman Likhachev
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import os
+
+from execute import write_run_report
+from metrics import CALL_OK, CALL_PARTIAL, build_calls_report, format_labels, merge_reports
+
+golden_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), "golden")
+prices_by_provider = {"mock": ((1.0, 0.5, 2.0), "USD")}
+started = "2025-01-01T00:00:00+00:00"
+
+
+def make_call(**fields):
+    return {
+        "provider": "mock",
+        "model": "mock",
+        "module": "feature-0",
+        "languages": ["es"],
+        "chunk_size": 4,
+        "streaming": False,
+        "started": 0.0,
+        "latency": 1.0,
+        "ttft": None,
+        "input_tokens": 100,
+        "cached_tokens": 0,
+        "output_tokens": 40,
+        "retries": 1,
+        "strings": 4,
+        "outcome": CALL_OK,
+        **fields
+    }
+
+
+# A plain call with a retry and a partial streamed call for two languages, with cached input tokens
+calls = [
+    make_call(),
+    make_call(module="feature-1", languages=["es", "fr"], chunk_size=3, streaming=True, started=0.5, latency=3.0,
+              ttft=0.5, input_tokens=200, cached_tokens=100, output_tokens=80, retries=0, strings=5,
+              outcome=CALL_PARTIAL)
+]
+
+
+def read_golden(name):
+    with open(os.path.join(golden_dir, name), "r", encoding="utf-8") as f:
+        return f.read()
+
+
+def write_report(tmp_path, report):
+    report_paths = {"json": str(tmp_path / "report.json"), "prometheus": str(tmp_path / "metrics.prom")}
+    write_run_report(report, report_paths=report_paths)
+
+    return {name: (tmp_path / name).read_text(encoding="utf-8") for name in ("report.json", "metrics.prom")}
+
+
+def test_report_files_match_the_golden_files(tmp_path):
+    report = build_calls_report(calls, prices_by_provider, 4.0, started, {"modules": 2})
+
+    files = write_report(tmp_path, report)
+
+    assert files["report.json"] == read_golden("report.json")
+    assert files["metrics.prom"] == read_golden("metrics.prom")
+
+
+def test_merged_reports_pool_the_calls_of_every_run(tmp_path):
+    reports = [
+        build_calls_report([call], prices_by_provider, elapsed, started, {"modules": 2})
+        for call, elapsed in zip(calls, (4.0, 3.5))
+    ]
+
+    files = write_report(tmp_path, merge_reports(reports, {"modules": 2}))
+
+    # The wall time is the one of the longest run, so the merged report is the one of the run with both calls
+    assert files["report.json"] == read_golden("report.json")
+    assert files["metrics.prom"] == read_golden("metrics.prom")
+
+
+def test_label_values_are_escaped():
+    assert format_labels({"module": 'C:\\app\n"core"'}) == '{module="C:\\\\app\\n\\"core\\""}'
@@ -0,0 +1,131 @@
+# Copyright 2025 Roman Likhachev
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import subprocess
+import sys
+
+import pytest
+
+from metrics import CALL_FAILED, CALL_OK, start_run
+from planner import LatencyModel, Planner, estimate_unit, estimate_work_unit_tokens, get_weighted_tokens, \
+    get_configured_provider_concurrency
+from tests import make_configuration, repository_dir, write_project
+
+
+@pytest.fixture(autouse=True)
+def clear_calls():
+    # The planner learns from the calls of the run
+    start_run()
+
+
+def make_words(count, prefix="string"):
+    return [{"key": f"{prefix}_{number}", "value": "Some text to translate"} for number in range(count)]
+
+
+def make_unit(module_index, words, languages=("es", "fr")):
+    return {
+        "module_index": module_index,
+        "module": {"strings": f"/project/feature-{module_index}/src/main/res/values/strings.xml", "module_path": None},
+        "languages": list(languages),
+        "prepared": {"pending_words_by_language": {language: words for language in languages}}
+    }
+
+
+def make_call(input_tokens, output_tokens, latency, outcome=CALL_OK):
+    return {"input_tokens": input_tokens, "output_tokens": output_tokens, "latency": latency, "outcome": outcome}
+
+
+def test_latency_model_fits_request_time_and_time_per_token():
+    model = LatencyModel()
+    model.observe([
+        make_call(100, output_tokens, 0.2 + 0.01 * get_weighted_tokens(100, output_tokens))
+        for output_tokens in (10, 50, 200, 400, 800)
+    ])
+    model.observe([make_call(100, 5000, 100.0, outcome=CALL_FAILED)])
+    model.fit()
+
+    assert model.sample_count == 5
+    assert model.request_seconds == pytest.approx(0.2)
+    assert model.seconds_per_token == pytest.approx(0.01)
+
+
+def test_latency_model_scales_while_the_calls_are_too_alike():
+    model = LatencyModel(request_seconds=1.0, seconds_per_token=0.01)
+    model.observe([make_call(0, 100, 4.0)] * 5)
+    model.fit()
+
+    assert model.predict(1, 100) == pytest.approx(4.0)
+
+
+def test_work_unit_tokens_count_the_input_once_and_the_output_per_language():
+    words = make_words(10)
+    input_tokens, output_tokens = estimate_work_unit_tokens(words, ["es"])
+
+    assert estimate_work_unit_tokens(words, ["es", "fr", "de"]) == (input_tokens, output_tokens * 3)
+
+
+def test_estimate_unit_groups_languages_with_the_same_strings():
+    words = make_words(10)
+
+    requests, _, input_tokens, output_tokens = estimate_unit({"es": words, "fr": words}, 100000, 100000, 4)
+    assert requests == 1
+
+    requests, _, split_input_tokens, split_output_tokens = estimate_unit({"es": words, "fr": words[:5]}, 100000,
+                                                                          100000, 4)
+    assert requests == 2
+    assert split_input_tokens > input_tokens
+    assert split_output_tokens < output_tokens
+
+
+def test_planner_starts_the_longest_units_first():
+    sizes = [5, 80, 20, 1, 40]
+    work_units = [make_unit(index, make_words(size)) for index, size in enumerate(sizes)]
+    planner = Planner(make_configuration(), work_units, max_workers=2)
+
+    order = [planner.next_position() for _ in work_units]
+
+    assert order == sorted(range(len(sizes)), key=lambda position: -sizes[position])
+    with pytest.raises(IndexError):
+        planner.next_position()
+
+
+def test_schedule_puts_the_longest_unit_on_the_critical_path():
+    work_units = [make_unit(index, make_words(size)) for index, size in enumerate([200, 10, 10, 10])]
+    planner = Planner(make_configuration(), work_units, max_workers=2)
+
+    schedule = planner.make_schedule()
+
+    assert schedule["makespan"] == pytest.approx(planner.estimate_seconds(0))
+    assert [position for position, _, _ in schedule["lanes"][schedule["critical_lane"]]] == [0]
+    assert sorted(position for lane in schedule["lanes"] for position, _, _ in lane) == [0, 1, 2, 3]
+
+
+def test_provider_concurrency_is_read_from_the_configuration():
+    assert get_configured_provider_concurrency(make_configuration(providerConcurrency={"Mock": 3})) == 3
+    assert get_configured_provider_concurrency(make_configuration(providerConcurrency={"openai": 3})) == 8
+    assert get_configured_provider_concurrency(make_configuration(aiProvider="yandex")) == 4
+
+
+def test_plan_loads_no_provider_sdk_and_never_checks_the_key(tmp_path):
+    write_project(tmp_path, [{"title": "Title"}], aiProvider="openai", aiKey="sk-never-checked", aiModel="gpt-4.1-mini")
+
+    code = "import runpy, sys; sys.argv = ['aitranslator.py', '--project_dir', sys.argv[1], '--plan']; " \
+           "runpy.run_path('aitranslator.py', run_name='__main__'); " \
+           "print([name for name in ('openai', 'httpx', 'yandex_cloud_ml_sdk', 'grpc') if name in sys.modules])"
+    result = subprocess.run([sys.executable, "-c", code, str(tmp_path)], cwd=repository_dir, capture_output=True,
+                            text=True, check=True)
+
+    assert "Nothing to translate!" not in result.stdout
+    assert result.stdout.strip().splitlines()[-1] == "[]"
+    assert not (tmp_path / ".aitranslator").exists()
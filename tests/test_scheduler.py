@@ -0,0 +1,165 @@
+# Copyright 2025 Roman Likhachev
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import asyncio
+import io
+import threading
+import time
+
+import pytest
+
+from scheduler import Progress, make_work_units, run_work_units, run_work_units_async
+
+execution_graph = [{"module_path": f"/project/feature-{index}", "strings": "strings.xml"} for index in range(3)]
+
+
+def make_units(count):
+    return [{"index": index, "module": execution_graph[0], "languages": ["es"]} for index in range(count)]
+
+
+class InFlightCounter:
+
+    def __init__(self):
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self._lock = threading.Lock()
+
+    def enter(self):
+        with self._lock:
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+
+    def exit(self):
+        with self._lock:
+            self.in_flight -= 1
+
+
+class ReversePlanner:
+
+    def __init__(self, count):
+        self.positions = list(range(count))
+        self._lock = threading.Lock()
+
+    def next_position(self):
+        with self._lock:
+            return self.positions.pop()
+
+
+def test_work_units_batch_the_languages_of_every_module():
+    units = make_work_units(execution_graph[:2], ["es", "fr", "de"], batch_size=2)
+
+    assert [(unit["module_index"], unit["languages"]) for unit in units] == [
+        (0, ["es", "fr"]), (0, ["de"]), (1, ["es", "fr"]), (1, ["de"])
+    ]
+    assert units[1]["module"] is execution_graph[0]
+
+
+def test_results_keep_the_order_of_the_units_whatever_order_they_finish_in():
+    units = make_units(4)
+    finished = [threading.Event() for _ in units]
+
+    def worker(unit):
+        # Every unit waits for the next one, so they finish last to first
+        if unit["index"] + 1 < len(units):
+            assert finished[unit["index"] + 1].wait(timeout=5)
+        finished[unit["index"]].set()
+        return unit["index"] * 10
+
+    assert run_work_units(units, worker, max_workers=4) == [0, 10, 20, 30]
+
+
+def test_no_more_units_run_at_once_than_the_workers():
+    units = make_units(12)
+    counter = InFlightCounter()
+
+    def worker(unit):
+        counter.enter()
+        time.sleep(0.01)
+        counter.exit()
+        return unit["index"]
+
+    assert run_work_units(units, worker, max_workers=3) == list(range(12))
+    assert counter.max_in_flight <= 3
+
+
+def test_planner_chooses_the_unit_when_a_worker_is_free():
+    units = make_units(4)
+    started = []
+
+    def worker(unit):
+        started.append(unit["index"])
+        return unit["index"]
+
+    assert run_work_units(units, worker, max_workers=1, planner=ReversePlanner(4)) == [0, 1, 2, 3]
+    assert started == [3, 2, 1, 0]
+
+
+def test_failed_unit_fails_the_run():
+    def worker(unit):
+        if unit["index"] == 2:
+            raise RuntimeError("Translation failed")
+        return unit["index"]
+
+    with pytest.raises(RuntimeError):
+        run_work_units(make_units(4), worker, max_workers=2)
+
+
+def test_async_units_keep_the_order_and_the_limit():
+    units = make_units(12)
+    counter = InFlightCounter()
+
+    async def worker(unit):
+        counter.enter()
+        # Later units finish first
+        await asyncio.sleep(0.001 * (len(units) - unit["index"]))
+        counter.exit()
+        return unit["index"]
+
+    assert asyncio.run(run_work_units_async(units, worker, max_workers=3)) == list(range(12))
+    assert counter.max_in_flight == 3
+
+
+def test_failed_async_unit_cancels_the_others():
+    cancelled = []
+
+    async def worker(unit):
+        if unit["index"] == 0:
+            raise RuntimeError("Translation failed")
+        try:
+            await asyncio.sleep(5)
+        except asyncio.CancelledError:
+            cancelled.append(unit["index"])
+            raise
+
+    with pytest.raises(RuntimeError):
+        asyncio.run(run_work_units_async(make_units(3), worker, max_workers=3))
+
+    assert sorted(cancelled) == [1, 2]
+
+
+def test_empty_run_has_no_results():
+    assert run_work_units([], lambda unit: unit, max_workers=2) == []
+    assert asyncio.run(run_work_units_async([], None, max_workers=2)) == []
+
+
+def test_progress_prints_one_line_per_unit_without_a_terminal():
+    stream = io.StringIO()
+    progress = Progress(total=2, stream=stream)
+
+    progress.advance({"module": execution_graph[1], "languages": ["es", "fr"]})
+    progress.advance({"module": {"module_path": None, "strings": "/project/strings.xml"}, "languages": ["de"]})
+    progress.finish()
+
+    assert stream.getvalue() == "⏳ Progress: 1/2 | /project/feature-1 → es, fr\n" \
+                                "⏳ Progress: 2/2 | /project/strings.xml → de\n"
@@ -0,0 +1,74 @@
+# Copyright 2025 Roman Likhachev
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import pytest
+
+from scheduler import make_work_units
+from shard import assign_shards, parse_shard, select_shard_units
+
+languages = ["es", "fr", "de", "it"]
+
+
+def make_modules(sizes):
+    execution_graph = [
+        {"strings": f"/project/feature-{index}/src/main/res/values/strings.xml"} for index in range(len(sizes))
+    ]
+    modules_words = [
+        [{"key": f"feature_{index}_string_{number}", "value": f"String number {number}"} for number in range(size)]
+        for index, size in enumerate(sizes)
+    ]
+    return execution_graph, modules_words
+
+
+def test_parse_shard():
+    assert parse_shard("2/4") == (2, 4)
+
+    for text in ("0/4", "5/4", "1/0", "1", "a/b", "1/2/3"):
+        with pytest.raises(ValueError):
+            parse_shard(text)
+
+
+@pytest.mark.parametrize("count", [1, 2, 3, 5])
+def test_every_unit_is_in_exactly_one_shard(count):
+    execution_graph, modules_words = make_modules([30, 5, 12, 1, 50, 8, 8])
+    work_units = make_work_units(execution_graph, languages, batch_size=2)
+
+    shards = [select_shard_units(work_units, modules_words, (index, count)) for index in range(1, count + 1)]
+
+    assert sorted(id(unit) for units in shards for unit in units) == sorted(id(unit) for unit in work_units)
+
+
+def test_shards_are_balanced_by_source_strings():
+    execution_graph, modules_words = make_modules([100, 10, 10, 10, 10, 10, 10, 10, 10, 10, 10])
+    work_units = make_work_units(execution_graph, languages, batch_size=4)
+
+    assignments = assign_shards(work_units, modules_words, 2)
+
+    # The large module fills one shard, the small ones the other
+    assert assignments[0] != assignments[1]
+    assert len(set(assignments[1:])) == 1
+
+
+def test_partition_ignores_previous_runs():
+    # Runners see different snapshots, journals and translated files, the partition only follows the source strings
+    execution_graph, modules_words = make_modules([30, 5, 12, 1, 50, 8, 8])
+    work_units = make_work_units(execution_graph, languages)
+    assignments = assign_shards(work_units, modules_words, 3)
+
+    for unit in work_units[::2]:
+        unit["prepared"] = {"pending_words_by_language": {language: [] for language in unit["languages"]}}
+        unit["source_hash"] = "done"
+
+    assert assign_shards(work_units, modules_words, 3) == assignments
+    assert assign_shards(make_work_units(execution_graph, languages), modules_words, 3) == assignments
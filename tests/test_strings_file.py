@@ -0,0 +1,187 @@
+# Copyright 2025 Roman Likhachev
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import os
+
+import pytest
+
+from execute import parse_strings_file, read_words_from_strings_file
+from strings_file import StringsFileWriter, drop_incomplete_arrays, iter_string_resources, make_resource_key, \
+    resource_plurals, resource_string, resource_string_array, split_resource_key, write_strings_file
+
+words = [
+    {"key": "title", "value": "Título"},
+    {"key": "message", "value": "Tom's \"list\" & <more>"},
+    {"key": "empty", "value": ""}
+]
+
+
+def read_file(path):
+    with open(path, "r", encoding="utf-8") as f:
+        return f.read()
+
+
+def test_written_file_has_the_android_layout(tmp_path):
+    assert write_strings_file(str(tmp_path), words)
+
+    assert read_file(tmp_path / "strings.xml") == (
+        '<?xml version="1.0" encoding="utf-8"?>\n'
+        '<resources>\n'
+        '    <!--Generated Translator AI-->\n'
+        '    <string name="title">Título</string>\n'
+        '    <string name="message">Tom\\\'s \\&quot;list\\&quot; &amp;amp; &amp;lt;more&amp;gt;</string>\n'
+        '    <string name="empty"/>\n'
+        '</resources>\n'
+    )
+
+
+def test_unchanged_file_is_not_rewritten(tmp_path):
+    strings_path = tmp_path / "strings.xml"
+    write_strings_file(str(tmp_path), words)
+    os.utime(strings_path, ns=(1_000_000_000, 1_000_000_000))
+
+    assert not write_strings_file(str(tmp_path), words)
+
+    assert os.stat(strings_path).st_mtime_ns == 1_000_000_000
+    assert os.listdir(tmp_path) == ["strings.xml"]
+
+
+def test_failed_write_leaves_the_previous_file_intact(tmp_path):
+    strings_path = tmp_path / "strings.xml"
+    write_strings_file(str(tmp_path), words)
+    previous = read_file(strings_path)
+
+    # The third value cannot be written, after the lines of the first two were
+    broken_words = [{"key": "title", "value": "Otro"}, {"key": "message", "value": "Mensaje"},
+                    {"key": "count", "value": 3}]
+    with pytest.raises(AttributeError):
+        write_strings_file(str(tmp_path), broken_words)
+
+    assert read_file(strings_path) == previous
+    assert os.listdir(tmp_path) == ["strings.xml"]
+
+
+def test_writer_counts_written_and_unchanged_files(tmp_path):
+    for language in ("es", "fr"):
+        os.makedirs(tmp_path / f"values-{language}")
+    write_strings_file(str(tmp_path / "values-es"), words)
+
+    written = []
+    writer = StringsFileWriter()
+    for language in ("es", "fr"):
+        writer.submit(str(tmp_path / f"values-{language}"), words,
+                      on_written=lambda language=language: written.append(language))
+    writer.close()
+
+    assert (writer.written_count, writer.unchanged_count) == (1, 1)
+    assert sorted(written) == ["es", "fr"]
+
+
+def test_writer_raises_the_error_of_a_failed_write_on_close(tmp_path):
+    writer = StringsFileWriter()
+    writer.submit(str(tmp_path / "missing-dir"), words)
+
+    with pytest.raises(FileNotFoundError):
+        writer.close()
+
+
+source_xml = '''<?xml version="1.0" encoding="utf-8"?>
+<resources>
+    <string name="app_name" translatable="false">Quiz</string>
+    <string name="title">Start the quiz</string>
+    <string-array name="levels">
+        <item>Easy</item>
+        <item>Normal</item>
+        <item>Hard</item>
+    </string-array>
+    <string-array name="urls" translatable="false">
+        <item>https://example.com</item>
+    </string-array>
+    <plurals name="questions">
+        <item quantity="one">%d question</item>
+        <item quantity="other">%d questions</item>
+    </plurals>
+    <string name="quote">Don\\'t say \\"never\\" &amp; more</string>
+</resources>
+'''
+
+
+@pytest.fixture
+def source_path(tmp_path):
+    source_path = tmp_path / "strings.xml"
+    source_path.write_text(source_xml, encoding="utf-8")
+    return str(source_path)
+
+
+def test_reader_yields_every_translatable_resource_in_order(source_path):
+    assert [(resource.key, resource.value) for resource in iter_string_resources(source_path)] == [
+        ("title", "Start the quiz"),
+        ("levels[0]", "Easy"),
+        ("levels[1]", "Normal"),
+        ("levels[2]", "Hard"),
+        ("questions#one", "%d question"),
+        ("questions#other", "%d questions"),
+        ("quote", "Don\\'t say \\\"never\\\" & more")
+    ]
+
+
+def test_arrays_and_plurals_round_trip_through_the_writer(source_path, tmp_path):
+    source_words = read_words_from_strings_file(source_path)
+    translated_words = [dict(word, value=f"[es] {word['value']}") for word in source_words]
+
+    lang_dir = tmp_path / "values-es"
+    os.makedirs(lang_dir)
+    write_strings_file(str(lang_dir), translated_words)
+
+    assert read_words_from_strings_file(str(lang_dir / "strings.xml")) == translated_words
+
+    written = read_file(lang_dir / "strings.xml")
+    assert '    <string-array name="levels">\n        <item>[es] Easy</item>\n' in written
+    assert '    <plurals name="questions">\n        <item quantity="one">[es] %d question</item>\n' in written
+
+
+def test_array_item_missing_in_the_middle_keeps_the_position_of_the_others(tmp_path):
+    write_strings_file(str(tmp_path), [{"key": "levels[0]", "value": "Fácil"},
+                                       {"key": "levels[2]", "value": "Difícil"}])
+
+    assert [(resource.key, resource.value) for resource in iter_string_resources(str(tmp_path / "strings.xml"))] == [
+        ("levels[0]", "Fácil"), ("levels[1]", None), ("levels[2]", "Difícil")
+    ]
+
+
+def test_excluded_keys_match_the_resource_or_one_item(source_path):
+    keys = [word["key"] for word in parse_strings_file(source_path, {"levels", "questions#one"})]
+
+    assert keys == ["title", "questions#other", "quote"]
+
+
+def test_incomplete_arrays_are_dropped_from_the_translation():
+    source_words = [{"key": key, "value": "Text"} for key in ("title", "levels[0]", "levels[1]", "questions#one")]
+    translated_words = [{"key": key, "value": "Texto"} for key in ("title", "levels[0]", "questions#one")]
+
+    assert [word["key"] for word in drop_incomplete_arrays(source_words, translated_words)] == [
+        "title", "questions#one"
+    ]
+
+
+@pytest.mark.parametrize("key, parts", [
+    ("title", (resource_string, "title", None)),
+    ("levels[12]", (resource_string_array, "levels", 12)),
+    ("questions#few", (resource_plurals, "questions", "few")),
+    ("odd[name]", (resource_string, "odd[name]", None)),
+    ("tag#hash", (resource_string, "tag#hash", None))
+])
+def test_resource_keys_split_back_into_their_parts(key, parts):
+    assert split_resource_key(key) == parts
+    assert make_resource_key(*parts) == key
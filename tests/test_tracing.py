@@ -0,0 +1,106 @@
+# Copyright 2025 Roman Likhachev
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import json
+import os
+
+import pytest
+
+import tracing
+from tracing import is_tracing, span, start_tracing, stop_tracing, traced
+
+golden_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), "golden")
+
+
+class TickingClock:
+
+    # Every reading is one tick later, a binary fraction of a second keeps the microseconds exact
+    def __init__(self, tick=0.125):
+        self.tick = tick
+        self.now = 0.0
+
+    def __call__(self):
+        now = self.now
+        self.now += self.tick
+        return now
+
+
+@pytest.fixture(autouse=True)
+def stop_tracer():
+    yield
+    stop_tracing()
+
+
+@traced("parse response", "client")
+def parse(text):
+    if not text:
+        raise ValueError("Empty response")
+    return text.split()
+
+
+def trace_run():
+    with span("run", "main", {"project_dir": "/project"}):
+        with span("configure", "main"):
+            pass
+
+        with span("work unit", "execute", {"module": "feature-0"}, track=True) as unit:
+            parse("a b c")
+            with span("request", "network", track=True):
+                pass
+            unit.set(strings=3)
+
+        # The lane of a finished unit is taken again
+        with span("work unit", "execute", {"module": "feature-1"}, track=True):
+            with pytest.raises(ValueError):
+                parse("")
+
+
+def test_trace_matches_the_golden_file(tmp_path, monkeypatch):
+    monkeypatch.setattr(tracing.os, "getpid", lambda: 4242)
+    start_tracing(TickingClock())
+
+    trace_run()
+    stop_tracing(str(tmp_path / "trace.json"))
+
+    # The golden file is indented for reading, the trace itself is written compact
+    with open(tmp_path / "trace.json", "r", encoding="utf-8") as trace_file, \
+            open(os.path.join(golden_dir, "trace.json"), "r", encoding="utf-8") as golden_file:
+        assert json.load(trace_file) == json.load(golden_file)
+
+
+def test_complete_events_nest_on_their_lanes():
+    tracer = start_tracing(TickingClock())
+    trace_run()
+    stop_tracing()
+
+    events = tracer.to_json()["traceEvents"]
+    spans = [event for event in events if event["ph"] == "X"]
+
+    assert all(event["pid"] == tracer.pid for event in events)
+    assert {event["args"]["name"]: event["tid"] for event in events if event["name"] == "thread_name"} == {
+        "MainThread": 1, "lane 1": 1001, "lane 2": 1002
+    }
+
+    # A span that starts within another one on the same lane ends within it too
+    for inner in spans:
+        for outer in spans:
+            outer_end = outer["ts"] + outer["dur"]
+            if inner["tid"] == outer["tid"] and outer["ts"] < inner["ts"] < outer_end:
+                assert inner["ts"] + inner["dur"] <= outer_end
+
+
+def test_spans_are_shared_no_ops_while_tracing_is_off():
+    assert not is_tracing()
+    assert span("run") is span("other")
+    assert parse("a b") == ["a", "b"]
@@ -0,0 +1,118 @@
+# Copyright 2025 Roman Likhachev
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import time
+
+import pytest
+
+from client import finish_translation, load_prompt_template, plan_translation
+from tests import make_configuration
+from translation_cache import TranslationCache, make_cache_key
+
+words = [{"key": "ok", "value": "OK"}, {"key": "cancel", "value": "Cancel"}]
+
+
+@pytest.fixture
+def cache(tmp_path):
+    cache = TranslationCache(str(tmp_path / "cache.sqlite"))
+    yield cache
+    cache.close()
+
+
+@pytest.fixture
+def prompt_path(tmp_path):
+    path = tmp_path / "default-translator-prompt.txt"
+    path.write_text("Translate from {source_lang_full} to {target_lang_full}: {words_json}", encoding="utf-8")
+    return str(path)
+
+
+def make_key(source_value="OK", target_language="es", module_description="Home", prompt_hash="prompt"):
+    return make_cache_key(source_value, "en", target_language, "mock", "mock", "App", module_description, prompt_hash)
+
+
+def translate_from_plan(plan):
+    # Answers every requested string like the provider would, in every language of the plan
+    chunk_results = [
+        {language: [dict(word, value=f"{language}:{word['value']}") for word in chunk]
+         for language in plan["target_languages"]}
+        for chunk in plan["chunks"]
+    ]
+    return finish_translation(plan, chunk_results)
+
+
+def test_stored_translation_is_a_hit(cache):
+    cache.put_many({make_key(): "Vale"})
+
+    assert cache.get_many([make_key(), make_key("Cancel")]) == {make_key(): "Vale"}
+    assert (cache.hits, cache.misses) == (1, 1)
+
+
+@pytest.mark.parametrize("changed", [
+    {"source_value": "Ok"},
+    {"target_language": "fr"},
+    {"module_description": "Settings"},
+    {"prompt_hash": "edited prompt"}
+])
+def test_any_change_of_the_key_fields_is_a_miss(cache, changed):
+    cache.put_many({make_key(): "Vale"})
+
+    assert cache.get_many([make_key(**changed)]) == {}
+
+
+def test_entries_unused_for_too_long_or_over_the_limit_are_evicted(tmp_path):
+    cache = TranslationCache(str(tmp_path / "cache.sqlite"), max_entries=2, max_age_days=1)
+    try:
+        cache.put_many({make_key("Old"): "Viejo"})
+        cache._connection.execute("UPDATE translations SET last_used_at = ?", (time.time() - 2 * 24 * 60 * 60,))
+        cache.put_many({make_key("A"): "A"})
+        cache.put_many({make_key("B"): "B"})
+        cache.put_many({make_key("C"): "C"})
+
+        cache.evict()
+
+        assert cache.get_many([make_key(value) for value in ("Old", "A", "B", "C")]) == {make_key("B"): "B",
+                                                                                         make_key("C"): "C"}
+    finally:
+        cache.close()
+
+
+def test_single_and_multi_language_requests_share_entries(cache, prompt_path):
+    configuration = make_configuration()
+
+    single_plan = plan_translation(prompt_path, configuration, "Home", ["es"], words, cache)
+    assert len(single_plan["chunks"]) == 1
+    translate_from_plan(single_plan)
+
+    multi_plan = plan_translation(prompt_path, configuration, "Home", ["es", "fr"], words, cache)
+    assert {language: cached_values for language, (_, cached_values) in multi_plan["cache_lookups"].items()} == {
+        "es": {"ok": "es:OK", "cancel": "es:Cancel"},
+        "fr": {}
+    }
+    translate_from_plan(multi_plan)
+
+    # Everything is cached now, in both modes
+    assert plan_translation(prompt_path, configuration, "Home", ["fr"], words, cache)["chunks"] == []
+    assert plan_translation(prompt_path, configuration, "Home", ["es", "fr"], words, cache)["chunks"] == []
+
+
+def test_edited_prompt_invalidates_the_entries(cache, prompt_path):
+    configuration = make_configuration()
+    translate_from_plan(plan_translation(prompt_path, configuration, "Home", ["es"], words, cache))
+
+    with open(prompt_path, "a", encoding="utf-8") as f:
+        f.write("\nKeep the translations short.")
+    # The template is read once per run
+    load_prompt_template.cache_clear()
+
+    assert len(plan_translation(prompt_path, configuration, "Home", ["es"], words, cache)["missing_words"]) == 2
@@ -0,0 +1,71 @@
+# Copyright 2025 Roman Likhachev
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import json
+
+from validation_cache import is_validation_fresh, make_credentials_fingerprint, save_validation, validation_file_name
+
+ttl_seconds = 3600
+
+
+def test_validation_is_fresh_until_the_ttl_passes(tmp_path):
+    fingerprint = make_credentials_fingerprint("openai", "key", None, "gpt-4.1-mini")
+    save_validation(str(tmp_path), fingerprint, ttl_seconds, now=1000.0)
+
+    assert is_validation_fresh(str(tmp_path), fingerprint, ttl_seconds, now=1000.0)
+    assert is_validation_fresh(str(tmp_path), fingerprint, ttl_seconds, now=1000.0 + ttl_seconds - 1)
+    assert not is_validation_fresh(str(tmp_path), fingerprint, ttl_seconds, now=1000.0 + ttl_seconds)
+    # A clock that went back does not trust the entry either
+    assert not is_validation_fresh(str(tmp_path), fingerprint, ttl_seconds, now=999.0)
+
+
+def test_other_credentials_are_validated_again(tmp_path):
+    save_validation(str(tmp_path), make_credentials_fingerprint("openai", "key", None, "gpt-4.1"), ttl_seconds, now=0)
+
+    for fingerprint in (
+            make_credentials_fingerprint("openai", "other key", None, "gpt-4.1"),
+            make_credentials_fingerprint("openai", "key", None, "gpt-4.1-mini"),
+            make_credentials_fingerprint("yandex", "key", "folder", "gpt-4.1")
+    ):
+        assert not is_validation_fresh(str(tmp_path), fingerprint, ttl_seconds, now=1)
+
+
+def test_zero_ttl_turns_the_cache_off(tmp_path):
+    fingerprint = make_credentials_fingerprint("openai", "key", None, None)
+    save_validation(str(tmp_path), fingerprint, 0, now=0)
+
+    assert not (tmp_path / validation_file_name).exists()
+    assert not is_validation_fresh(str(tmp_path), fingerprint, 0, now=0)
+    assert not is_validation_fresh(None, fingerprint, ttl_seconds, now=0)
+
+
+def test_the_key_is_not_written_and_expired_entries_are_dropped(tmp_path):
+    old_fingerprint = make_credentials_fingerprint("openai", "old-secret", None, None)
+    fingerprint = make_credentials_fingerprint("openai", "sk-secret", None, None)
+    save_validation(str(tmp_path), old_fingerprint, ttl_seconds, now=0)
+    save_validation(str(tmp_path), fingerprint, ttl_seconds, now=ttl_seconds + 1)
+
+    text = (tmp_path / validation_file_name).read_text(encoding="utf-8")
+    assert "secret" not in text
+    assert json.loads(text) == {fingerprint: ttl_seconds + 1}
+
+
+def test_unreadable_cache_is_ignored(tmp_path):
+    fingerprint = make_credentials_fingerprint("openai", "key", None, None)
+    (tmp_path / validation_file_name).write_text("{not json", encoding="utf-8")
+
+    assert not is_validation_fresh(str(tmp_path), fingerprint, ttl_seconds, now=0)
+
+    save_validation(str(tmp_path), fingerprint, ttl_seconds, now=0)
+    assert is_validation_fresh(str(tmp_path), fingerprint, ttl_seconds, now=1)
@@ -0,0 +1,88 @@
+# Copyright 2025 Roman Likhachev
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import json
+
+import pytest
+
+from client import make_parse, validate_prompt_template
+from tests import make_configuration
+from wire_encoding import ENCODING_JSON, ENCODING_KEYED, ENCODING_LINES, LineItemDecoder, decode_lines, encode_words, \
+    format_response, get_response_format, wire_encodings
+
+words = [
+    {"key": "title", "value": "Hello  \"world\""},
+    {"key": "items[0]", "value": "First"},
+    {"key": "count#one", "value": "One item"}
+]
+
+
+def make_translations(languages):
+    return {language: [dict(word, value=f"{word['value']} ({language})") for word in words] for language in languages}
+
+
+@pytest.mark.parametrize("encoding", wire_encodings)
+@pytest.mark.parametrize("languages", [["es"], ["es", "fr"]])
+def test_response_round_trips_through_the_parser(encoding, languages):
+    translations = make_translations(languages)
+    response = format_response(translations, encoding, is_multi_language=len(languages) > 1)
+
+    assert make_parse(encoding, languages)(response, words) == translations
+
+
+@pytest.mark.parametrize("encoding", wire_encodings)
+def test_every_encoding_has_response_formats(encoding):
+    assert get_response_format(encoding, is_multi_language=False)
+    assert get_response_format(encoding, is_multi_language=True)
+
+
+def test_encode_words():
+    assert json.loads(encode_words(words, ENCODING_JSON)) == words
+    assert json.loads(encode_words(words, ENCODING_KEYED)) == {word["key"]: word["value"] for word in words}
+    assert encode_words(words, ENCODING_LINES) == '1. Hello "world"\n2. First\n3. One item'
+
+
+def test_line_decoder_maps_numbers_back_to_keys_across_pieces():
+    decoder = LineItemDecoder(words, is_multi_language=True)
+
+    items = decoder.feed("[es]\n1. Ho")
+    items += decoder.feed("la\n3) Un\n9. Out of range\n[fr]\n")
+    items += decoder.feed("2. Premier")
+    items += decoder.finish()
+
+    assert items == [
+        ("es", {"key": "title", "value": "Hola"}),
+        ("es", {"key": "count#one", "value": "Un"}),
+        ("fr", {"key": "items[0]", "value": "Premier"})
+    ]
+
+
+def test_decode_lines_ignores_other_text():
+    assert decode_lines("Here are the lines:\n1. Hola\n\nHope it helps!", words) == [
+        (None, {"key": "title", "value": "Hola"})
+    ]
+
+
+@pytest.mark.parametrize("encoding", [encoding for encoding in wire_encodings if encoding != ENCODING_JSON])
+def test_prompt_without_response_format_is_rejected_for_other_encodings(tmp_path, encoding):
+    prompt_path = tmp_path / "default-translator-prompt.txt"
+    prompt_path.write_text("Translate {words_json} to {target_lang_full}", encoding="utf-8")
+
+    validate_prompt_template(make_configuration(wireEncoding=ENCODING_JSON), str(prompt_path))
+    with pytest.raises(ValueError):
+        validate_prompt_template(make_configuration(wireEncoding=encoding), str(prompt_path))
+
+    prompt_path = tmp_path / "with-response-format.txt"
+    prompt_path.write_text("Translate {words_json} to {target_lang_full}\n{response_format}", encoding="utf-8")
+    validate_prompt_template(make_configuration(wireEncoding=encoding), str(prompt_path))
@@ -0,0 +1,66 @@
+# Copyright 2025 Roman Likhachev
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import grpc
+import grpc.aio
+import pytest
+from yandex_cloud_ml_sdk.exceptions import RunError
+
+from ai_errors import RetryableError
+from yandex_gpt import map_translation_error
+
+
+def make_rpc_error(code, details):
+    return grpc.aio.AioRpcError(code, grpc.aio.Metadata(), grpc.aio.Metadata(), details=details)
+
+
+@pytest.mark.parametrize("code, status_code", [
+    (grpc.StatusCode.RESOURCE_EXHAUSTED, 429),
+    (grpc.StatusCode.UNAVAILABLE, 503),
+    (grpc.StatusCode.DEADLINE_EXCEEDED, 504),
+    (grpc.StatusCode.INTERNAL, 500)
+])
+def test_transient_status_codes_are_retryable(code, status_code):
+    error = map_translation_error(make_rpc_error(code, "Try again later"))
+
+    assert isinstance(error, RetryableError)
+    assert error.status_code == status_code
+
+
+@pytest.mark.parametrize("code", [grpc.StatusCode.UNAUTHENTICATED, grpc.StatusCode.PERMISSION_DENIED])
+def test_authentication_status_codes_are_unauthorized(code):
+    assert isinstance(map_translation_error(make_rpc_error(code, "Invalid token")), PermissionError)
+
+
+@pytest.mark.parametrize("details", [
+    "Model uri gpt://b1g429401/yandexgpt is not found",
+    "Number of input tokens must be no more than 401, got 429",
+    "Unauthorized model version"
+])
+def test_numbers_and_words_in_the_message_do_not_change_the_class(details):
+    error = map_translation_error(make_rpc_error(grpc.StatusCode.INVALID_ARGUMENT, details))
+
+    assert type(error) is RuntimeError
+
+
+def test_failed_operation_is_classified_by_its_numeric_code():
+    assert map_translation_error(RunError(8, "Too many requests", None, "operation")).status_code == 429
+    assert isinstance(map_translation_error(RunError(16, "Invalid token", None, "operation")), PermissionError)
+    assert type(map_translation_error(RunError(3, "Request 429 is invalid", None, "operation"))) is RuntimeError
+
+
+def test_timeouts_and_connection_errors_are_retryable():
+    assert isinstance(map_translation_error(TimeoutError()), RetryableError)
+    assert isinstance(map_translation_error(ConnectionResetError()), RetryableError)
+    assert type(map_translation_error(ValueError("429"))) is RuntimeError
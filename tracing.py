@@ -0,0 +1,216 @@
+# Copyright 2025 Roman Likhachev
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import contextlib
+import contextvars
+import functools
+import heapq
+import inspect
+import json
+import os
+import threading
+import time
+
+# Spans of a run in the Chrome trace-event format, open the file in https://ui.perfetto.dev or chrome://tracing.
+# Tracing is off unless `start_tracing` was called, `span` then returns a shared no-op context manager.
+_tracer = None
+_null_span = contextlib.nullcontext()
+
+# Lane of the current span. Concurrent work on one thread (asyncio tasks) or on pool threads opens a span with
+# `track=True`, which takes a free lane, so that the spans of every lane nest properly in the viewer.
+_current_track = contextvars.ContextVar("current_track", default=None)
+
+_is_debug = False
+
+
+def start_tracing(clock=time.perf_counter):
+    global _tracer
+    _tracer = Tracer(clock)
+
+    return _tracer
+
+
+def stop_tracing(trace_path=None):
+    global _tracer
+    tracer, _tracer = _tracer, None
+
+    if tracer is not None and trace_path:
+        tracer.write(trace_path)
+
+    return tracer
+
+
+def is_tracing():
+    return _tracer is not None
+
+
+def span(name, category="", args=None, track=False):
+    tracer = _tracer
+    if tracer is None:
+        return _null_span
+
+    return Span(tracer, name, category, args, track)
+
+
+# Wraps `function` in a span, the wrapper calls it directly while tracing is off. Without `function` it returns
+# a decorator. The span of a coroutine function covers the whole await.
+def traced(name, category, function=None):
+    if function is None:
+        return lambda decorated: traced(name, category, decorated)
+
+    if inspect.iscoroutinefunction(function):
+        @functools.wraps(function)
+        async def async_wrapper(*args, **kwargs):
+            if _tracer is None:
+                return await function(*args, **kwargs)
+
+            with span(name, category):
+                return await function(*args, **kwargs)
+
+        return async_wrapper
+
+    @functools.wraps(function)
+    def wrapper(*args, **kwargs):
+        if _tracer is None:
+            return function(*args, **kwargs)
+
+        with span(name, category):
+            return function(*args, **kwargs)
+
+    return wrapper
+
+
+class Span:
+
+    def __init__(self, tracer, name, category, args, track):
+        self.tracer = tracer
+        self.name = name
+        self.category = category
+        self.args = args
+        self.track = track
+
+        self._started = None
+        self._tid = None
+        self._token = None
+
+    def __enter__(self):
+        if self.track:
+            self._tid = self.tracer.acquire_track()
+            self._token = _current_track.set(self._tid)
+        else:
+            self._tid = _current_track.get()
+            if self._tid is None:
+                self._tid = self.tracer.get_thread_track()
+
+        self._started = self.tracer.now()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        finished = self.tracer.now()
+
+        args = dict(self.args) if self.args else {}
+        if exc_type is not None:
+            args["error"] = f"{exc_type.__name__}: {exc_value}"
+
+        event = {
+            "name": self.name,
+            "cat": self.category,
+            "ph": "X",
+            "ts": self._started,
+            "dur": finished - self._started,
+            "pid": self.tracer.pid,
+            "tid": self._tid
+        }
+        if args:
+            event["args"] = args
+        self.tracer.add(event)
+
+        if self.track:
+            _current_track.reset(self._token)
+            self.tracer.release_track(self._tid)
+
+        return False
+
+    def set(self, **args):
+        # Adds arguments known only at the end of the span, like the number of strings in a response
+        self.args = dict(self.args or {}, **args)
+
+
+class Tracer:
+
+    def __init__(self, clock=time.perf_counter):
+        self.pid = os.getpid()
+        self.events = []
+
+        self.clock = clock
+        self._origin = clock()
+        self._lock = threading.Lock()
+
+        # Threads and lanes share the tid space: threads first, lanes after a gap
+        self._thread_tracks = {}
+        self._free_lanes = []
+        self._lane_count = 0
+        self._lane_offset = 1000
+
+    def now(self):
+        return (self.clock() - self._origin) * 1_000_000
+
+    def add(self, event):
+        with self._lock:
+            self.events.append(event)
+
+    def get_thread_track(self):
+        ident = threading.get_ident()
+        tid = self._thread_tracks.get(ident)
+        if tid is not None:
+            return tid
+
+        with self._lock:
+            tid = self._thread_tracks.setdefault(ident, len(self._thread_tracks) + 1)
+            self.events.append(self._make_name_event(tid, threading.current_thread().name))
+
+        return tid
+
+    def acquire_track(self):
+        with self._lock:
+            if self._free_lanes:
+                return heapq.heappop(self._free_lanes)
+
+            self._lane_count += 1
+            tid = self._lane_offset + self._lane_count
+            self.events.append(self._make_name_event(tid, f"lane {self._lane_count}"))
+
+        return tid
+
+    def release_track(self, tid):
+        with self._lock:
+            heapq.heappush(self._free_lanes, tid)
+
+    def _make_name_event(self, tid, name):
+        return {"name": "thread_name", "ph": "M", "pid": self.pid, "tid": tid, "args": {"name": name}}
+
+    def to_json(self):
+        with self._lock:
+            events = list(self.events)
+
+        metadata = [{"name": "process_name", "ph": "M", "pid": self.pid, "tid": 0, "args": {"name": "aitranslator"}}]
+
+        return {"traceEvents": metadata + events, "displayTimeUnit": "ms"}
+
+    def write(self, trace_path):
+        with open(trace_path, "w", encoding="utf-8") as file:
+            json.dump(self.to_json(), file)
+
+        if _is_debug:
+            print(f"Trace with {len(self.events)} event(s) written to {trace_path}")
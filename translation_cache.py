@@ -0,0 +1,169 @@
+# Copyright 2025 Roman Likhachev
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+
+state_dir_name = ".aitranslator"
+cache_file_name = "cache.sqlite"
+
+default_max_entries = 100_000
+default_max_age_days = 90
+
+_is_debug = False
+
+
+def get_state_dir_path(project_dir):
+    return os.path.join(project_dir, state_dir_name)
+
+
+def get_state_dir(project_dir):
+    state_dir = get_state_dir_path(project_dir)
+    os.makedirs(state_dir, exist_ok=True)
+    return state_dir
+
+
+def open_translation_cache(project_dir, configuration):
+    if _is_debug:
+        print("Open translation cache!")
+
+    cache_path = os.path.join(get_state_dir(project_dir), cache_file_name)
+
+    cache = TranslationCache(
+        cache_path,
+        max_entries=configuration.cache_max_entries,
+        max_age_days=configuration.cache_max_age_days
+    )
+    cache.evict()
+
+    return cache
+
+
+def hash_text(text):
+    return hashlib.sha256((text or "").encode("utf-8")).hexdigest()
+
+
+def make_cache_key(source_value, source_language, target_language, ai_provider, ai_model, app_description,
+                   module_description, prompt_hash):
+    parts = [
+        hash_text(source_value),
+        source_language or "",
+        target_language,
+        (ai_provider or "").lower(),
+        ai_model or "",
+        hash_text(app_description),
+        hash_text(module_description),
+        prompt_hash
+    ]
+    return hash_text("\x1f".join(parts))
+
+
+class TranslationCache:
+
+    def __init__(self, path, max_entries=default_max_entries, max_age_days=default_max_age_days):
+        self.path = path
+        self.max_entries = max_entries
+        self.max_age_days = max_age_days
+
+        self.hits = 0
+        self.misses = 0
+
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute(
+            """
+            CREATE TABLE IF NOT EXISTS translations (
+                cache_key TEXT PRIMARY KEY,
+                value TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                last_used_at REAL NOT NULL
+            )
+            """
+        )
+        self._connection.execute(
+            "CREATE INDEX IF NOT EXISTS translations_last_used_at ON translations (last_used_at)"
+        )
+        self._connection.commit()
+
+    def get_many(self, cache_keys):
+        if not cache_keys:
+            return {}
+
+        unique_keys = list(dict.fromkeys(cache_keys))
+        found = {}
+
+        with self._lock:
+            for start in range(0, len(unique_keys), 500):
+                batch = unique_keys[start:start + 500]
+                placeholders = ",".join("?" * len(batch))
+                rows = self._connection.execute(
+                    f"SELECT cache_key, value FROM translations WHERE cache_key IN ({placeholders})",
+                    batch
+                ).fetchall()
+                found.update(rows)
+
+            if found:
+                now = time.time()
+                self._connection.executemany(
+                    "UPDATE translations SET last_used_at = ? WHERE cache_key = ?",
+                    [(now, cache_key) for cache_key in found]
+                )
+                self._connection.commit()
+
+            self.hits += sum(1 for cache_key in cache_keys if cache_key in found)
+            self.misses += sum(1 for cache_key in cache_keys if cache_key not in found)
+
+        return found
+
+    def put_many(self, entries):
+        if not entries:
+            return
+
+        now = time.time()
+
+        with self._lock:
+            self._connection.executemany(
+                """
+                INSERT INTO translations (cache_key, value, created_at, last_used_at) VALUES (?, ?, ?, ?)
+                ON CONFLICT(cache_key) DO UPDATE SET value = excluded.value, last_used_at = excluded.last_used_at
+                """,
+                [(cache_key, value, now, now) for cache_key, value in entries.items()]
+            )
+            self._connection.commit()
+
+    def evict(self):
+        with self._lock:
+            if self.max_age_days:
+                expire_before = time.time() - self.max_age_days * 24 * 60 * 60
+                self._connection.execute("DELETE FROM translations WHERE last_used_at < ?", (expire_before,))
+
+            if self.max_entries:
+                self._connection.execute(
+                    """
+                    DELETE FROM translations WHERE cache_key IN (
+                        SELECT cache_key FROM translations ORDER BY last_used_at DESC LIMIT -1 OFFSET ?
+                    )
+                    """,
+                    (self.max_entries,)
+                )
+
+            self._connection.commit()
+
+    def close(self):
+        with self._lock:
+            self._connection.close()
@@ -0,0 +1,80 @@
+# Copyright 2025 Roman Likhachev
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import hashlib
+import json
+import os
+import time
+
+validation_file_name = "validation.json"
+
+_is_debug = False
+
+
+# Credentials that passed the validation request recently are not validated again. Entries are keyed by a hash of
+# (provider, key, folder, model), the key itself is never written to disk.
+def make_credentials_fingerprint(ai_provider, ai_key, ai_folder, ai_model):
+    text = "\n".join([ai_provider or "", ai_key or "", ai_folder or "", ai_model or ""])
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def load_validations(state_dir):
+    validation_path = os.path.join(state_dir, validation_file_name)
+    if not os.path.exists(validation_path):
+        return {}
+
+    try:
+        with open(validation_path, "r", encoding="utf-8") as f:
+            validations = json.load(f)
+    except (OSError, ValueError) as e:
+        print(f"Ignoring unreadable validation cache {validation_path}: {e}")
+        return {}
+
+    return validations if isinstance(validations, dict) else {}
+
+
+def is_validation_fresh(state_dir, fingerprint, ttl_seconds, now=None):
+    if not state_dir or ttl_seconds <= 0:
+        return False
+
+    now = time.time() if now is None else now
+    validated_at = load_validations(state_dir).get(fingerprint)
+
+    is_fresh = isinstance(validated_at, (int, float)) and 0 <= now - validated_at < ttl_seconds
+
+    if _is_debug:
+        print(f"Validation cache: {'fresh' if is_fresh else 'missing or expired'}")
+
+    return is_fresh
+
+
+def save_validation(state_dir, fingerprint, ttl_seconds, now=None):
+    if not state_dir or ttl_seconds <= 0:
+        return
+
+    now = time.time() if now is None else now
+
+    # Expired entries of other keys and models are dropped on the way
+    validations = {
+        key: validated_at
+        for key, validated_at in load_validations(state_dir).items()
+        if isinstance(validated_at, (int, float)) and now - validated_at < ttl_seconds
+    }
+    validations[fingerprint] = now
+
+    validation_path = os.path.join(state_dir, validation_file_name)
+    temp_path = f"{validation_path}.tmp"
+    with open(temp_path, "w", encoding="utf-8") as f:
+        json.dump(validations, f)
+    os.replace(temp_path, validation_path)
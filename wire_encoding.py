@@ -0,0 +1,221 @@
+# Copyright 2025 Roman Likhachev
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import json
+import re
+
+# How the word list is written into the prompt and how the AI is asked to answer:
+# - json: an indented array of {"key", "value"} items, the original format
+# - compact: the same array without whitespace and with non-ASCII text left as is
+# - keyed: one object mapping every key to its text
+# - lines: numbered lines with the text only, keys are mapped back by number
+ENCODING_JSON = "json"
+ENCODING_COMPACT = "compact"
+ENCODING_KEYED = "keyed"
+ENCODING_LINES = "lines"
+
+wire_encodings = (ENCODING_JSON, ENCODING_COMPACT, ENCODING_KEYED, ENCODING_LINES)
+default_wire_encoding = ENCODING_JSON
+
+line_item_pattern = re.compile(r"^\s*(\d+)[.)]\s?(.*?)\s*$")
+line_section_pattern = re.compile(r"^\s*\[([A-Za-z0-9_-]+)]\s*$")
+
+_is_debug = False
+
+# Instructions for the response in every encoding, single-language and multi-language
+RESPONSE_FORMATS = {
+    (ENCODING_JSON, False): """
+Each string is a key-value pair. Return a JSON array where each item contains:
+- "key": the original key
+- "value": the translated text
+Keys like "name[0]" are items of a string array, keys like "name#one" are the plural forms of one string
+for a quantity. Keep every key unchanged.
+
+Example response:
+[
+  { "key": "title_hello", "value": "Hola" },
+  ...
+]
+""",
+    (ENCODING_JSON, True): """
+Each string is a key-value pair. Return a JSON object whose keys are the target language codes.
+The value of each language code is a JSON array where each item contains:
+- "key": the original key
+- "value": the text translated to that language
+Keys like "name[0]" are items of a string array, keys like "name#one" are the plural forms of one string
+for a quantity. Keep every key unchanged.
+
+Example response:
+{
+  "es": [
+    { "key": "title_hello", "value": "Hola" },
+    ...
+  ],
+  ...
+}
+""",
+    (ENCODING_COMPACT, False): """
+Each string is a key-value pair. Return a compact JSON array where each item contains:
+- "key": the original key
+- "value": the translated text
+Keys like "name[0]" are items of a string array, keys like "name#one" are the plural forms of one string
+for a quantity. Keep every key unchanged.
+
+Example response:
+[{"key":"title_hello","value":"Hola"},...]
+""",
+    (ENCODING_COMPACT, True): """
+Each string is a key-value pair. Return a compact JSON object whose keys are the target language codes.
+The value of each language code is a JSON array where each item contains:
+- "key": the original key
+- "value": the text translated to that language
+Keys like "name[0]" are items of a string array, keys like "name#one" are the plural forms of one string
+for a quantity. Keep every key unchanged.
+
+Example response:
+{"es":[{"key":"title_hello","value":"Hola"},...],...}
+""",
+    (ENCODING_KEYED, False): """
+The strings are a JSON object that maps every key to its text. Return a compact JSON object that maps every key
+to the translated text.
+Keys like "name[0]" are items of a string array, keys like "name#one" are the plural forms of one string
+for a quantity. Keep every key unchanged.
+
+Example response:
+{"title_hello":"Hola",...}
+""",
+    (ENCODING_KEYED, True): """
+The strings are a JSON object that maps every key to its text. Return a compact JSON object whose keys are the
+target language codes. The value of each language code is a JSON object that maps every key to the text
+translated to that language.
+Keys like "name[0]" are items of a string array, keys like "name#one" are the plural forms of one string
+for a quantity. Keep every key unchanged.
+
+Example response:
+{"es":{"title_hello":"Hola",...},...}
+""",
+    (ENCODING_LINES, False): """
+The strings are numbered lines. Return only the translated lines, one per line, each starting with the same
+number followed by a dot and a space. Do not add any other text.
+
+Example response:
+1. Hola
+2. Adiós
+""",
+    (ENCODING_LINES, True): """
+The strings are numbered lines. Return one section per target language code. A section starts with a line
+that holds the language code in square brackets, followed by the translated lines, one per line, each starting
+with the same number followed by a dot and a space. Do not add any other text.
+
+Example response:
+[es]
+1. Hola
+2. Adiós
+[fr]
+1. Bonjour
+2. Au revoir
+""",
+}
+
+
+def encode_words(words, encoding):
+    if encoding == ENCODING_COMPACT:
+        return json.dumps(words, ensure_ascii=False, separators=(",", ":"))
+    elif encoding == ENCODING_KEYED:
+        return json.dumps({word["key"]: word["value"] for word in words}, ensure_ascii=False, separators=(",", ":"))
+    elif encoding == ENCODING_LINES:
+        # Values never hold line breaks, whitespace is collapsed when the strings file is read
+        return "\n".join(f"{number}. {' '.join(word['value'].split())}" for number, word in enumerate(words, 1))
+
+    return json.dumps(words, indent=2)
+
+
+def get_response_format(encoding, is_multi_language):
+    return RESPONSE_FORMATS[(encoding, is_multi_language)].strip()
+
+
+# Incremental decoder of the lines encoding. Every complete line is returned as (language or None, item),
+# `finish` returns the last line when the response does not end with a line break.
+class LineItemDecoder:
+
+    def __init__(self, words, is_multi_language=False):
+        self.keys = [word["key"] for word in words]
+        self.is_multi_language = is_multi_language
+
+        self._buffer = ""
+        self._language = None
+
+    def feed(self, text):
+        self._buffer += text
+
+        items = []
+        while "\n" in self._buffer:
+            line, self._buffer = self._buffer.split("\n", 1)
+            self._feed_line(line, items)
+
+        return items
+
+    def finish(self):
+        items = []
+        line, self._buffer = self._buffer, ""
+        self._feed_line(line, items)
+
+        return items
+
+    def _feed_line(self, line, items):
+        if self.is_multi_language:
+            section = line_section_pattern.match(line)
+            if section:
+                self._language = section.group(1)
+                return
+
+        match = line_item_pattern.match(line)
+        if not match:
+            return
+
+        number = int(match.group(1))
+        if 1 <= number <= len(self.keys):
+            items.append((self._language, {"key": self.keys[number - 1], "value": match.group(2)}))
+
+
+def decode_lines(text, words, is_multi_language=False):
+    decoder = LineItemDecoder(words, is_multi_language)
+
+    return decoder.feed(text) + decoder.finish()
+
+
+# Answers like a model following the instructions of `get_response_format`, used by the mock provider
+def format_response(translations_by_language, encoding, is_multi_language):
+    if encoding == ENCODING_LINES:
+        sections = []
+        for language, words in translations_by_language.items():
+            lines = [f"{number}. {word['value']}" for number, word in enumerate(words, 1)]
+            sections.append("\n".join(([f"[{language}]"] if is_multi_language else []) + lines))
+        return "\n".join(sections)
+
+    if encoding == ENCODING_KEYED:
+        data = {
+            language: {word["key"]: word["value"] for word in words}
+            for language, words in translations_by_language.items()
+        }
+    else:
+        data = dict(translations_by_language)
+
+    if not is_multi_language:
+        data = next(iter(data.values()), [] if encoding != ENCODING_KEYED else {})
+
+    if encoding == ENCODING_JSON:
+        return json.dumps(data, ensure_ascii=False)
+
+    return json.dumps(data, ensure_ascii=False, separators=(",", ":"))
@@ -12,23 +12,81 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
-from yandex_cloud_ml_sdk import YCloudML
+from ai_errors import RetryableError
+from metrics import record_usage
+from tracing import traced
 
 default_ai_model = "yandexgpt-lite"
 gpt_temperature = 0.5
 
+# (max input tokens, max output tokens) per model
+model_token_limits = {
+    "yandexgpt-lite": (32_000, 8_000),
+    "yandexgpt": (32_000, 8_000),
+}
+default_token_limits = (8_000, 2_000)
+
+# (input, cached input, output) in RUB per 1M tokens, list prices of synchronous requests; override with `modelPrices`
+model_prices = {
+    "yandexgpt-lite": (200.0, 200.0, 200.0),
+    "yandexgpt": (1200.0, 1200.0, 1200.0),
+}
+price_currency = "RUB"
+
+# Names of the gRPC status codes of transient failures and the HTTP status code the request governor treats them as
+retryable_grpc_codes = {
+    "RESOURCE_EXHAUSTED": 429,
+    "UNAVAILABLE": 503,
+    "DEADLINE_EXCEEDED": 504,
+    "INTERNAL": 500,
+    "ABORTED": 409,
+}
+unauthorized_grpc_codes = {"UNAUTHENTICATED", "PERMISSION_DENIED"}
+
+supports_batch = False
+
 _is_debug = False
 
 
-def validate_yandex_gpt(ai_key, ai_folder, ai_model):
+def create_session(ai_key, ai_folder, max_connections=None):
     if _is_debug:
-        print("Initializing YandexGPT client!")
+        print("Creating YandexGPT client!")
+
+    if not ai_folder:
+        raise ValueError("Folder ID is required for YandexGPT")
+
+    # The SDK is imported by the functions that talk to the API, planning a run only needs the limits and prices
+    from yandex_cloud_ml_sdk import YCloudML
+
+    # The SDK keeps its gRPC channels open and multiplexes concurrent requests over them
+    return YCloudML(
+        auth=ai_key,
+        folder_id=ai_folder
+    )
 
-    client = YCloudML(
+
+def create_async_session(ai_key, ai_folder, max_connections=None):
+    if _is_debug:
+        print("Creating async YandexGPT client!")
+
+    if not ai_folder:
+        raise ValueError("Folder ID is required for YandexGPT")
+
+    from yandex_cloud_ml_sdk import AsyncYCloudML
+
+    return AsyncYCloudML(
         auth=ai_key,
         folder_id=ai_folder
     )
 
+
+def validate(ai_key, ai_folder, ai_model, client=None):
+    if _is_debug:
+        print("Initializing YandexGPT client!")
+
+    if client is None:
+        client = create_session(ai_key, ai_folder)
+
     try:
         if ai_model is None or ai_model == "":
             ai_model = default_ai_model
@@ -48,32 +106,181 @@ def validate_yandex_gpt(ai_key, ai_folder, ai_model):
         raise ValueError(f"Error: Failed to authenticate with YandexGPT API. Exception: {e}")
 
 
-def translate_yandex_gpt(ai_key, ai_folder, ai_model, prompt):
+def token_limits(ai_model):
+    if ai_model is None or ai_model == "":
+        ai_model = default_ai_model
+
+    return model_token_limits.get(ai_model, default_token_limits)
+
+
+def prices(ai_model):
+    if ai_model is None or ai_model == "":
+        ai_model = default_ai_model
+
+    return model_prices.get(ai_model), price_currency
+
+
+@traced("yandex request", "network")
+def translate(ai_key, ai_folder, ai_model, prompt, client=None, response_schema=None):
     if _is_debug:
         print("Translating via Yandex GPT...")
 
-    client = YCloudML(
-        auth=ai_key,
-        folder_id=ai_folder
-    )
+    if client is None:
+        client = create_session(ai_key, ai_folder)
 
     try:
-        if ai_model is None or ai_model == "":
-            ai_model = default_ai_model
-        model = client.models.completions(ai_model)
-        model = model.configure(temperature=gpt_temperature)
+        model = configure_translation_model(client, ai_model, json_mode=response_schema is not None)
+
+        result = model.run(build_translation_prompt(prompt))
+        record_result_usage(result)
+
+        return get_translation_text(result)
+    except Exception as e:
+        raise map_translation_error(e)
+
 
-        result = model.run(
-            f"You are a professional translator specialized in UI/UX localization.\n{prompt}"
-        )
+@traced("yandex request", "network")
+async def translate_async(ai_key, ai_folder, ai_model, prompt, client=None, response_schema=None):
+    if _is_debug:
+        print("Translating via Yandex GPT (async)...")
+
+    if client is None:
+        client = create_async_session(ai_key, ai_folder)
 
-        completions = list(result)
-        if not completions:
-            raise ValueError("No translation response received.")
+    try:
+        model = configure_translation_model(client, ai_model, json_mode=response_schema is not None)
 
-        return completions[0].text
+        result = await model.run(build_translation_prompt(prompt))
+        record_result_usage(result)
+
+        return get_translation_text(result)
     except Exception as e:
-        if "401" in str(e) or "unauthorized" in str(e).lower():
-            raise PermissionError("Unauthorized: Invalid API key or access denied.")
-        else:
-            raise RuntimeError(f"Translation failed: {e}")
+        raise map_translation_error(e)
+
+
+@traced("yandex stream", "network")
+def stream(ai_key, ai_folder, ai_model, prompt, on_text, client=None, response_schema=None):
+    if _is_debug:
+        print("Streaming translation via Yandex GPT...")
+
+    if client is None:
+        client = create_session(ai_key, ai_folder)
+
+    try:
+        model = configure_translation_model(client, ai_model, json_mode=response_schema is not None)
+
+        # Every partial result holds the whole text generated so far
+        text = ""
+        result = None
+        for result in model.run_stream(build_translation_prompt(prompt)):
+            partial_text = get_translation_text(result)
+            if len(partial_text) > len(text):
+                on_text(partial_text[len(text):])
+                text = partial_text
+
+        # The last partial result carries the usage of the whole response
+        if result is not None:
+            record_result_usage(result)
+
+        return text
+    except ValueError:
+        # Raised by `on_text` to stop reading a response that went wrong
+        raise
+    except Exception as e:
+        raise map_translation_error(e)
+
+
+@traced("yandex stream", "network")
+async def stream_async(ai_key, ai_folder, ai_model, prompt, on_text, client=None, response_schema=None):
+    if _is_debug:
+        print("Streaming translation via Yandex GPT (async)...")
+
+    if client is None:
+        client = create_async_session(ai_key, ai_folder)
+
+    try:
+        model = configure_translation_model(client, ai_model, json_mode=response_schema is not None)
+
+        text = ""
+        result = None
+        async for result in model.run_stream(build_translation_prompt(prompt)):
+            partial_text = get_translation_text(result)
+            if len(partial_text) > len(text):
+                on_text(partial_text[len(text):])
+                text = partial_text
+
+        # The last partial result carries the usage of the whole response
+        if result is not None:
+            record_result_usage(result)
+
+        return text
+    except ValueError:
+        # Raised by `on_text` to stop reading a response that went wrong
+        raise
+    except Exception as e:
+        raise map_translation_error(e)
+
+
+def configure_translation_model(client, ai_model, json_mode=False):
+    if ai_model is None or ai_model == "":
+        ai_model = default_ai_model
+
+    model = client.models.completions(ai_model)
+
+    if json_mode:
+        return model.configure(temperature=gpt_temperature, response_format="json")
+
+    return model.configure(temperature=gpt_temperature)
+
+
+def build_translation_prompt(prompt):
+    return f"You are a professional translator specialized in UI/UX localization.\n{prompt}"
+
+
+def record_result_usage(result):
+    usage = getattr(result, "usage", None)
+    if usage is None:
+        return
+
+    # Yandex GPT does not report cached input tokens
+    record_usage(
+        "yandex",
+        input_tokens=usage.input_text_tokens,
+        output_tokens=usage.completion_tokens
+    )
+
+
+def get_translation_text(result):
+    completions = list(result)
+    if not completions:
+        raise ValueError("No translation response received.")
+
+    return completions[0].text
+
+
+def get_grpc_status_code(e):
+    import grpc
+
+    # gRPC errors of the SDK return a grpc.StatusCode, failed operations keep the number of google.rpc.Code
+    code = getattr(e, "code", None)
+    if isinstance(e, grpc.RpcError) and callable(code):
+        code = code()
+
+    if isinstance(code, int):
+        return next((status for status in grpc.StatusCode if status.value[0] == code), None)
+
+    return code if isinstance(code, grpc.StatusCode) else None
+
+
+def map_translation_error(e):
+    status = get_grpc_status_code(e)
+    code = status.name if status is not None else None
+
+    if code in unauthorized_grpc_codes:
+        return PermissionError("Unauthorized: Invalid API key or access denied.")
+    elif code in retryable_grpc_codes:
+        return RetryableError(f"Translation failed: {e}", status_code=retryable_grpc_codes[code])
+    elif isinstance(e, (TimeoutError, ConnectionError)):
+        return RetryableError(f"Translation failed: {e}", status_code=503)
+    else:
+        return RuntimeError(f"Translation failed: {e}")